@@ -14,13 +14,17 @@ def parse_args(args):
         epilog='One-Off Coder https://www.oneoffcoder.com')
 
     parser.add_argument('-f', '--file', help='command file', required=True)
+    parser.add_argument('--ip', help='Tello IP', default='192.168.10.1', required=False)
+    parser.add_argument('--local-ip', help='Local IP to bind', default='', required=False)
     return parser.parse_args(args)
 
 
-def start(file_name):
+def start(file_name, tello_ip='192.168.10.1', local_ip=''):
     """
     Starts sending commands to Tello.
     :param file_name: File name where commands are located.
+    :param tello_ip: Tello IP.
+    :param local_ip: Local IP to bind.
     :return: None.
     """
     start_time = str(datetime.now())
@@ -28,7 +32,7 @@ def start(file_name):
     with open(file_name, 'r') as f:
         commands = f.readlines()
 
-    tello = Tello()
+    tello = Tello(tello_ip, local_ip)
     for command in commands:
         if command != '' and command != '\n':
             command = command.rstrip()
@@ -57,4 +61,4 @@ def start(file_name):
 if __name__ == '__main__':
     args = parse_args(sys.argv[1:])
     file_name = args.file
-    start(file_name)
+    start(file_name, args.ip, args.local_ip)
@@ -1,6 +1,17 @@
+import time
 from datetime import datetime
 
 class Stats(object):
+    """
+    Statistics. Times are monotonic nanoseconds; they are converted to wall-clock
+    datetimes only when the stats are printed.
+    """
+
+    __slots__ = ('command', 'response', 'id', 'start_ns', 'end_ns')
+
+    # wall clock minus monotonic clock, taken once so later NTP steps do not skew durations
+    WALL_CLOCK_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
     def __init__(self, command, id):
         """
         Constructor.
@@ -11,9 +22,8 @@ class Stats(object):
         self.response = None
         self.id = id
 
-        self.start_time = datetime.now()
-        self.end_time = None
-        self.duration = None
+        self.start_ns = time.monotonic_ns()
+        self.end_ns = None
 
     def add_response(self, response):
         """
@@ -21,17 +31,38 @@ class Stats(object):
         :param response: Response.
         :return: None.
         """
+        self.end_ns = time.monotonic_ns()
         self.response = response
-        self.end_time = datetime.now()
-        self.duration = self.get_duration()
+
+    @staticmethod
+    def to_datetime(ns):
+        """
+        Converts a monotonic timestamp to wall-clock time.
+        :param ns: Monotonic time (nanoseconds), or None.
+        :return: Datetime, or None.
+        """
+        if ns is None:
+            return None
+        return datetime.fromtimestamp((ns + Stats.WALL_CLOCK_OFFSET_NS) / 1e9)
+
+    @property
+    def start_time(self):
+        return Stats.to_datetime(self.start_ns)
+
+    @property
+    def end_time(self):
+        return Stats.to_datetime(self.end_ns)
+
+    @property
+    def duration(self):
+        return None if self.end_ns is None else self.get_duration()
 
     def get_duration(self):
         """
         Gets the duration.
         :return: Duration.
         """
-        diff = self.end_time - self.start_time
-        return diff.total_seconds()
+        return (self.end_ns - self.start_ns) / 1e9
 
     def print_stats(self):
         """
@@ -68,4 +99,4 @@ class Stats(object):
         str += f'start_time: {self.start_time}\n'
         str += f'end_time: {self.end_time}\n'
         str += f'duration: {self.duration}\n'
-        return str
\ No newline at end of file
+        return str
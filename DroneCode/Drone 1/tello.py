@@ -4,11 +4,13 @@ import time
 from stats import Stats
 
 class Tello(object):
-    def __init__(self):
+    def __init__(self, tello_ip='192.168.10.1', local_ip=''):
         """
         Constructor.
+        :param tello_ip: (str) the ip of Tello
+        :param local_ip: (str) the local ip to bind, '' binds all interfaces
         """
-        self.local_ip = ''
+        self.local_ip = local_ip
         self.local_port = 8889
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind((self.local_ip, self.local_port))
@@ -18,7 +20,7 @@ class Tello(object):
         self.receive_thread.daemon = True
         self.receive_thread.start()
 
-        self.tello_ip = '192.168.10.1'
+        self.tello_ip = tello_ip
         self.tello_port = 8889
         self.tello_address = (self.tello_ip, self.tello_port)
         self.log = []
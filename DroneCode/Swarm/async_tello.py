@@ -0,0 +1,327 @@
+import asyncio
+import threading
+import time
+from contextlib import suppress
+from tello import *
+
+
+class TelloProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol feeding Tello responses into an AsyncTelloManager.
+    """
+
+    def __init__(self, manager):
+        """
+        Ctor.
+        :param manager: AsyncTelloManager.
+        """
+        self.manager = manager
+
+    def connection_made(self, transport):
+        self.manager.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            self.manager._handle_response(data, addr)
+        except Exception as exc:
+            # a malformed datagram must not take the protocol down
+            print(f'[EXCEPTION], Dropped response from {addr[0]}: {exc}')
+            return
+
+        self.manager._resolve(addr[0])
+
+    def error_received(self, exc):
+        # swallow exception, same as the threaded receive loop
+        pass
+
+
+class AsyncTelloManager(TelloManager):
+    """
+    Tello Manager running on an asyncio event loop.
+    All drones are driven from one loop through one datagram endpoint,
+    with the same logging and Stats semantics as TelloManager.
+    """
+
+    def __init__(self, local_ip='', local_port=8889, possible_ips=None):
+        """
+        Ctor. Call open() from the event loop before sending commands.
+        :param local_ip: Local IP to bind; '' binds all interfaces.
+        :param local_port: Local port to bind.
+        :param possible_ips: IPs to search for Tellos; None searches the 192.168.0.x subnets.
+        """
+        self._init_state(local_ip, local_port, possible_ips)
+
+        self.transport = None
+        self.waiters = {}
+        self.found = None
+
+    async def open(self):
+        """
+        Opens the datagram endpoint on the running loop.
+        :return: None.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: TelloProtocol(self),
+                                            local_addr=(self.local_ip or '0.0.0.0', self.local_port))
+
+    def close(self):
+        """
+        Closes the datagram endpoint.
+        :return: None.
+        """
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        self.stop_telemetry()
+
+    async def find_avaliable_tello(self, num, known_ips=None):
+        """
+        Find Tellos. Returns as soon as num Tellos have acked; addresses that have not answered
+        are re-probed with exponential backoff. Only Tellos that answer get a log entry.
+        :param num: Number of Tellos to search.
+        :param known_ips: IPs where Tellos were last seen; verified first, before sweeping the subnet.
+        :return: None
+        """
+        self.found = asyncio.Event()
+        known_ips = [ip for ip in (known_ips or []) if ip not in self.tello_ip_list]
+
+        if len(known_ips) > 0:
+            print(f'[SEARCHING], Verifying {len(known_ips)} known IP addresses')
+            await self._probe(known_ips, 0, num)
+
+            await self._wait_for_tellos(
+                lambda: len(self.tello_ip_list) >= num or all(ip in self.tello_ip_list for ip in known_ips),
+                self.DISCOVERY_WARM_TIME_OUT)
+
+        if len(self.tello_ip_list) >= num:
+            self.probes.clear()
+            return
+
+        possible_ips = self.get_possible_ips()
+
+        print(f'[SEARCHING], Searching for {num} from {len(possible_ips)} possible IP addresses')
+
+        iters = 0
+        interval = self.DISCOVERY_INTERVAL
+
+        while len(self.tello_ip_list) < num:
+            print(f'[SEARCHING], Trying to find Tellos, number of tries = {iters + 1}')
+            print(self.tello_ip_list)
+
+            possible_ips = [ip for ip in possible_ips if ip not in self.tello_ip_list]
+            await self._probe(possible_ips, iters, num)
+
+            iters = iters + 1
+
+            await self._wait_for_tellos(lambda: len(self.tello_ip_list) >= num, interval)
+            interval = min(interval * 2, self.DISCOVERY_MAX_INTERVAL)
+
+        self.probes.clear()
+
+    async def _probe(self, ips, iters, num=None):
+        """
+        Sends the 'command' probe to each IP, stopping once num Tellos have answered.
+        :param ips: IPs to probe.
+        :param iters: Discovery round, for error messages.
+        :param num: Number of Tellos searched for; None probes every IP.
+        :return: None
+        """
+        for ip in ips:
+            # probes are paced by the limiter, so drones found mid-sweep end it early
+            if num is not None and len(self.tello_ip_list) >= num:
+                break
+
+            if self.limiter is not None:
+                await self.limiter.acquire_async(ip, 1, RateLimiter.DISCOVERY)
+
+            self.probes[ip] = time.monotonic_ns()
+            self.transport.sendto(b'command', (ip, 8889))
+
+    async def _wait_for_tellos(self, predicate, timeout):
+        """
+        Waits until the predicate holds, re-checking each time a new Tello answers.
+        :param predicate: Callable returning a boolean.
+        :param timeout: Timeout (seconds).
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        while not predicate():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            self.found.clear()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.found.wait(), remaining)
+
+    def _on_tello_found(self, ip):
+        """
+        Wakes up discovery when a new Tello answers.
+        :param ip: Tello IP.
+        :return: None.
+        """
+        if self.found is not None:
+            self.found.set()
+
+    async def send_command(self, command, ip):
+        """
+        Sends a command to the IP address. Completes when the command receives a response
+        or every transmission timed out; commands are resent as in TelloManager.send_command.
+
+        :param command: Command.
+        :param ip: Tello IP.
+        :return: Response.
+        """
+        real_command, stats, packets = self._prepare_command(command, ip)
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[ip] = (stats, future)
+
+        try:
+            for backoff in range(self.get_max_retries(command) + 1):
+                timeout = self.get_timeout(real_command, ip, backoff)
+                if backoff > 0:
+                    self._on_retransmit(ip, real_command, backoff, timeout)
+
+                if self.limiter is not None:
+                    await self.limiter.acquire_async(ip, len(packets), RateLimiter.get_lane(real_command))
+
+                sent_ns = time.monotonic_ns()
+                for packet in packets:
+                    self.transport.sendto(packet, (ip, 8889))
+
+                try:
+                    response = await asyncio.wait_for(asyncio.shield(future), timeout)
+                except asyncio.TimeoutError:
+                    continue
+
+                self._on_response(ip, command, stats, backoff + 1, timeout, sent_ns)
+                return response
+
+            self._untrack(ip, stats)
+            self._record(ip, stats)
+            print(f'[NO_RESPONSE] Max timeout exceeded for command: {real_command}')
+            return
+        finally:
+            if self.waiters.get(ip, (None,))[0] is stats:
+                del self.waiters[ip]
+
+    async def send_once(self, command, ip, timeout):
+        """
+        Sends a command once, without retransmission, and waits at most timeout for its response.
+
+        :param command: Command.
+        :param ip: Tello IP.
+        :param timeout: Maximum time (seconds) to wait for the response.
+        :return: Response, or None if none arrived in time.
+        """
+        real_command, stats, packets = self._prepare_command(command, ip)
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[ip] = (stats, future)
+
+        try:
+            if self.limiter is not None:
+                await self.limiter.acquire_async(ip, len(packets), RateLimiter.get_lane(real_command))
+
+            sent_ns = time.monotonic_ns()
+            for packet in packets:
+                self.transport.sendto(packet, (ip, 8889))
+
+            try:
+                response = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                self._untrack(ip, stats)
+                self._record(ip, stats)
+                print(f'[NO_RESPONSE] No response within {timeout:.3f}s for command: {real_command}')
+                return
+
+            self._on_response(ip, command, stats, 1, timeout, sent_ns)
+            return response
+        finally:
+            if self.waiters.get(ip, (None,))[0] is stats:
+                del self.waiters[ip]
+
+    def _resolve(self, ip):
+        """
+        Completes the pending send_command for the IP once its Stats got a response.
+        :param ip: Tello IP.
+        :return: None.
+        """
+        stats, future = self.waiters.get(ip, (None, None))
+        if stats is not None and stats.got_response() and not future.done():
+            future.set_result(stats.response)
+
+
+class SyncTelloManager(object):
+    """
+    Blocking facade over an AsyncTelloManager whose loop runs in a background thread.
+    Exposes the TelloManager interface so Tello and the Swarm command handlers
+    (including the per-drone workers) can run on top of the asyncio transport.
+    """
+
+    def __init__(self, manager=None):
+        """
+        Ctor.
+        :param manager: AsyncTelloManager; a new one is created if None.
+        """
+        self.manager = manager if manager is not None else AsyncTelloManager()
+        self.tellos = {}
+
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever)
+        self.loop_thread.daemon = True
+        self.loop_thread.start()
+
+        self._run(self.manager.open())
+
+    def __getattr__(self, name):
+        return getattr(self.manager, name)
+
+    def _run(self, coro):
+        """
+        Runs a coroutine on the manager's loop and blocks for its result.
+        :param coro: Coroutine.
+        :return: Result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def find_avaliable_tello(self, num, known_ips=None):
+        return self._run(self.manager.find_avaliable_tello(num, known_ips))
+
+    def send_command(self, command, ip):
+        return self._run(self.manager.send_command(command, ip))
+
+    def send_once(self, command, ip, timeout):
+        return self._run(self.manager.send_once(command, ip, timeout))
+
+    def get_tello_list(self):
+        """
+        Gets the Tellos, bound to this facade so their commands block.
+        :return: List of Tellos.
+        """
+        for ip in self.manager.tello_ip_list:
+            if ip not in self.tellos:
+                self.tellos[ip] = Tello(ip, self)
+        return [self.tellos[ip] for ip in self.manager.tello_ip_list]
+
+    def close(self):
+        """
+        Closes the endpoint and stops the loop, returning once the socket is closed.
+        :return: None.
+        """
+        if not self.loop_thread.is_alive():
+            return
+
+        self._run(self._close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+
+    async def _close(self):
+        """
+        Closes the manager; the transport closes its socket on the next loop iteration.
+        :return: None.
+        """
+        self.manager.close()
+        await asyncio.sleep(0)
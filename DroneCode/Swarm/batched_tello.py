@@ -0,0 +1,248 @@
+import select
+import selectors
+import socket
+import threading
+from contextlib import suppress
+from tello import *
+
+
+class UdpShard(object):
+    """
+    One non-blocking UDP socket with enlarged kernel buffers. Ready datagrams are drained
+    in batches into preallocated buffers, so a burst of acks costs one wakeup instead of one
+    blocking call per datagram.
+    """
+
+    def __init__(self, local_ip='', local_port=8889, rcvbuf=4 * 1024 * 1024, sndbuf=1024 * 1024):
+        """
+        Ctor.
+
+        :param local_ip: Local IP to bind; '' binds all interfaces.
+        :param local_port: Local port to bind.
+        :param rcvbuf: Requested receive buffer size (bytes); the kernel may cap it.
+        :param sndbuf: Requested send buffer size (bytes); the kernel may cap it.
+        """
+        self.local_ip = local_ip
+        self.local_port = local_port
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        with suppress(OSError):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        with suppress(OSError):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        self.socket.bind((local_ip, local_port))
+        self.socket.setblocking(False)
+
+        self.received = 0
+        self.sent = 0
+        self.batches = 0
+        self.max_batch = 0
+
+    def receive(self, buffers, views):
+        """
+        Drains ready datagrams, at most one per buffer.
+
+        :param buffers: Preallocated bytearrays.
+        :param views: Memoryviews of the buffers.
+        :return: List of (datagram bytes, sender address), in arrival order.
+        """
+        batch = []
+        for buffer, view in zip(buffers, views):
+            try:
+                size, address = self.socket.recvfrom_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # e.g. ICMP port unreachable reported on Windows; the datagram is gone either way
+                continue
+            batch.append((bytes(view[:size]), address))
+
+        if len(batch) > 0:
+            self.received += len(batch)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(batch))
+        return batch
+
+    def sendto(self, packet, address):
+        """
+        Sends one datagram, waiting for buffer space if the send buffer is full.
+
+        :param packet: Datagram.
+        :param address: Destination address.
+        :return: None.
+        """
+        while True:
+            try:
+                self.socket.sendto(packet, address)
+                self.sent += 1
+                return
+            except (BlockingIOError, InterruptedError):
+                select.select([], [self.socket], [], 1.0)
+
+    def get_stats(self):
+        """
+        Gets the shard statistics.
+
+        :return: Statistics.
+        """
+        return {
+            'address': self.socket.getsockname(),
+            'received': self.received,
+            'sent': self.sent,
+            'batches': self.batches,
+            'max_batch': self.max_batch
+        }
+
+    def close(self):
+        self.socket.close()
+
+
+class BatchedTelloManager(TelloManager):
+    """
+    Tello Manager for large swarms. Drones are spread across several sockets (shards), which may
+    be bound to different ports and interfaces; a Tello answers on the socket that sent to it, so each
+    drone sticks to the shard it was first contacted on. One receive thread waits on every shard
+    and drains ready datagrams in batches. send_command(command, ip) works as in TelloManager.
+    """
+
+    def __init__(self, local_ip='', local_port=8889, possible_ips=None, shards=None, batch=64,
+                 rcvbuf=4 * 1024 * 1024, sndbuf=1024 * 1024):
+        """
+        Ctor.
+
+        :param local_ip: Local IP of the first shard; '' binds all interfaces.
+        :param local_port: Local port of the first shard.
+        :param possible_ips: IPs to search for Tellos; None searches the 192.168.0.x subnets.
+        :param shards: List of (local IP, local port) to bind, one socket each; None binds (local_ip, local_port) only.
+        :param batch: Maximum datagrams drained from a socket per wakeup.
+        :param rcvbuf: Requested receive buffer size (bytes) per socket.
+        :param sndbuf: Requested send buffer size (bytes) per socket.
+        """
+        self._init_state(local_ip, local_port, possible_ips)
+
+        self.batch = batch
+        self.shards = [UdpShard(ip, port, rcvbuf, sndbuf) for ip, port in (shards or [(local_ip, local_port)])]
+        self.routes = {}
+        self.route_lock = threading.Lock()
+
+        self.selector = selectors.DefaultSelector()
+        for shard in self.shards:
+            self.selector.register(shard.socket, selectors.EVENT_READ, shard)
+
+        # writing to the wake socket interrupts the receive thread's wait on close
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+
+        self.running = True
+        self.receive_thread = threading.Thread(target=self._receive_thread)
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+
+    @staticmethod
+    def make_shards(num, local_ip='', local_port=8889):
+        """
+        Gets num shard addresses on one interface: the command port, then ports above the state port.
+
+        :param num: Number of shards.
+        :param local_ip: Local IP to bind.
+        :param local_port: Port of the first shard.
+        :return: List of (local IP, local port).
+        """
+        return [(local_ip, local_port)] + [(local_ip, local_port + 2 + i) for i in range(num - 1)]
+
+    def get_shard(self, ip):
+        """
+        Gets the shard a Tello is driven through. A new Tello goes to the least loaded shard
+        bound to its /24 subnet (or to all interfaces).
+
+        :param ip: Tello IP.
+        :return: UdpShard.
+        """
+        shard = self.routes.get(ip)
+        if shard is not None:
+            return shard
+
+        with self.route_lock:
+            shard = self.routes.get(ip)
+            if shard is None:
+                subnet = ip.rsplit('.', 1)[0]
+                candidates = [s for s in self.shards
+                              if s.local_ip in ('', '0.0.0.0') or s.local_ip.rsplit('.', 1)[0] == subnet]
+                loads = {id(s): 0 for s in self.shards}
+                for routed in self.routes.values():
+                    loads[id(routed)] += 1
+                shard = min(candidates or self.shards, key=lambda s: loads[id(s)])
+                self.routes[ip] = shard
+            return shard
+
+    def _sendto(self, packet, ip):
+        """
+        Sends one datagram to a Tello's command port through its shard.
+
+        :param packet: Datagram.
+        :param ip: Tello IP.
+        :return: None.
+        """
+        self.get_shard(ip).sendto(packet, (ip, 8889))
+
+    def _receive_thread(self):
+        """
+        Waits on every shard and handles ready datagrams in batches.
+
+        :return: None.
+        """
+        buffers = [bytearray(2048) for _ in range(self.batch)]
+        views = [memoryview(buffer) for buffer in buffers]
+
+        while self.running:
+            try:
+                events = self.selector.select()
+            except OSError:
+                break
+
+            for key, _ in events:
+                shard = key.data
+                if shard is None:
+                    with suppress(OSError):
+                        self.wake_r.recv(64)
+                    continue
+
+                for response, address in shard.receive(buffers, views):
+                    if not self.running:
+                        return
+                    if len(response) == 0:
+                        continue
+                    try:
+                        self._handle_response(response, address)
+                    except Exception as exc:
+                        # a malformed datagram must not take the receive thread down
+                        print(f'[EXCEPTION], Dropped response from {address[0]}: {exc}')
+
+    def close(self):
+        """
+        Stops the receive thread and closes the sockets.
+
+        :return: None.
+        """
+        self.running = False
+
+        with suppress(OSError):
+            self.wake_w.send(b'\0')
+
+        self.receive_thread.join(1.0)
+
+        self.selector.close()
+        for shard in self.shards:
+            shard.close()
+        self.wake_r.close()
+        self.wake_w.close()
+        self.stop_telemetry()
+
+    def get_shard_stats(self):
+        """
+        Gets the statistics of every shard.
+
+        :return: List of statistics.
+        """
+        return [shard.get_stats() for shard in self.shards]
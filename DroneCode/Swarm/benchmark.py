@@ -0,0 +1,336 @@
+import argparse
+import contextlib
+import ipaddress
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from swarm import Swarm
+from sharded_swarm import ShardedSwarm
+from tello import TelloManager
+from async_tello import AsyncTelloManager, SyncTelloManager
+from batched_tello import BatchedTelloManager
+from log_index import LogIndex
+from mission import Mission, Op
+from simulator import TelloSimulator
+
+SIMULATOR_IP = '127.0.0.2'
+
+
+def make_synthetic_mission(num, steps):
+    """
+    Builds a mission that takes off, moves every drone up and down steps times and lands.
+
+    :param num: Number of drones.
+    :param steps: Number of up/down pairs.
+    :return: Tuple of (mission text, list of SNs).
+    """
+    sns = [f'0TQZSIM{x:07d}' for x in range(num)]
+
+    lines = [f'scan {num}']
+    lines += [f'{x + 1}={sn}' for x, sn in enumerate(sns)]
+    lines += ['*>takeoff']
+    for _ in range(steps):
+        lines += ['*>up 20', '*>down 20']
+    lines += ['*>land']
+
+    return '\n'.join(lines) + '\n', sns
+
+
+def get_mission_sns(text):
+    """
+    Gets the SNs a mission assigns to IDs ('N=SN' lines), in ID order.
+
+    :param text: Mission text.
+    :return: List of SNs.
+    """
+    pairs = [i.args for i in Mission.compile(text.splitlines()) if i.op == Op.ASSIGN]
+    return [sn for _, sn in sorted(pairs)]
+
+
+def get_mission_size(text):
+    """
+    Gets the number of drones a mission scans for.
+
+    :param text: Mission text.
+    :return: Number of drones.
+    """
+    scans = [i.args[0] for i in Mission.compile(text.splitlines()) if i.op == Op.SCAN]
+    return scans[0] if len(scans) > 0 else 0
+
+
+def _simulate(num, sns, options, ready, stop):
+    """
+    Runs the simulator (in its own process, so its CPU is not charged to the controller).
+    """
+    simulator = TelloSimulator(num, SIMULATOR_IP, ack_latency=options['latency'], jitter=options['jitter'],
+                               loss=options['loss'], exec_scale=options['exec_scale'],
+                               seed=options['seed'], sns=sns)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        simulator.start()
+    ready.set()
+    stop.wait()
+    simulator.stop()
+
+
+def _run_case(name, text, options, results):
+    """
+    Runs one mission against the simulator and puts its metrics on the results queue.
+    Runs in its own process so CPU time and peak RSS belong to this case only.
+    """
+    num = get_mission_size(text)
+    sns = get_mission_sns(text)
+
+    ready, stop = multiprocessing.Event(), multiprocessing.Event()
+    simulator = multiprocessing.Process(target=_simulate, args=(num, sns, options, ready, stop))
+    simulator.daemon = True
+    simulator.start()
+    ready.wait()
+
+    ips = [str(ipaddress.ip_address(SIMULATOR_IP) + x) for x in range(num)]
+
+    if options['skip_delays']:
+        text = '\n'.join(line for line in text.splitlines() if not line.strip().startswith('delay'))
+
+    dpath = tempfile.mkdtemp(prefix='tello-bench-')
+    cwd = os.getcwd()
+    os.chdir(dpath)
+
+    try:
+        with open('mission.txt', 'w') as f:
+            f.write(text)
+
+        if options['asyncio']:
+            transport = AsyncTelloManager('127.0.0.1', possible_ips=ips)
+        elif options['shards'] > 0:
+            transport = BatchedTelloManager('127.0.0.1', possible_ips=ips,
+                                            shards=BatchedTelloManager.make_shards(options['shards'], '127.0.0.1'))
+        else:
+            transport = TelloManager('127.0.0.1', possible_ips=ips)
+
+        if not options['rate_limit']:
+            transport.limiter = None
+        transport.EARLY_ACK *= options['exec_scale']
+
+        manager = SyncTelloManager(transport) if options['asyncio'] else transport
+
+        if options['processes'] > 0:
+            swarm = ShardedSwarm('mission.txt', manager, options['coalesce'], merge_actions=options['merge_actions'],
+                                 processes=options['processes'], echo=options['verbose'])
+        else:
+            swarm = Swarm('mission.txt', manager, options['coalesce'], merge_actions=options['merge_actions'])
+        for sn, ip in zip(sns, ips):
+            swarm.registry.set_ip(sn, ip, confirmed=True)
+
+        cpu_start = time.process_time()
+        children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        wall_start = time.monotonic()
+
+        with contextlib.redirect_stdout(sys.stdout if options['verbose'] else open(os.devnull, 'w')):
+            swarm.start()
+
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        # shard processes have exited by now; the simulator has not, so only they are counted
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += (children.ru_utime - children_start.ru_utime) + (children.ru_stime - children_start.ru_stime)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        manager.close()
+
+        fpath = os.path.join('log', os.listdir('log')[0])
+        index = LogIndex.parse([(name, fpath)])
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(dpath, ignore_errors=True)
+        stop.set()
+        simulator.join()
+
+    results.put(summarize(name, index, num, wall, cpu, rss))
+
+
+def summarize(name, index, num, wall, cpu, rss):
+    """
+    Computes the benchmark metrics of one run.
+
+    :param name: Case name.
+    :param index: LogIndex of the run.
+    :param num: Number of drones.
+    :param wall: Mission wall time (seconds).
+    :param cpu: Controller CPU time (seconds).
+    :param rss: Controller peak RSS (KB).
+    :return: Dictionary of metrics.
+    """
+    duration = index.columns['duration']
+    answered = duration[~np.isnan(duration)]
+
+    def percentiles(values):
+        if len(values) == 0:
+            return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(values.max())}
+
+    # step k is the k-th command of every drone; its skew is the spread of their send times
+    start = index.columns['start'].astype(np.int64) / 1e6
+    drone = index.columns['drone']
+    order = np.lexsort((index.columns['id'], drone))
+    start, drone = start[order], drone[order]
+    drones = np.unique(drone)
+
+    tracks = [start[drone == d] for d in drones]
+    steps = min((len(track) for track in tracks), default=0)
+    skew = np.array([np.ptp([track[k] for track in tracks]) for k in range(steps)]) if len(tracks) > 1 else np.array([])
+
+    return {
+        'name': name,
+        'drones': num,
+        'commands': len(duration),
+        'answered': len(answered),
+        'timeouts': len(duration) - len(answered),
+        'wall_time': wall,
+        'throughput': len(duration) / wall if wall > 0 else None,
+        'ack_latency': percentiles(answered),
+        'start_skew': dict(percentiles(skew), steps=steps),
+        'controller_cpu': cpu,
+        'controller_cpu_share': cpu / wall if wall > 0 else None,
+        'controller_rss_kb': rss,
+    }
+
+
+def check_lost_request(options):
+    """
+    Checks that losing a request does not cost the next command its ack: the simulator drops the
+    first 'speed 50', which is resent and answered, and the 'forward 20' after it must still get its own 'ok'.
+
+    :param options: Dictionary of simulator and run options.
+    :return: A boolean indicating if the check passed.
+    """
+    simulator = TelloSimulator(1, SIMULATOR_IP, ack_latency=options['latency'], jitter=options['jitter'],
+                               exec_scale=options['exec_scale'], seed=options['seed'], drops={'speed 50': 1})
+    ip = simulator.get_ips()[0]
+
+    with contextlib.redirect_stdout(sys.stdout if options['verbose'] else open(os.devnull, 'w')):
+        with simulator:
+            if options['asyncio']:
+                transport = AsyncTelloManager('127.0.0.1', possible_ips=[ip])
+            else:
+                transport = TelloManager('127.0.0.1', possible_ips=[ip])
+            transport.EARLY_ACK *= options['exec_scale']
+            manager = SyncTelloManager(transport) if options['asyncio'] else transport
+
+            try:
+                manager.find_avaliable_tello(1)
+                responses = [manager.send_command(command, ip) for command in ('takeoff', 'speed 50', 'forward 20')]
+            finally:
+                manager.close()
+
+    passed = responses == ['ok', 'ok', 'ok'] and transport.retransmissions == 1
+    print(f'[CHECK] Lost request: RESPONSES = {responses}, RETRIES = {transport.retransmissions}, '
+          f'{"PASSED" if passed else "FAILED"}', file=sys.stderr)
+    return passed
+
+
+def run(name, text, options):
+    """
+    Runs one benchmark case.
+
+    :param name: Case name.
+    :param text: Mission text.
+    :param options: Dictionary of simulator and run options.
+    :return: Dictionary of metrics.
+    """
+    results = multiprocessing.Queue()
+    case = multiprocessing.Process(target=_run_case, args=(name, text, options, results))
+    case.start()
+    case.join()
+
+    if results.empty():
+        raise RuntimeError(f'Benchmark {name} failed (exit code {case.exitcode})')
+    return results.get()
+
+
+def parse_args(args):
+    """
+    Parses arguments.
+    :param args: Arguments.
+    :return: Arguments.
+    """
+    parser = argparse.ArgumentParser('benchmark.py',
+                    epilog='One-Off Coder http://www.oneoffcoder.com')
+
+    parser.add_argument('-f', '--file', help='Mission file (repeatable)', action='append', default=[])
+    parser.add_argument('-n', '--synthetic', help='Synthetic mission drone count (repeatable)',
+                        action='append', type=int, default=[])
+    parser.add_argument('--steps', help='Up/down pairs in synthetic missions', default=5, type=int)
+    parser.add_argument('--latency', help='Simulated ack latency (seconds)', default=0.01, type=float)
+    parser.add_argument('--jitter', help='Simulated ack jitter (seconds)', default=0.005, type=float)
+    parser.add_argument('--loss', help='Simulated packet loss probability', default=0.0, type=float)
+    parser.add_argument('--scale', help='Simulated execution time multiplier', default=1.0, type=float)
+    parser.add_argument('--seed', help='Random seed', default=1, type=int)
+    parser.add_argument('--skip-delays', help='Drop delay lines from missions', action='store_true')
+    parser.add_argument('--asyncio', help='Use the asyncio transport', action='store_true')
+    parser.add_argument('--shards', help='Use the batched transport with this many sockets', default=0, type=int)
+    parser.add_argument('--processes', help='Fly the swarm from this many shard processes', default=0, type=int)
+    parser.add_argument('--no-rate-limit', help='Send without the token bucket rate limiter', action='store_true')
+    parser.add_argument('--no-coalesce', help='Send formation moves axis by axis instead of merging them', action='store_true')
+    parser.add_argument('--merge-actions', help='Merge consecutive moves written on action lines', action='store_true')
+    parser.add_argument('--check', help='Run the protocol checks before the cases', action='store_true')
+    parser.add_argument('--verbose', help='Show the swarm output', action='store_true')
+    parser.add_argument('-o', '--output', help='Write results as JSON to this file', required=False)
+    parser.add_argument('--version', action='version', version='%(prog)s v0.0.1')
+
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+
+    options = {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'loss': args.loss,
+        'exec_scale': args.scale,
+        'seed': args.seed,
+        'skip_delays': args.skip_delays,
+        'asyncio': args.asyncio,
+        'shards': args.shards,
+        'processes': args.processes,
+        'rate_limit': not args.no_rate_limit,
+        'coalesce': not args.no_coalesce,
+        'merge_actions': args.merge_actions,
+        'verbose': args.verbose,
+    }
+
+    if args.check and not check_lost_request(options):
+        sys.exit(1)
+
+    cases = []
+    for fpath in args.file:
+        with open(fpath, 'r') as f:
+            cases.append((os.path.basename(fpath), f.read()))
+    for num in args.synthetic:
+        cases.append((f'synthetic-{num}', make_synthetic_mission(num, args.steps)[0]))
+
+    results = []
+    for name, text in cases:
+        result = run(name, text, options)
+        results.append(result)
+
+        print(f'[BENCH] {name}: drones = {result["drones"]}, commands = {result["commands"]}, '
+              f'timeouts = {result["timeouts"]}, wall = {result["wall_time"]:.2f}s, '
+              f'ack p95 = {result["ack_latency"]["p95"]}, skew max = {result["start_skew"]["max"]}, '
+              f'cpu = {result["controller_cpu"]:.2f}s, rss = {result["controller_rss_kb"]}KB', file=sys.stderr)
+
+    report = json.dumps({'options': options, 'results': results}, indent=2)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
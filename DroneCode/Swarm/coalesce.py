@@ -0,0 +1,109 @@
+class Coalescer(object):
+    """
+    Optimisation pass over a drone's outgoing command stream. Runs of consecutive relative
+    moves (up/down/left/right/forward/back and go without a mission pad) are summed into one
+    vector: zero moves are dropped, opposite moves fold together, and the rest is sent as a
+    single axis move or one 'go x y z speed' when the result stays within SDK limits.
+    Vectors are in the Tello frame: x forward, y left, z up (cm).
+    """
+
+    MIN_MOVE = 20
+    MAX_MOVE = 500
+    DEFAULT_SPEED = 50
+
+    AXES = {
+        'forward': (0, 1), 'back': (0, -1),
+        'left': (1, 1), 'right': (1, -1),
+        'up': (2, 1), 'down': (2, -1),
+    }
+
+    # single axis commands by (axis, sign)
+    WORDS = {v: k for k, v in AXES.items()}
+
+    @staticmethod
+    def parse_move(command):
+        """
+        Parses a relative move.
+
+        :param command: Command.
+        :return: Tuple of (x, y, z), or None if the command is not a mergeable move.
+        """
+        parts = command.split()
+        if len(parts) == 2 and parts[0] in Coalescer.AXES:
+            axis, sign = Coalescer.AXES[parts[0]]
+            vector = [0, 0, 0]
+            vector[axis] = sign * int(parts[1])
+            return tuple(vector)
+
+        if len(parts) == 5 and parts[0] == 'go':
+            return int(parts[1]), int(parts[2]), int(parts[3])
+
+        return None
+
+    @staticmethod
+    def get_commands(vector, speed=DEFAULT_SPEED):
+        """
+        Gets the fewest commands for a relative move.
+
+        :param vector: Tuple of (x, y, z) in the Tello frame.
+        :param speed: Speed (cm/s) for go.
+        :return: List of commands (empty for a zero move), or None if no single command can fly it.
+        """
+        nonzero = [axis for axis in range(3) if vector[axis] != 0]
+        if len(nonzero) == 0:
+            return []
+
+        if any(abs(v) > Coalescer.MAX_MOVE for v in vector):
+            return None
+
+        if len(nonzero) == 1:
+            axis = nonzero[0]
+            distance = vector[axis]
+            if abs(distance) < Coalescer.MIN_MOVE:
+                return None
+            return [f'{Coalescer.WORDS[(axis, 1 if distance > 0 else -1)]} {abs(distance)}']
+
+        if all(abs(v) <= Coalescer.MIN_MOVE for v in vector):
+            return None
+
+        x, y, z = vector
+        return [f'go {x} {y} {z} {speed}']
+
+    @staticmethod
+    def coalesce(commands, speed=DEFAULT_SPEED):
+        """
+        Coalesces a drone's command stream. 'speed N' commands set the speed of later go commands.
+
+        :param commands: List of commands, in order.
+        :param speed: Speed (cm/s) for go until the stream sets one.
+        :return: List of commands.
+        """
+        output = []
+        run = []
+        vector = [0, 0, 0]
+
+        def flush():
+            # a merged go flies no faster than the slowest go it replaces
+            go_speeds = [int(command.split()[4]) for command in run if command.startswith('go ')]
+            merged = Coalescer.get_commands(vector, min(go_speeds, default=speed))
+            output.extend(run if merged is None or len(run) == 1 else merged)
+            del run[:]
+            vector[:] = [0, 0, 0]
+
+        for command in commands:
+            move = Coalescer.parse_move(command)
+            if move is None:
+                flush()
+                output.append(command)
+
+                parts = command.split()
+                if len(parts) == 2 and parts[0] == 'speed':
+                    speed = int(parts[1])
+                continue
+
+            run.append(command)
+            for axis in range(3):
+                vector[axis] += move[axis]
+
+        flush()
+        return output
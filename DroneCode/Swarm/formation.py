@@ -0,0 +1,234 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+class Formation(object):
+    """
+    Formation engine. A formation is an N x 3 array of slot positions (cm) in the show frame:
+    x forward, y right, z up, with the origin at the centre of the starting line.
+    Drone i starts in slot i of line(n). Shapes are generated for any N, and transitions
+    are the per-drone relative moves between two position arrays. The slots of a shape are
+    interchangeable, so assign picks which drone flies to which slot.
+    """
+
+    OBJECTIVES = ('makespan', 'distance')
+
+    # bump when shapes or moves change, so cached transitions are not reused
+    VERSION = 1
+
+    SPACING = 50
+    MIN_MOVE = 20
+    MAX_MOVE = 500
+
+    @staticmethod
+    def _centered(n, spacing):
+        return (np.arange(n) - (n - 1) / 2.0) * spacing
+
+    @staticmethod
+    def _slots(x, y, z):
+        return np.column_stack((x, y, z)).astype(np.float64)
+
+    @staticmethod
+    def line(n, spacing=SPACING):
+        """
+        Line along y (the starting formation).
+
+        :param n: Number of drones.
+        :param spacing: Distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        zeros = np.zeros(n)
+        return Formation._slots(zeros, Formation._centered(n, spacing), zeros)
+
+    @staticmethod
+    def column(n, axis=0, spacing=SPACING):
+        """
+        Line along one axis. Vertical columns start at the current altitude and go up.
+
+        :param n: Number of drones.
+        :param axis: 0 (x), 1 (y) or 2 (z).
+        :param spacing: Distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        positions = np.zeros((n, 3))
+        positions[:, axis] = np.arange(n) * spacing if axis == 2 else Formation._centered(n, spacing)
+        return positions
+
+    @staticmethod
+    def wave(n, amplitude=60, wavelength=2, phase=0.0, spacing=SPACING):
+        """
+        Line along y displaced vertically by a sine wave.
+
+        :param n: Number of drones.
+        :param amplitude: Wave amplitude (cm).
+        :param wavelength: Wavelength in drones (2 alternates up and down).
+        :param phase: Phase (radians).
+        :param spacing: Distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        z = amplitude * np.cos(2 * np.pi * np.arange(n) / wavelength + phase)
+        return Formation._slots(np.zeros(n), Formation._centered(n, spacing), z)
+
+    @staticmethod
+    def triangle(n, spacing=SPACING):
+        """
+        Triangle standing in the y-z plane: bottom row widest, one drone on top.
+        Rows are filled from the bottom; the top row may be incomplete.
+
+        :param n: Number of drones.
+        :param spacing: Distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        rows = int(np.ceil((np.sqrt(8 * n + 1) - 1) / 2))
+        sizes = np.arange(rows, 0, -1)
+        row = np.repeat(np.arange(rows), sizes)[:n]
+        index = np.arange(n) - np.concatenate(([0], np.cumsum(sizes)[:-1]))[row]
+
+        y = (index - (sizes[row] - 1) / 2.0) * spacing
+        z = row * spacing * np.sqrt(3) / 2
+        return Formation._slots(np.zeros(n), y, z)
+
+    @staticmethod
+    def circle(n, radius=None, spacing=SPACING):
+        """
+        Ring in the horizontal plane, centred on the middle of the line.
+
+        :param n: Number of drones.
+        :param radius: Radius (cm); by default just large enough to keep neighbours spacing apart.
+        :param spacing: Minimum distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        return Formation.polygon(n, max(n, 3), radius, spacing)
+
+    @staticmethod
+    def polygon(n, sides, radius=None, spacing=SPACING):
+        """
+        Drones spread evenly along the perimeter of a regular polygon in the horizontal plane.
+
+        :param n: Number of drones.
+        :param sides: Number of sides.
+        :param radius: Circumradius (cm); by default large enough to keep neighbours spacing apart.
+        :param spacing: Minimum distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        side = 2 * np.sin(np.pi / sides)
+        if radius is None:
+            radius = spacing * max(n, sides) / (sides * side)
+
+        # position along the perimeter, in sides
+        t = np.arange(n) * sides / n
+        k = np.floor(t)
+        f = (t - k)[:, None]
+
+        angles = 2 * np.pi * np.column_stack((k, k + 1)) / sides - np.pi / 2
+        start = np.stack((np.cos(angles[:, 0]), np.sin(angles[:, 0])), axis=1)
+        end = np.stack((np.cos(angles[:, 1]), np.sin(angles[:, 1])), axis=1)
+        xy = radius * ((1 - f) * start + f * end)
+
+        return Formation._slots(xy[:, 0], xy[:, 1], np.zeros(n))
+
+    @staticmethod
+    def grid(n, cols=None, spacing=SPACING):
+        """
+        Rectangular grid in the horizontal plane; rows run along y.
+
+        :param n: Number of drones.
+        :param cols: Drones per row; defaults to a square grid.
+        :param spacing: Distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        cols = cols or int(np.ceil(np.sqrt(n)))
+        rows = int(np.ceil(n / cols))
+        index = np.arange(n)
+
+        x = (index // cols - (rows - 1) / 2.0) * spacing
+        y = (index % cols - (cols - 1) / 2.0) * spacing
+        return Formation._slots(x, y, np.zeros(n))
+
+    @staticmethod
+    def helix(n, radius=None, pitch=30, turns=1.0, spacing=SPACING):
+        """
+        Helix rising from the current altitude around the centre of the line.
+
+        :param n: Number of drones.
+        :param radius: Radius (cm); by default large enough to keep neighbours spacing apart.
+        :param pitch: Height gained per drone (cm).
+        :param turns: Number of turns.
+        :param spacing: Minimum distance between neighbours (cm).
+        :return: N x 3 positions.
+        """
+        if radius is None:
+            radius = spacing * n / (2 * np.pi * turns)
+
+        angles = 2 * np.pi * turns * np.arange(n) / n
+        return Formation._slots(radius * np.cos(angles), radius * np.sin(angles), np.arange(n) * pitch)
+
+    @staticmethod
+    def get_distances(current, target):
+        """
+        Gets the flight distance from every drone to every slot.
+
+        :param current: N x 3 current positions.
+        :param target: N x 3 slot positions.
+        :return: N x N distances; rows are drones, columns are slots.
+        """
+        return np.linalg.norm(current[:, None, :] - target[None, :, :], axis=2)
+
+    @staticmethod
+    def assign(current, target, objective='makespan'):
+        """
+        Assigns drones to slots.
+        'distance' minimises the total flight distance (linear sum assignment).
+        'makespan' minimises the longest single flight first (bottleneck assignment, found by
+        binary search over the distinct distances), then the total distance among those assignments.
+
+        :param current: N x 3 current positions.
+        :param target: N x 3 slot positions.
+        :param objective: 'makespan' or 'distance'.
+        :return: Array of slot indices; drone i flies to target[slots[i]].
+        """
+        if objective not in Formation.OBJECTIVES:
+            raise ValueError(f'Unknown assignment objective {objective}')
+
+        distances = Formation.get_distances(current, target)
+
+        if objective == 'makespan' and len(distances) > 1:
+            # smallest threshold that still admits a full assignment using only shorter flights
+            thresholds = np.unique(distances)
+            low, high = 0, len(thresholds) - 1
+            while low < high:
+                mid = (low + high) // 2
+                blocked = (distances > thresholds[mid]).astype(np.int64)
+                rows, cols = linear_sum_assignment(blocked)
+                if blocked[rows, cols].sum() == 0:
+                    high = mid
+                else:
+                    low = mid + 1
+
+            penalty = distances.sum() + 1.0
+            distances = np.where(distances > thresholds[low], penalty, distances)
+
+        rows, cols = linear_sum_assignment(distances)
+        slots = np.empty(len(rows), dtype=np.int64)
+        slots[rows] = cols
+        return slots
+
+    @staticmethod
+    def get_moves(current, target):
+        """
+        Gets the relative moves that take every drone from its current to its target position.
+        Components shorter than the SDK minimum are dropped (the residual stays in the positions),
+        and moves longer than the SDK maximum are split into equal steps.
+
+        :param current: N x 3 current positions.
+        :param target: N x 3 target positions.
+        :return: Tuple of (list of N x 3 integer move arrays, N x 3 positions reached).
+        """
+        moves = np.rint(target - current).astype(np.int64)
+        moves[np.abs(moves) < Formation.MIN_MOVE] = 0
+
+        steps = max(1, int(np.ceil(np.abs(moves).max(initial=0) / Formation.MAX_MOVE)))
+        step = np.where(np.abs(moves) > Formation.MAX_MOVE, moves // steps, 0)
+        last = moves - step * (steps - 1)
+
+        return [step] * (steps - 1) + [last], current + moves
@@ -0,0 +1,179 @@
+import threading
+import time
+
+
+class HealthGate(object):
+    """
+    Preflight health gate. Checks battery, temperature, Wi-Fi SNR and SDK version of every drone
+    at once. Values come from the state stream (battery, temperature) or from earlier query
+    answers (SNR, SDK version) while fresh; only stale values are queried, concurrently across
+    drones and without retransmission, and everything must be known before the deadline.
+    """
+
+    # how old (seconds) a value may be before it is queried again; None never expires
+    MAX_AGE = {
+        'battery': 1.0,
+        'temperature': 1.0,
+        'snr': 10.0,
+        'sdk': None,
+    }
+
+    QUERIES = {
+        'battery': 'battery?',
+        'temperature': 'temp?',
+        'snr': 'wifi?',
+        'sdk': 'sdk?',
+    }
+
+    # minimum battery (%), maximum temperature (C), minimum Wi-Fi SNR, minimum SDK version
+    LIMITS = {
+        'battery': 30,
+        'temperature': 85,
+        'snr': 25,
+        'sdk': 20,
+    }
+
+    DEADLINE = 2.0
+
+    STATE_FIELDS = {
+        'battery': 'bat',
+        'temperature': 'temph',
+    }
+
+    def __init__(self, send, telemetry=None):
+        """
+        Ctor.
+
+        :param send: Function taking (command, IP, timeout) that sends a query once and returns
+            its response, or None if none arrived in time (e.g. TelloManager.send_once).
+        :param telemetry: TelemetryReceiver, or None to always query.
+        """
+        self.send = send
+        self.telemetry = telemetry
+
+        # query answers per IP: {check: (value, monotonic time)}
+        self.answers = {}
+
+    @staticmethod
+    def parse(check, response):
+        """
+        Parses a query response.
+
+        :param check: Check name.
+        :param response: Response text.
+        :return: Number, or None if the response is not one.
+        """
+        if response is None:
+            return None
+
+        text = str(response).strip()
+        if check == 'temperature':
+            # e.g. '62~65C'; the high end counts
+            text = text.rstrip('C').split('~')[-1]
+        try:
+            return float(text)
+        except ValueError:
+            return None
+
+    def _get_cached(self, ip, check, now):
+        """
+        Gets a fresh value without a round trip.
+
+        :param ip: Tello IP.
+        :param check: Check name.
+        :param now: Monotonic time.
+        :return: Tuple of (value, source), or None if stale.
+        """
+        max_age = HealthGate.MAX_AGE[check]
+
+        field = HealthGate.STATE_FIELDS.get(check)
+        if field is not None and self.telemetry is not None:
+            age = self.telemetry.get_age(ip)
+            if age is not None and age <= max_age:
+                value = self.telemetry.get_latest(ip, field)
+                if value == value:
+                    return value, 'STATE'
+
+        answer = self.answers.get(ip, {}).get(check)
+        if answer is not None and (max_age is None or now - answer[1] <= max_age):
+            return answer[0], 'CACHE'
+
+        return None
+
+    def collect(self, ips, checks, deadline):
+        """
+        Collects values for every drone, querying only what is stale.
+
+        :param ips: Tello IPs.
+        :param checks: Check names.
+        :param deadline: Maximum time (seconds) for the whole collection.
+        :return: Dictionary of IP to {check: (value, source)}; value is None if unknown by the deadline.
+        """
+        start = time.monotonic()
+        end = start + deadline
+        values = {ip: {} for ip in ips}
+        stale = {}
+
+        for ip in ips:
+            for check in checks:
+                cached = self._get_cached(ip, check, start)
+                if cached is None:
+                    stale.setdefault(ip, []).append(check)
+                else:
+                    values[ip][check] = cached
+
+        # a drone answers one command at a time, so its queries are sent in turn; drones are queried at once
+        answers = {}
+        threads = [threading.Thread(target=self._query, args=(ip, stale[ip], end, answers), daemon=True)
+                   for ip in stale]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0.0, end - time.monotonic()))
+
+        answers = dict(answers)
+        for ip in stale:
+            for check in stale[ip]:
+                values[ip][check] = answers.get((ip, check), (None, 'TIMEOUT'))
+
+        return values
+
+    def _query(self, ip, checks, end, answers):
+        """
+        Queries a drone's stale values, each sent once, until the deadline.
+
+        :param ip: Tello IP.
+        :param checks: Check names.
+        :param end: Monotonic time of the deadline.
+        :param answers: Dictionary the values are put in, keyed by (IP, check).
+        :return: None.
+        """
+        for check in checks:
+            timeout = end - time.monotonic()
+            if timeout <= 0:
+                return
+
+            response = self.send(HealthGate.QUERIES[check], ip, timeout)
+            if response is None:
+                continue
+
+            value = HealthGate.parse(check, response)
+            answers[(ip, check)] = (value, 'QUERY')
+            if value is not None:
+                self.answers.setdefault(ip, {})[check] = (value, time.monotonic())
+
+    @staticmethod
+    def evaluate(value, check, limit):
+        """
+        Checks one value against its limit.
+
+        :param value: Value, or None if unknown.
+        :param check: Check name.
+        :param limit: Minimum (battery, snr, sdk) or maximum (temperature).
+        :return: A boolean indicating if the check passed.
+        """
+        if value is None:
+            return False
+        if check == 'temperature':
+            return value <= limit
+        return value >= limit
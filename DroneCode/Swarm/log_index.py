@@ -0,0 +1,323 @@
+import argparse
+import glob
+import os
+import sys
+import numpy as np
+
+
+class LogIndex(object):
+    """
+    Columnar index over session logs in ./log.
+    Every logged command is one row; string fields are stored as integer codes into lookup tables,
+    so queries are NumPy operations over whole columns.
+    Reads both the per-drone block format ('------' / 'Drone: N') and the streamed 'drone=<ip>, ...' lines.
+    """
+
+    CACHE_NAME = '.log_index.npz'
+
+    # columns stored as codes into the table of the same name
+    CODED = ('drone', 'command', 'command_type', 'response')
+
+    def __init__(self, columns, tables):
+        """
+        Ctor.
+
+        :param columns: Dictionary of equally long arrays: session, drone, command, command_type,
+                        response (codes), id, start (datetime64[us]), duration (seconds, NaN if unanswered).
+        :param tables: Dictionary of lookup tables for the coded columns.
+        """
+        self.columns = columns
+        self.tables = tables
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @staticmethod
+    def build(dpath='./log', use_cache=True):
+        """
+        Loads every log in a directory. With the cache, only logs that are new or whose size or
+        modification time changed since the cached index was built are parsed; the rows of the
+        others are reused.
+
+        :param dpath: Log directory.
+        :param use_cache: Whether to read and write the cached index.
+        :return: LogIndex.
+        """
+        fpaths = sorted(glob.glob(os.path.join(dpath, '*.txt')))
+        sessions = [os.path.basename(f)[:-4] for f in fpaths]
+        manifest = np.array([f'{os.path.basename(f)}:{os.path.getsize(f)}:{os.path.getmtime(f)}' for f in fpaths])
+        cache_path = os.path.join(dpath, LogIndex.CACHE_NAME)
+
+        cached, cached_manifest = None, None
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path, allow_pickle=False) as data:
+                    columns = {k[4:]: data[k] for k in data.files if k.startswith('col_')}
+                    tables = {k[4:]: list(data[k]) for k in data.files if k.startswith('tab_')}
+                    cached, cached_manifest = LogIndex(columns, tables), data['manifest']
+            except (OSError, KeyError, ValueError):
+                cached = None
+
+        if cached is not None and np.array_equal(cached_manifest, manifest):
+            return cached
+
+        if cached is not None:
+            # sessions are cached in the order of their manifest entries
+            unchanged = np.isin(cached_manifest, manifest)
+            kept = cached.select(unchanged[cached.columns['session']])
+            reused = set(cached_manifest[unchanged])
+            changed = [(session, f) for session, f, entry in zip(sessions, fpaths, manifest) if entry not in reused]
+            index = LogIndex.concat([kept, LogIndex.parse(changed)], sessions)
+        else:
+            index = LogIndex.parse(list(zip(sessions, fpaths)))
+
+        if use_cache:
+            arrays = {f'col_{k}': v for k, v in index.columns.items()}
+            arrays.update({f'tab_{k}': np.array(v, dtype=str) for k, v in index.tables.items()})
+            try:
+                with open(cache_path, 'wb') as f:
+                    np.savez(f, manifest=manifest, **arrays)
+            except OSError:
+                pass
+
+        return index
+
+    @staticmethod
+    def concat(indexes, sessions):
+        """
+        Concatenates indexes, recoding their coded columns into shared tables.
+
+        :param indexes: List of LogIndex.
+        :param sessions: Session names of the result, in order; every row's session must be one of them.
+        :return: LogIndex with rows ordered by session.
+        """
+        tables = {'session': list(sessions)}
+        codes = {'session': {session: c for c, session in enumerate(sessions)}}
+        for name in LogIndex.CODED:
+            codes[name] = {}
+            for index in indexes:
+                for value in index.tables[name]:
+                    codes[name].setdefault(value, len(codes[name]))
+            tables[name] = list(codes[name])
+
+        parts = {k: [] for k in indexes[0].columns}
+        for index in indexes:
+            for k, v in index.columns.items():
+                if k in codes:
+                    # sessions dropped from the result have no rows left, so no code
+                    lookup = np.array([codes[k].get(value, -1) for value in index.tables[k]], dtype=np.int32)
+                    v = lookup[v] if len(v) > 0 else v.astype(np.int32)
+                parts[k].append(v)
+
+        columns = {k: np.concatenate(v) for k, v in parts.items()}
+        order = np.argsort(columns['session'], kind='stable')
+        return LogIndex({k: v[order] for k, v in columns.items()}, tables)
+
+    @staticmethod
+    def parse(sessions):
+        """
+        Parses session logs.
+
+        :param sessions: List of (session name, file path).
+        :return: LogIndex.
+        """
+        codes = {name: {} for name in ('drone', 'command', 'command_type', 'response')}
+
+        def code(table, value):
+            c = codes[table].get(value)
+            if c is None:
+                c = codes[table][value] = len(codes[table])
+            return c
+
+        session_col, drone_col, command_col, type_col, response_col, id_col = [], [], [], [], [], []
+        start_col, duration_col = [], []
+
+        for s, (session, fpath) in enumerate(sessions):
+            drone = None
+            partial = None
+
+            with open(fpath, 'r', errors='replace') as f:
+                for line in f:
+                    line = line.rstrip('\r\n')
+
+                    if line.startswith('Drone: '):
+                        drone = code('drone', line[7:])
+                        continue
+
+                    if line.startswith('drone='):
+                        label, _, line = line.partition(', ')
+                        drone = code('drone', label[6:])
+
+                    # responses ending in '\r\n' (e.g. battery?) split a record over two lines
+                    if partial is not None:
+                        if line == '':
+                            continue
+                        line, partial = partial + line, None
+                    elif line.startswith('id=') and ', duration=' not in line:
+                        partial = line
+                        continue
+
+                    if not line.startswith('id='):
+                        continue
+
+                    # parse from the right: command and response may contain anything
+                    fields = line.rsplit(', ', 3)
+                    if len(fields) != 4:
+                        continue
+
+                    head, start, end, duration = fields
+                    id, _, rest = head.partition(', command=')
+                    command, _, response = rest.rpartition(', response=')
+
+                    # a truncated or garbled record is skipped rather than failing the whole corpus
+                    if not (id[3:].isdigit() and start.startswith('start_time=') and end.startswith('end_time=')
+                            and duration.startswith('duration=') and LogIndex._is_valid(start[11:], duration[9:])):
+                        continue
+
+                    session_col.append(s)
+                    drone_col.append(drone)
+                    command_col.append(code('command', command))
+                    type_col.append(code('command_type', command.partition(' ')[0]))
+                    response_col.append(code('response', response))
+                    id_col.append(id[3:])
+                    start_col.append(start[11:])
+                    duration_col.append(duration[9:])
+
+        columns = {
+            'session': np.array(session_col, dtype=np.int32),
+            'drone': np.array(drone_col, dtype=np.int32),
+            'command': np.array(command_col, dtype=np.int32),
+            'command_type': np.array(type_col, dtype=np.int32),
+            'response': np.array(response_col, dtype=np.int32),
+            'id': np.array(id_col, dtype=np.int64),
+            'start': np.array(start_col, dtype='datetime64[us]'),
+            'duration': np.char.replace(np.array(duration_col, dtype=str), 'None', 'nan').astype(np.float64)
+        }
+
+        tables = {name: list(table) for name, table in codes.items()}
+        tables['session'] = [session for session, _ in sessions]
+
+        return LogIndex(columns, tables)
+
+    @staticmethod
+    def _is_valid(start, duration):
+        """
+        Checks if the start time and duration of a record can be parsed.
+
+        :param start: Start time text.
+        :param duration: Duration text.
+        :return: A boolean indicating if the record is valid.
+        """
+        try:
+            np.datetime64(start, 'us')
+            if duration != 'None':
+                float(duration)
+        except ValueError:
+            return False
+        return True
+
+    def select(self, mask):
+        """
+        Selects rows.
+
+        :param mask: Boolean mask or index array.
+        :return: LogIndex with the selected rows.
+        """
+        return LogIndex({k: v[mask] for k, v in self.columns.items()}, self.tables)
+
+    def responders_only(self):
+        """
+        Drops the (session, drone) pairs that never answered anything,
+        i.e. discovery probes sent to addresses without a Tello.
+
+        :return: LogIndex.
+        """
+        answered = ~np.isnan(self.columns['duration'])
+        pair = self.columns['session'].astype(np.int64) * (len(self.tables['drone']) + 1) + self.columns['drone']
+        return self.select(np.isin(pair, np.unique(pair[answered])))
+
+    def latency(self, by='command_type', percentiles=(50, 95, 99)):
+        """
+        Ack latency percentiles and timeout rate per group.
+
+        :param by: Column to group by: 'command_type', 'command', 'drone' or 'session'.
+        :param percentiles: Percentiles to compute.
+        :return: List of dictionaries (one per group), largest total ack time first.
+        """
+        keys = self.columns[by]
+        duration = self.columns['duration']
+
+        order = np.argsort(keys, kind='stable')
+        keys, duration = keys[order], duration[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+
+        rows = []
+        for group, values in zip(np.split(keys, bounds), np.split(duration, bounds)):
+            if len(group) == 0:
+                continue
+
+            answered = values[~np.isnan(values)]
+            row = {
+                by: self.tables[by][group[0]],
+                'count': len(values),
+                'timeout_rate': 1.0 - len(answered) / len(values),
+                'total': float(answered.sum())
+            }
+
+            quantiles = np.percentile(answered, percentiles) if len(answered) > 0 else [np.nan] * len(percentiles)
+            row.update({f'p{p}': float(q) for p, q in zip(percentiles, quantiles)})
+            rows.append(row)
+
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+
+def print_latency(rows, by, percentiles):
+    """
+    Prints a latency table.
+
+    :param rows: Rows from LogIndex.latency.
+    :param by: Grouping column.
+    :param percentiles: Percentiles in the rows.
+    :return: None.
+    """
+    headers = [by, 'count', 'timeout'] + [f'p{p}' for p in percentiles] + ['total']
+    print(' '.join(f'{h:>12}' for h in headers))
+
+    for row in rows:
+        vals = [str(row[by])[:24], row['count'], f'{row["timeout_rate"]:.1%}']
+        vals += [f'{row[f"p{p}"]:.3f}' for p in percentiles] + [f'{row["total"]:.1f}']
+        print(' '.join(f'{v:>12}' for v in vals))
+
+
+def parse_args(args):
+    """
+    Parses arguments.
+    :param args: Arguments.
+    :return: Arguments.
+    """
+    parser = argparse.ArgumentParser('log_index.py',
+                    epilog='One-Off Coder http://www.oneoffcoder.com')
+
+    parser.add_argument('-d', '--dir', help='Log directory', default='./log', required=False)
+    parser.add_argument('-b', '--by', help='Group by', default='command_type',
+                        choices=['command_type', 'command', 'drone', 'session'], required=False)
+    parser.add_argument('-s', '--session', help='Only this session (log file name without .txt)', required=False)
+    parser.add_argument('--all', help='Keep drones that never answered (discovery probes)', action='store_true')
+    parser.add_argument('--no-cache', help='Rebuild the index from the logs', action='store_true')
+    parser.add_argument('--version', action='version', version='%(prog)s v0.0.1')
+
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    percentiles = (50, 95, 99)
+
+    index = LogIndex.build(args.dir, not args.no_cache)
+
+    if args.session is not None:
+        index = index.select(index.columns['session'] == index.tables['session'].index(args.session))
+    if not args.all:
+        index = index.responders_only()
+
+    print_latency(index.latency(args.by, percentiles), args.by, percentiles)
@@ -0,0 +1,524 @@
+import re
+from coalesce import Coalescer
+from plan_cache import PlanCache
+
+
+class MissionError(Exception):
+    """
+    Raised when a mission file does not compile. Lists every error with its line number.
+    """
+
+    def __init__(self, fpath, errors):
+        """
+        Ctor.
+
+        :param fpath: Mission file path.
+        :param errors: List of (line number, message).
+        """
+        self.fpath = fpath
+        self.errors = errors
+
+        lines = [f'{fpath}:{line_no}: {message}' for line_no, message in errors]
+        super().__init__(f'{len(errors)} error(s) in mission\n' + '\n'.join(lines))
+
+
+class Op(object):
+    """
+    Mission instruction opcodes.
+    """
+
+    COMMENT = 'comment'
+    SCAN = 'scan'
+    ACTION = 'action'
+    BATTERY_CHECK = 'battery_check'
+    PREFLIGHT = 'preflight'
+    DELAY = 'delay'
+    CORRECT_IP = 'correct_ip'
+    ASSIGN = 'assign'
+    SYNC = 'sync'
+    READ_PAD = 'read_pad'
+    POLY = 'poly'
+    VERTICAL = 'vertical'
+    TRIANGLE = 'triangle'
+    WAVE = 'wave'
+    CIRCLE = 'circle'
+    LINE = 'line'
+    GRID = 'grid'
+    HELIX = 'helix'
+    CUE = 'cue'
+    TIMELINE = 'timeline'
+
+
+class Instruction(object):
+    """
+    One compiled mission instruction.
+    """
+
+    __slots__ = ('op', 'args', 'line_no', 'text')
+
+    def __init__(self, op, args, line_no, text):
+        """
+        Ctor.
+
+        :param op: Opcode (see Op).
+        :param args: Tuple of typed arguments for the op's handler.
+        :param line_no: Line number in the mission file.
+        :param text: Source line.
+        """
+        self.op = op
+        self.args = args
+        self.line_no = line_no
+        self.text = text
+
+    def __repr__(self):
+        return f'{self.line_no}: {self.op}{self.args}'
+
+
+class Mission(object):
+    """
+    Mission compiler. Parses a command file into a list of typed instructions and
+    validates drone IDs, SNs and SDK command arguments before anything flies.
+
+    Instruction arguments:
+        COMMENT (text,)            SCAN (num,)             ACTION (ids, action)
+        BATTERY_CHECK (threshold,) DELAY (seconds,)        CORRECT_IP ()
+        PREFLIGHT (limits, deadline)
+        ASSIGN (id, sn)            SYNC (timeout,)         READ_PAD ()
+        POLY (sides,)              VERTICAL/TRIANGLE/WAVE/CIRCLE/LINE/GRID/HELIX ()
+        TIMELINE (tracks,)
+    IDs are 0-based.
+
+    Consecutive cue lines ('@<seconds> <target>><action>', e.g. '@2.5 *>up 50') form one
+    TIMELINE whose tracks map each drone ID to its (offset, action) cues in time order.
+    Offsets are relative to the start of the timeline.
+    """
+
+    # bump when the compiled output changes, so cached plans are not reused
+    VERSION = 2
+
+    DISTANCE = (20, 500)
+    COORDINATE = (-500, 500)
+    SN_PATTERN = re.compile(r'^[0-9A-Z]{14}$')
+
+    # argument ranges of SDK commands; None accepts any text arguments
+    SDK_COMMANDS = {
+        'command': (), 'takeoff': (), 'land': (), 'emergency': (), 'stop': (),
+        'streamon': (), 'streamoff': (), 'mon': (), 'moff': (),
+        'up': (DISTANCE,), 'down': (DISTANCE,), 'left': (DISTANCE,),
+        'right': (DISTANCE,), 'forward': (DISTANCE,), 'back': (DISTANCE,),
+        'cw': ((1, 3600),), 'ccw': ((1, 3600),),
+        'go': (COORDINATE, COORDINATE, COORDINATE, (10, 100)),
+        'curve': (COORDINATE, COORDINATE, COORDINATE, COORDINATE, COORDINATE, COORDINATE, (10, 60)),
+        'speed': ((10, 100),),
+        'mdirection': ((0, 2),),
+        'rc': ((-100, 100), (-100, 100), (-100, 100), (-100, 100)),
+        'flip': None, 'wifi': None, 'ap': None,
+    }
+
+    SDK_QUERIES = {
+        'speed?', 'battery?', 'time?', 'wifi?', 'sdk?', 'sn?', 'height?',
+        'temp?', 'attitude?', 'baro?', 'acceleration?', 'tof?',
+    }
+
+    # commands that may end with a mission pad ID
+    PAD_COMMANDS = {'go', 'curve'}
+    PAD_PATTERN = re.compile(r'^m-?[1-8]$')
+
+    # left, right, forward, back
+    FLIP_DIRECTIONS = {'l', 'r', 'f', 'b'}
+
+    PREFLIGHT_RANGES = {
+        'battery': (0, 100),
+        'temperature': (0, 150),
+        'snr': (0, 100),
+        'sdk': (0, None),
+    }
+
+    SHAPES = {
+        'vertical': Op.VERTICAL, 'triangle': Op.TRIANGLE, 'wave': Op.WAVE, 'circle': Op.CIRCLE,
+        'line': Op.LINE, 'grid': Op.GRID, 'helix': Op.HELIX,
+    }
+
+    ACTION_PATTERN = re.compile(r'^(\*|\d+)\s*>\s*(.*)$')
+    ASSIGN_PATTERN = re.compile(r'^(\d+)\s*=\s*(\S*)$')
+    CUE_PATTERN = re.compile(r'^@\s*(\S+)\s+(.*)$')
+
+    def __init__(self, fpath, instructions):
+        """
+        Ctor.
+
+        :param fpath: Mission file path.
+        :param instructions: List of Instructions.
+        """
+        self.fpath = fpath
+        self.instructions = instructions
+
+    def __iter__(self):
+        return iter(self.instructions)
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def get_drone_ids(self):
+        """
+        Gets the drones the mission flies by ID: the targets of actions and cues, and every
+        scanned drone if it flies a formation.
+
+        :return: Sorted list of 0-based IDs.
+        """
+        ids = set()
+        num = 0
+
+        for instruction in self.instructions:
+            if instruction.op == Op.SCAN:
+                num = instruction.args[0]
+            elif instruction.op == Op.ACTION:
+                ids.update(instruction.args[0])
+            elif instruction.op == Op.TIMELINE:
+                ids.update(instruction.args[0].keys())
+            elif instruction.op == Op.POLY or instruction.op in Mission.SHAPES.values():
+                ids.update(range(num))
+
+        return sorted(ids)
+
+    @staticmethod
+    def load(fpath, coalesce=False, cache=None):
+        """
+        Compiles a mission file.
+
+        :param fpath: Mission file path.
+        :param coalesce: Whether to merge consecutive moves of each drone (see Coalescer); this changes
+                         the choreography as written (e.g. 'up 50', 'down 50' cancel out), so it is opt-in.
+        :param cache: PlanCache; the compiled mission is reused while the file content is unchanged.
+        :return: Mission.
+        """
+        with open(fpath, 'rb') as f:
+            content = f.read()
+
+        def compile():
+            return Mission.compile(content.decode('utf-8').splitlines(), fpath, coalesce)
+
+        if cache is None:
+            return compile()
+
+        key = PlanCache.make_key('mission', Mission.VERSION, coalesce, content)
+        mission = cache.get_or_compute(key, compile)
+        mission.fpath = fpath
+        return mission
+
+    @staticmethod
+    def compile(lines, fpath='<mission>', coalesce=False):
+        """
+        Compiles mission lines.
+
+        :param lines: Lines of the mission.
+        :param fpath: Mission file path, for error messages.
+        :param coalesce: Whether to merge consecutive moves of each drone (see Coalescer).
+        :return: Mission.
+        """
+        instructions = []
+        errors = []
+        state = {'num': None, 'sns': {}}
+
+        for line_no, line in enumerate(lines, 1):
+            text = line.strip()
+            if len(text) == 0:
+                continue
+
+            try:
+                instructions.append(Instruction(*Mission._parse(text, state), line_no, text))
+            except ValueError as e:
+                errors.append((line_no, str(e)))
+
+        if len(errors) > 0:
+            raise MissionError(fpath, errors)
+
+        instructions = Mission._link_timelines(instructions)
+        if coalesce:
+            instructions = Mission._coalesce_actions(instructions)
+
+        return Mission(fpath, instructions)
+
+    @staticmethod
+    def _coalesce_actions(instructions):
+        """
+        Runs Coalescer over each drone's stream within every run of consecutive actions.
+        A run whose streams do not shrink is kept as written; otherwise it is replaced by
+        one single-drone action per remaining command, interleaved across drones.
+
+        :param instructions: List of Instructions.
+        :return: List of Instructions.
+        """
+        coalesced = []
+        run = []
+
+        def flush():
+            streams = {}
+            for instruction in run:
+                ids, action = instruction.args
+                for id in ids:
+                    streams.setdefault(id, []).append(action)
+
+            merged = {id: Coalescer.coalesce(stream) for id, stream in streams.items()}
+            if all(len(merged[id]) == len(streams[id]) for id in streams):
+                coalesced.extend(run)
+            else:
+                line_no = run[0].line_no
+                steps = max(len(commands) for commands in merged.values())
+                for k in range(steps):
+                    for id, commands in merged.items():
+                        if k < len(commands):
+                            coalesced.append(Instruction(Op.ACTION, ((id,), commands[k]), line_no, commands[k]))
+            del run[:]
+
+        for instruction in instructions:
+            if instruction.op == Op.ACTION:
+                run.append(instruction)
+                continue
+            if len(run) > 0:
+                flush()
+            coalesced.append(instruction)
+
+        if len(run) > 0:
+            flush()
+
+        return coalesced
+
+    @staticmethod
+    def _link_timelines(instructions):
+        """
+        Groups runs of consecutive cues into TIMELINE instructions.
+        Comments between cues do not break a run; they are kept after its timeline.
+
+        :param instructions: List of Instructions.
+        :return: List of Instructions.
+        """
+        linked = []
+        timeline = None
+        comments = []
+
+        for instruction in instructions:
+            if instruction.op == Op.CUE:
+                if timeline is None:
+                    timeline = Instruction(Op.TIMELINE, ({},), instruction.line_no, instruction.text)
+                offset, ids, action = instruction.args
+                for id in ids:
+                    timeline.args[0].setdefault(id, []).append((offset, action))
+            elif instruction.op == Op.COMMENT and timeline is not None:
+                comments.append(instruction)
+            else:
+                if timeline is not None:
+                    linked.append(timeline)
+                    linked.extend(comments)
+                    timeline, comments = None, []
+                linked.append(instruction)
+
+        if timeline is not None:
+            linked.append(timeline)
+            linked.extend(comments)
+
+        for instruction in linked:
+            if instruction.op == Op.TIMELINE:
+                for cues in instruction.args[0].values():
+                    cues.sort(key=lambda cue: cue[0])
+
+        return linked
+
+    @staticmethod
+    def _parse(text, state):
+        """
+        Parses one non-empty line.
+
+        :param text: Stripped line.
+        :param state: Compiler state: scanned drone count and SN assignments.
+        :return: Tuple of (op, args).
+        """
+        if text.startswith('//'):
+            return Op.COMMENT, (text,)
+
+        match = Mission.CUE_PATTERN.match(text)
+        if match is not None:
+            offset = Mission._parse_number(match.group(1), float, 0, None, 'cue time')
+            op, (ids, action) = Mission._parse(match.group(2), state)
+            if op != Op.ACTION:
+                raise ValueError('a cue must be a drone action, e.g. @1.5 *>up 50')
+            return Op.CUE, (offset, ids, action)
+
+        match = Mission.ACTION_PATTERN.match(text)
+        if match is not None:
+            target, action = match.group(1), match.group(2).strip()
+            ids = Mission._parse_targets(target, state)
+            Mission._validate_action(action)
+            return Op.ACTION, (ids, action)
+
+        match = Mission.ASSIGN_PATTERN.match(text)
+        if match is not None:
+            id = Mission._parse_id(match.group(1), state)
+            sn = match.group(2)
+            if Mission.SN_PATTERN.match(sn) is None:
+                raise ValueError(f'invalid serial number {sn!r}')
+            if sn in state['sns'] and state['sns'][sn] != id:
+                raise ValueError(f'serial number {sn} already assigned to drone {state["sns"][sn] + 1}')
+            state['sns'][sn] = id
+            return Op.ASSIGN, (id, sn)
+
+        word, _, rest = text.partition(' ')
+        rest = rest.strip()
+
+        if word == 'scan':
+            num = Mission._parse_number(rest, int, 1, 254, 'scan')
+            state['num'] = num
+            return Op.SCAN, (num,)
+        if word == 'battery_check':
+            return Op.BATTERY_CHECK, (Mission._parse_number(rest, int, 0, 100, 'battery_check'),)
+        if word == 'preflight':
+            if state['num'] is None:
+                raise ValueError('preflight before scan')
+            return Op.PREFLIGHT, Mission._parse_preflight(rest)
+        if word == 'delay':
+            return Op.DELAY, (Mission._parse_number(rest, float, 0, None, 'delay'),)
+        if word == 'sync':
+            return Op.SYNC, (Mission._parse_number(rest, float, 0, None, 'sync'),)
+        if word == 'poly':
+            return Op.POLY, (Mission._parse_number(rest, int, 3, 360, 'poly'),)
+
+        if word in ('correct_ip', 'read_pad') or word in Mission.SHAPES:
+            if len(rest) > 0:
+                raise ValueError(f'{word} takes no arguments')
+            if state['num'] is None:
+                raise ValueError(f'{word} before scan')
+            op = Mission.SHAPES.get(word, Op.CORRECT_IP if word == 'correct_ip' else Op.READ_PAD)
+            return op, ()
+
+        raise ValueError(f'unknown instruction {text!r}')
+
+    @staticmethod
+    def _parse_preflight(text):
+        """
+        Parses preflight options, e.g. 'battery=50 temperature=80 snr=30 sdk=20 deadline=1.5'.
+
+        :param text: Options text.
+        :return: Tuple of (limits dictionary, deadline or None).
+        """
+        limits = {}
+        deadline = None
+
+        for option in text.split():
+            key, _, value = option.partition('=')
+            if key == 'deadline':
+                deadline = Mission._parse_number(value, float, 0, None, 'preflight deadline')
+            elif key in Mission.PREFLIGHT_RANGES:
+                low, high = Mission.PREFLIGHT_RANGES[key]
+                limits[key] = Mission._parse_number(value, float, low, high, f'preflight {key}')
+            else:
+                raise ValueError(f'unknown preflight option {option!r}')
+
+        return limits, deadline
+
+    @staticmethod
+    def _parse_number(text, kind, low, high, name):
+        """
+        Parses a numeric argument and checks its range.
+
+        :param text: Argument text.
+        :param kind: int or float.
+        :param low: Minimum, or None.
+        :param high: Maximum, or None.
+        :param name: Instruction name, for error messages.
+        :return: Number.
+        """
+        try:
+            value = kind(text)
+        except ValueError:
+            raise ValueError(f'{name} expects one {kind.__name__} argument, got {text!r}')
+
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise ValueError(f'{name} argument {value} out of range [{low}, {high}]')
+        return value
+
+    @staticmethod
+    def _parse_id(text, state):
+        """
+        Parses a 1-based drone ID.
+
+        :param text: ID text.
+        :param state: Compiler state.
+        :return: 0-based ID.
+        """
+        if state['num'] is None:
+            raise ValueError(f'drone {text} used before scan')
+
+        id = int(text)
+        if id < 1 or id > state['num']:
+            raise ValueError(f'drone {id} out of range [1, {state["num"]}]')
+        return id - 1
+
+    @staticmethod
+    def _parse_targets(target, state):
+        """
+        Parses the target of an action: '*' or a drone ID.
+
+        :param target: Target text.
+        :param state: Compiler state.
+        :return: Tuple of 0-based IDs.
+        """
+        if target == '*':
+            if state['num'] is None:
+                raise ValueError('* used before scan')
+            return tuple(range(state['num']))
+        return (Mission._parse_id(target, state),)
+
+    @staticmethod
+    def _validate_action(action):
+        """
+        Checks an SDK command (optionally 'Re '-prefixed) and its arguments.
+
+        :param action: Command text.
+        :return: None.
+        """
+        if action.startswith('Re '):
+            action = action[3:].strip()
+
+        parts = action.split()
+        if len(parts) == 0:
+            raise ValueError('empty action')
+
+        word, args = parts[0], parts[1:]
+
+        if word in Mission.SDK_QUERIES:
+            if len(args) > 0:
+                raise ValueError(f'{word} takes no arguments')
+            return
+
+        if word not in Mission.SDK_COMMANDS:
+            raise ValueError(f'unknown SDK command {word!r}')
+
+        if word == 'flip':
+            if len(args) != 1 or args[0] not in Mission.FLIP_DIRECTIONS:
+                raise ValueError(f'flip expects one direction of {sorted(Mission.FLIP_DIRECTIONS)}')
+            return
+
+        spec = Mission.SDK_COMMANDS[word]
+        if spec is None:
+            return
+
+        if word in Mission.PAD_COMMANDS and len(args) == len(spec) + 1:
+            if Mission.PAD_PATTERN.match(args[-1]) is None:
+                raise ValueError(f'invalid mission pad {args[-1]!r}')
+            args = args[:-1]
+
+        if len(args) != len(spec):
+            raise ValueError(f'{word} expects {len(spec)} argument(s), got {len(args)}')
+
+        values = []
+        for arg, (low, high) in zip(args, spec):
+            try:
+                value = int(arg)
+            except ValueError:
+                raise ValueError(f'{word} argument {arg!r} is not an integer')
+            if value < low or value > high:
+                raise ValueError(f'{word} argument {value} out of range [{low}, {high}]')
+            values.append(value)
+
+        if word == 'go' and all(-20 <= v <= 20 for v in values[:3]):
+            raise ValueError('go needs at least one of x, y, z outside [-20, 20]')
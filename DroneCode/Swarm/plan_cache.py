@@ -0,0 +1,149 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from contextlib import suppress
+
+
+class PlanCache(object):
+    """
+    Content-addressed cache of compiled plans (missions and formation command streams).
+    Entries are keyed by a hash of everything the plan depends on, kept in memory and
+    persisted as one file per entry. Both are bounded: past max_entries in memory or max_bytes
+    on disk, the least recently used entries are evicted.
+    """
+
+    SUFFIX = '.plan'
+
+    def __init__(self, dpath='./.plan_cache', max_bytes=16 * 1024 * 1024, max_entries=256):
+        """
+        Ctor.
+
+        :param dpath: Cache directory.
+        :param max_bytes: Maximum total size (bytes) of the cached files.
+        :param max_entries: Maximum number of plans kept in memory.
+        """
+        self.dpath = dpath
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        # least recently used first
+        self.memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Hashes the parts a plan depends on. Bytes are hashed as is, anything else by its repr.
+
+        :param parts: Key parts.
+        :return: Key (hex digest).
+        """
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part if isinstance(part, bytes) else repr(part).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.dpath, key + PlanCache.SUFFIX)
+
+    def get(self, key):
+        """
+        Gets a cached plan.
+
+        :param key: Key.
+        :return: Plan, or None if not cached.
+        """
+        if key in self.memo:
+            self.memo.move_to_end(key)
+            return self.memo[key]
+
+        fpath = self._get_path(key)
+        try:
+            with open(fpath, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            with suppress(OSError):
+                os.remove(fpath)
+            return None
+
+        # the modification time orders entries for eviction
+        with suppress(OSError):
+            os.utime(fpath)
+
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key, value):
+        """
+        Keeps a plan in memory, evicting the least recently used ones past max_entries.
+
+        :param key: Key.
+        :param value: Plan.
+        :return: None.
+        """
+        self.memo[key] = value
+        self.memo.move_to_end(key)
+        while len(self.memo) > self.max_entries:
+            self.memo.popitem(last=False)
+
+    def put(self, key, value):
+        """
+        Caches a plan.
+
+        :param key: Key.
+        :param value: Plan (must be picklable).
+        :return: None.
+        """
+        self._remember(key, value)
+
+        fpath = self._get_path(key)
+        tmp = f'{fpath}.tmp'
+        with suppress(OSError):
+            os.makedirs(self.dpath, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, fpath)
+            self._evict()
+
+    def get_or_compute(self, key, compute):
+        """
+        Gets a cached plan, computing and caching it on a miss.
+
+        :param key: Key.
+        :param compute: Function without arguments that builds the plan.
+        :return: Plan.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes.
+
+        :return: None.
+        """
+        entries = []
+        for entry in os.scandir(self.dpath):
+            if entry.name.endswith(PlanCache.SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, fpath in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with suppress(OSError):
+                os.remove(fpath)
+                total -= size
@@ -1,6 +1,10 @@
 import sys
 import argparse
 from swarm import *
+from async_tello import SyncTelloManager
+from batched_tello import BatchedTelloManager
+from sharded_swarm import ShardedSwarm
+from mission import Mission, MissionError
 
 def parse_args(args):
     """
@@ -12,6 +16,13 @@ def parse_args(args):
                     epilog='One-Off Coder http://www.oneoffcoder.com')
 
     parser.add_argument('-f', '--file', help='Command text file', required=True)
+    parser.add_argument('--check', help='Only compile and validate the command file', action='store_true')
+    parser.add_argument('--no-coalesce', help='Send formation moves axis by axis instead of merging them', action='store_true')
+    parser.add_argument('--merge-actions', help='Merge consecutive moves written on action lines (changes their paths)',
+                        action='store_true')
+    parser.add_argument('--asyncio', help='Use the asyncio transport', action='store_true')
+    parser.add_argument('--shards', help='Use the batched transport with this many sockets', default=0, type=int)
+    parser.add_argument('--processes', help='Fly the swarm from this many shard processes', default=0, type=int)
     parser.add_argument('--version', action='version', version='%(prog)s v0.0.1')
 
     return parser.parse_args(args)
@@ -20,5 +31,27 @@ if __name__ == '__main__':
     args = parse_args(sys.argv[1:])
     fpath = args.file
 
-    swarm = Swarm(fpath)
+    try:
+        mission = Mission.load(fpath, args.merge_actions)
+    except MissionError as e:
+        print(f'[MISSION] {e}')
+        sys.exit(1)
+
+    if args.check:
+        for instruction in mission:
+            print(f'[MISSION] {instruction}')
+        sys.exit(0)
+
+    if args.asyncio:
+        manager = SyncTelloManager()
+    elif args.shards > 0:
+        manager = BatchedTelloManager(shards=BatchedTelloManager.make_shards(args.shards))
+    else:
+        manager = None
+
+    if args.processes > 0:
+        swarm = ShardedSwarm(fpath, manager, not args.no_coalesce, merge_actions=args.merge_actions,
+                             processes=args.processes)
+    else:
+        swarm = Swarm(fpath, manager, not args.no_coalesce, merge_actions=args.merge_actions)
     swarm.start()
@@ -0,0 +1,222 @@
+import asyncio
+import itertools
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Token bucket: refills at rate tokens per second up to burst tokens. Taking more tokens than
+    are left puts the bucket in debt, which later senders wait out.
+    """
+
+    def __init__(self, rate, burst):
+        """
+        Ctor.
+
+        :param rate: Tokens per second.
+        :param burst: Bucket size (tokens).
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def refill(self, now):
+        """
+        Adds the tokens earned since the last refill.
+
+        :param now: Monotonic time.
+        :return: None.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def get_wait(self, n):
+        """
+        Gets how long until n tokens are available (call refill first).
+
+        :param n: Number of tokens.
+        :return: Wait (seconds); 0 if available now.
+        """
+        # a request larger than the bucket only needs a full bucket
+        missing = min(n, self.burst) - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+
+class RateLimiter(object):
+    """
+    Send-rate limiter for the shared router: a global bucket (packets per second for the whole
+    swarm) and one bucket per drone. Senders wait in priority lanes, in arrival order within a lane,
+    so a burst of discovery probes or a '*>' fan-out is spread out instead of dropped by the router.
+    URGENT packets (land, emergency, stop) never wait; they are charged to the buckets all the same.
+    """
+
+    URGENT = 0
+    COMMAND = 1
+    DISCOVERY = 2
+
+    URGENT_COMMANDS = {'land', 'emergency', 'stop'}
+
+    def __init__(self, rate=200.0, burst=50, drone_rate=20.0, drone_burst=8):
+        """
+        Ctor.
+
+        :param rate: Packets per second for all drones.
+        :param burst: Packets all drones may send at once.
+        :param drone_rate: Packets per second per drone.
+        :param drone_burst: Packets one drone may send at once ('Re' multi-commands take 4).
+        """
+        self.rate = rate
+        self.burst = burst
+        self.drone_rate = drone_rate
+        self.drone_burst = drone_burst
+
+        self.bucket = TokenBucket(rate, burst)
+        self.buckets = {}
+
+        self.lock = threading.Lock()
+        self.waiting = []
+        self.tickets = itertools.count()
+
+        self.packets = 0
+        self.delayed = 0
+        self.wait_time = 0.0
+
+    @staticmethod
+    def get_lane(command):
+        """
+        Gets the lane of a command.
+
+        :param command: Command, without any 'Re' prefix.
+        :return: URGENT or COMMAND.
+        """
+        parts = command.split()
+        if len(parts) > 0 and parts[0] in RateLimiter.URGENT_COMMANDS:
+            return RateLimiter.URGENT
+        return RateLimiter.COMMAND
+
+    def _enter(self, lane, ip, n):
+        ticket = (lane, next(self.tickets), ip, n)
+        self.waiting.append(ticket)
+        return ticket
+
+    def _leave(self, ticket):
+        self.waiting.remove(ticket)
+
+    def _get_bucket(self, ip):
+        bucket = self.buckets.get(ip)
+        if bucket is None:
+            bucket = self.buckets[ip] = TokenBucket(self.drone_rate, self.drone_burst)
+        return bucket
+
+    def _poll(self, ticket):
+        """
+        Takes the tokens for the ticket's packets if it is its turn and both buckets have them.
+        Must be called with the lock held.
+
+        :param ticket: Waiting ticket, as (lane, arrival, IP, number of packets).
+        :return: 0 if the tokens were taken, otherwise how long (seconds) to wait before polling again.
+        """
+        lane, _, ip, n = ticket
+        now = time.monotonic()
+
+        bucket = self._get_bucket(ip)
+        self.bucket.refill(now)
+        bucket.refill(now)
+
+        if lane != RateLimiter.URGENT:
+            wait = max(self.bucket.get_wait(n), bucket.get_wait(n))
+            if wait > 0:
+                return wait
+
+            # global tokens go to the earliest sender of the highest lane; a sender held back
+            # only by its own drone's bucket does not hold up the others. Senders ahead take
+            # their turns at the global rate, so sleep until about when ours comes.
+            ahead = 0
+            for other in self.waiting:
+                if other[0] != RateLimiter.URGENT and other[:2] < ticket[:2]:
+                    other_bucket = self._get_bucket(other[2])
+                    other_bucket.refill(now)
+                    if other_bucket.get_wait(other[3]) == 0:
+                        ahead += other[3]
+            if ahead > 0:
+                return ahead / self.rate
+
+        self.bucket.tokens -= n
+        bucket.tokens -= n
+        return 0.0
+
+    def acquire(self, ip, n=1, lane=COMMAND):
+        """
+        Blocks until n packets may be sent to a drone.
+
+        :param ip: Tello IP.
+        :param n: Number of packets.
+        :param lane: URGENT, COMMAND or DISCOVERY.
+        :return: Time waited (seconds).
+        """
+        start = time.monotonic()
+
+        with self.lock:
+            ticket = self._enter(lane, ip, n)
+        try:
+            while True:
+                with self.lock:
+                    wait = self._poll(ticket)
+                if wait == 0:
+                    break
+                time.sleep(wait)
+        finally:
+            with self.lock:
+                self._leave(ticket)
+
+        with self.lock:
+            return self._count(n, time.monotonic() - start)
+
+    async def acquire_async(self, ip, n=1, lane=COMMAND):
+        """
+        Waits on the event loop until n packets may be sent to a drone.
+
+        :param ip: Tello IP.
+        :param n: Number of packets.
+        :param lane: URGENT, COMMAND or DISCOVERY.
+        :return: Time waited (seconds).
+        """
+        start = time.monotonic()
+
+        with self.lock:
+            ticket = self._enter(lane, ip, n)
+        try:
+            while True:
+                with self.lock:
+                    wait = self._poll(ticket)
+                if wait == 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            with self.lock:
+                self._leave(ticket)
+
+        with self.lock:
+            return self._count(n, time.monotonic() - start)
+
+    def _count(self, n, waited):
+        self.packets += n
+        if waited > 0.001:
+            self.delayed += n
+            self.wait_time += waited
+        return waited
+
+    def get_stats(self):
+        """
+        Gets the limiter statistics.
+
+        :return: Statistics.
+        """
+        with self.lock:
+            return {
+                'packets': self.packets,
+                'delayed': self.delayed,
+                'wait_time': self.wait_time
+            }
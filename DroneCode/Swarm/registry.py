@@ -0,0 +1,162 @@
+import json
+import os
+from contextlib import suppress
+
+
+class DroneRegistry(object):
+    """
+    Drone registry mapping serial numbers (SN), IPs and swarm IDs.
+    The SN -> IP and ID -> SN assignments are persisted to a local file so repeat
+    shows at the same venue can verify the known addresses instead of sweeping the subnet.
+    Only assignments a drone confirmed by answering 'sn?' are trusted; the others are guesses.
+    """
+
+    def __init__(self, fpath='./registry.json', sn2ip=None, id2sn=None):
+        """
+        Ctor.
+
+        :param fpath: Path to the registry file.
+        :param sn2ip: Default SN to IP assignments, used when the file has none.
+        :param id2sn: Default ID to SN assignments, used when the file has none.
+        """
+        self.fpath = fpath
+        self.sn2ip = dict(sn2ip or {})
+        self.id2sn = dict(id2sn or {})
+        self.ip2id = {}
+
+        # SNs whose IP was confirmed by the drone itself
+        self.confirmed = set()
+
+        # ID -> (SN, IP, pool index), rebuilt whenever an assignment changes
+        self.routes = {}
+
+        self.load()
+
+    def load(self):
+        """
+        Loads the registry file, if there is one.
+
+        :return: None.
+        """
+        if not os.path.exists(self.fpath):
+            return
+
+        try:
+            with open(self.fpath, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'[REGISTRY] Ignoring unreadable registry {self.fpath}: {e}')
+            return
+
+        self.sn2ip.update(data.get('sn2ip', {}))
+        self.id2sn.update({int(id): sn for id, sn in data.get('id2sn', {}).items()})
+        self.confirmed.update(sn for sn in data.get('confirmed', []) if sn in self.sn2ip)
+        self.routes.clear()
+
+    def save(self):
+        """
+        Saves the registry file.
+
+        :return: None.
+        """
+        data = {
+            'sn2ip': self.sn2ip,
+            'id2sn': {str(id): sn for id, sn in self.id2sn.items()},
+            'confirmed': sorted(self.confirmed)
+        }
+
+        tmp = f'{self.fpath}.tmp'
+        with suppress(OSError):
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.fpath)
+
+    def known_ips(self):
+        """
+        Gets the IPs at which drones were last seen.
+
+        :return: List of IPs.
+        """
+        return list(dict.fromkeys(self.sn2ip.values()))
+
+    def get_sn(self, ip):
+        """
+        Gets the SN last seen at an IP.
+
+        :param ip: Tello IP.
+        :return: SN, or None if no drone is known at the IP.
+        """
+        for sn, known_ip in self.sn2ip.items():
+            if known_ip == ip:
+                return sn
+        return None
+
+    def get_confirmed_sn(self, ip):
+        """
+        Gets the SN at an IP if the drone confirmed it.
+
+        :param ip: Tello IP.
+        :return: SN, or None if no drone confirmed the IP.
+        """
+        sn = self.get_sn(ip)
+        return sn if sn in self.confirmed else None
+
+    def set_ip(self, sn, ip, confirmed=False):
+        """
+        Records that the drone with the SN was seen at the IP.
+
+        :param sn: SN.
+        :param ip: Tello IP.
+        :param confirmed: Whether the drone itself answered with the SN at the IP.
+        :return: None.
+        """
+        # the IP can only belong to one drone
+        for other in [other for other, known_ip in self.sn2ip.items() if known_ip == ip and other != sn]:
+            del self.sn2ip[other]
+            self.confirmed.discard(other)
+
+        self.sn2ip[sn] = ip
+        if confirmed:
+            self.confirmed.add(sn)
+        else:
+            self.confirmed.discard(sn)
+        self.routes.clear()
+
+    def set_sn(self, id, sn):
+        """
+        Assigns an SN to a swarm ID.
+
+        :param id: Swarm ID (0-based).
+        :param sn: SN.
+        :return: None.
+        """
+        self.id2sn[id] = sn
+        self.routes.clear()
+
+    def set_pool(self, ip, pool_id):
+        """
+        Assigns the execution pool of the drone at an IP for this session.
+
+        :param ip: Tello IP.
+        :param pool_id: Execution pool index.
+        :return: None.
+        """
+        self.ip2id[ip] = pool_id
+        self.routes.clear()
+
+    def route(self, id):
+        """
+        Resolves a swarm ID in one lookup.
+
+        :param id: Swarm ID (0-based).
+        :return: Tuple of (SN, IP, pool index).
+        """
+        route = self.routes.get(id)
+
+        if route is None:
+            sn = self.id2sn[id]
+            ip = self.sn2ip[sn]
+            route = (sn, ip, self.ip2id[ip])
+            self.routes[id] = route
+
+        return route
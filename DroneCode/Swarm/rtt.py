@@ -0,0 +1,61 @@
+class RttEstimator(object):
+    """
+    Smoothed round-trip time and its variance (Jacobson/Karels, as TCP does), giving an
+    adaptive response timeout: SRTT + 4 * RTTVAR, kept within [min_timeout, max_timeout].
+    Samples from retransmitted commands must not be added, since it is unknown which
+    transmission the response answers (Karn's algorithm).
+    """
+
+    ALPHA = 0.125
+    BETA = 0.25
+    K = 4
+
+    def __init__(self, initial, min_timeout, max_timeout):
+        """
+        Ctor.
+
+        :param initial: Timeout (seconds) until the first sample.
+        :param min_timeout: Minimum timeout (seconds).
+        :param max_timeout: Maximum timeout (seconds).
+        """
+        self.initial = initial
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+
+    def update(self, sample):
+        """
+        Adds a round-trip time sample.
+
+        :param sample: Round-trip time (seconds).
+        :return: None.
+        """
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2.0
+        else:
+            self.rttvar = (1 - RttEstimator.BETA) * self.rttvar + RttEstimator.BETA * abs(self.srtt - sample)
+            self.srtt = (1 - RttEstimator.ALPHA) * self.srtt + RttEstimator.ALPHA * sample
+
+        self.samples += 1
+
+    def get_timeout(self, backoff=0):
+        """
+        Gets the timeout.
+
+        :param backoff: Number of retransmissions so far; each one doubles the timeout.
+        :return: Timeout (seconds).
+        """
+        if self.srtt is None:
+            timeout = self.initial
+        else:
+            timeout = self.srtt + RttEstimator.K * self.rttvar
+
+        timeout = max(self.min_timeout, timeout) * (2 ** backoff)
+        return min(timeout, self.max_timeout)
+
+    def __repr__(self):
+        return f'RTT: srtt={self.srtt}, rttvar={self.rttvar}, samples={self.samples}'
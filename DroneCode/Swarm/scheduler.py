@@ -0,0 +1,133 @@
+import heapq
+import threading
+import time
+
+
+class Cue(object):
+    """
+    A timeline action handed to a drone's pool. The drone's worker stamps it when it sends the
+    action, so the time a cue waited behind the drone's earlier commands is known too.
+    """
+
+    __slots__ = ('action', 'due_ns', 'sent_ns')
+
+    def __init__(self, action, due_ns):
+        """
+        Ctor.
+
+        :param action: Action.
+        :param due_ns: Monotonic time (ns) the action is due.
+        """
+        self.action = action
+        self.due_ns = due_ns
+        self.sent_ns = None
+
+    def set_sent(self):
+        self.sent_ns = time.monotonic_ns()
+
+    def __repr__(self):
+        return f'CUE: {self.action}'
+
+
+class ShowScheduler(object):
+    """
+    Fires per-drone timelines from a single monotonic show clock.
+    Every cue is pinned to a show-relative time; the scheduler waits until the earliest
+    cue is due (a timed wait, not a sleep loop) and hands it to the dispatch callback as a Cue, so
+    each drone's track advances on the clock rather than on the other drones' acks.
+    """
+
+    def __init__(self, tracks):
+        """
+        Ctor.
+
+        :param tracks: Dictionary of drone ID to list of (offset in seconds, action).
+        """
+        self.tracks = tracks
+        self.cancelled = threading.Event()
+
+        # per fired cue: (ID, offset seconds, lateness seconds when queued)
+        self.fired = []
+        self.cues = []
+        self.start_ns = None
+
+    def get_duration(self):
+        """
+        Gets the show length set by the choreography.
+
+        :return: Offset (seconds) of the last cue.
+        """
+        return max((cues[-1][0] for cues in self.tracks.values() if len(cues) > 0), default=0.0)
+
+    def run(self, dispatch, start_ns=None):
+        """
+        Fires every cue at its show time. Blocks until the last cue is fired or the run is cancelled.
+
+        :param dispatch: Callback taking (drone ID, Cue).
+        :param start_ns: Monotonic time (ns) of show time 0; now if None.
+        :return: A boolean indicating if every cue was fired.
+        """
+        self.start_ns = time.monotonic_ns() if start_ns is None else start_ns
+
+        heap = []
+        for id, cues in self.tracks.items():
+            for seq, (offset, action) in enumerate(cues):
+                heap.append((self.start_ns + int(offset * 1e9), id, seq, offset, action))
+        heapq.heapify(heap)
+
+        while len(heap) > 0:
+            due_ns = heap[0][0]
+            wait_ns = due_ns - time.monotonic_ns()
+            if wait_ns > 0 and self.cancelled.wait(wait_ns / 1e9):
+                return False
+            if self.cancelled.is_set():
+                return False
+
+            # fire everything that is due in one pass
+            now_ns = time.monotonic_ns()
+            while len(heap) > 0 and heap[0][0] <= now_ns:
+                due_ns, id, _, offset, action = heapq.heappop(heap)
+                cue = Cue(action, due_ns)
+                dispatch(id, cue)
+                self.cues.append(cue)
+                self.fired.append((id, offset, (time.monotonic_ns() - due_ns) / 1e9))
+
+        return True
+
+    def cancel(self):
+        """
+        Stops firing cues.
+
+        :return: None.
+        """
+        self.cancelled.set()
+
+    def get_lateness(self):
+        """
+        Gets how late cues were handed to their drones' pools.
+
+        :return: Tuple of (mean, max) lateness in seconds.
+        """
+        return ShowScheduler.summarize([late for _, _, late in self.fired])
+
+    def get_send_lateness(self):
+        """
+        Gets how late cues were sent, including the time they waited behind the drones' earlier commands.
+        Cues not sent yet are left out.
+
+        :return: Tuple of (mean, max) lateness in seconds.
+        """
+        return ShowScheduler.summarize([(cue.sent_ns - cue.due_ns) / 1e9 for cue in self.cues
+                                        if cue.sent_ns is not None])
+
+    @staticmethod
+    def summarize(lateness):
+        """
+        Summarizes lateness.
+
+        :param lateness: List of lateness in seconds.
+        :return: Tuple of (mean, max) lateness in seconds; zeros if empty.
+        """
+        if len(lateness) == 0:
+            return 0.0, 0.0
+        return sum(lateness) / len(lateness), max(lateness)
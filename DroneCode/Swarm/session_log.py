@@ -0,0 +1,74 @@
+import queue
+import threading
+
+
+class SessionLogWriter(object):
+    """
+    Append-only session log.
+    The manager queues each command as it completes (answered or timed out) and a
+    background thread writes it as one line, so a crash keeps everything flushed so far.
+    """
+
+    def __init__(self, fpath, flush_interval=0.5):
+        """
+        Ctor.
+
+        :param fpath: Log file path.
+        :param flush_interval: Maximum time (seconds) a written record stays unflushed.
+        """
+        self.fpath = fpath
+        self.flush_interval = flush_interval
+        self.records = queue.Queue()
+        self.count = 0
+
+        self.file = open(fpath, 'a', buffering=64 * 1024)
+
+        self.thread = threading.Thread(target=self._write_thread)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, ip, stats):
+        """
+        Queues a completed command for writing.
+
+        :param ip: Tello IP.
+        :param stats: Stats.
+        :return: None.
+        """
+        self.records.put((ip, stats))
+
+    def _write_thread(self):
+        """
+        Writes queued records, flushing whenever the queue runs dry.
+
+        :return: None.
+        """
+        while True:
+            try:
+                record = self.records.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self.file.flush()
+                continue
+
+            if record is None:
+                break
+
+            ip, stats = record
+            self.file.write(f'drone={ip}, {stats.get_stats_delimited()}\n')
+            self.count += 1
+
+            if self.records.empty():
+                self.file.flush()
+
+        self.file.flush()
+        self.file.close()
+
+    def close(self):
+        """
+        Writes all queued records and closes the file.
+
+        :return: None.
+        """
+        if self.thread.is_alive():
+            self.records.put(None)
+            self.thread.join()
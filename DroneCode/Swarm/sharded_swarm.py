@@ -0,0 +1,492 @@
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from swarm import *
+from rate_limit import RateLimiter
+
+
+class ShowClock(object):
+    """
+    Show clock shared by the shard processes. The show is split into segments; segment k starts
+    once every shard has finished segment k - 1 (or its sync timeout expired), and its start time is
+    kept in shared memory, so all shards fire their cues from the same instant. Times are
+    time.monotonic_ns(), which is one system-wide clock for every process on the host.
+    """
+
+    def __init__(self, num_segments, parties, context):
+        """
+        Ctor.
+
+        :param num_segments: Number of segments.
+        :param parties: Number of shard processes.
+        :param context: Multiprocessing context.
+        """
+        self.parties = parties
+        self.cond = context.Condition()
+
+        # barrier k releases segment k; barrier num_segments marks the end of the show
+        self.arrivals = context.RawArray('i', num_segments + 1)
+        self.starts = context.RawArray('q', num_segments + 1)
+        self.broken = context.RawArray('b', num_segments + 1)
+        self.aborted = context.RawValue('b', 0)
+
+    def _release(self, k, broken):
+        self.starts[k] = time.monotonic_ns()
+        self.broken[k] = broken
+        self.cond.notify_all()
+
+    def wait(self, k, timeout=None):
+        """
+        Called by a shard when it reaches barrier k. Everyone is released the moment the last
+        shard arrives, or when the first one runs out of time.
+
+        :param k: Barrier index.
+        :param timeout: Maximum time (seconds) to wait; None waits until released.
+        :return: Tuple of (start of segment k in monotonic ns, boolean indicating if every shard arrived in time).
+        """
+        with self.cond:
+            self.arrivals[k] += 1
+            if self.arrivals[k] == self.parties and self.starts[k] == 0:
+                self._release(k, False)
+            elif not self.cond.wait_for(lambda: self.starts[k] != 0 or self.aborted.value, timeout):
+                self._release(k, True)
+
+            if self.starts[k] == 0:
+                return time.monotonic_ns(), False
+            return self.starts[k], not self.broken[k]
+
+    def abort(self):
+        """
+        Stops the show: releases every waiting shard, and shards stop at their next barrier.
+
+        :return: None.
+        """
+        with self.cond:
+            self.aborted.value = 1
+            self.cond.notify_all()
+
+    def is_aborted(self):
+        return self.aborted.value != 0
+
+
+class RecordingPool(object):
+    """
+    Stand-in for a drone's execution pool while the coordinator compiles the mission:
+    queued commands are recorded into the drone's stream instead of being sent.
+    """
+
+    def __init__(self, swarm, id):
+        """
+        Ctor.
+
+        :param swarm: ShardedSwarm.
+        :param id: Pool index of the drone.
+        """
+        self.swarm = swarm
+        self.id = id
+
+    def put(self, command):
+        self.swarm._record(self.id, command)
+
+
+class ShardLogWriter(object):
+    """
+    Log writer of a shard process. Completed commands are sent to the coordinator, which
+    writes them to the session log and keeps their Stats.
+    """
+
+    def __init__(self, results, index):
+        """
+        Ctor.
+
+        :param results: Queue to the coordinator.
+        :param index: Shard index.
+        """
+        self.results = results
+        self.index = index
+        self.count = 0
+
+    def write(self, ip, stats):
+        self.results.put(('stats', self.index, ip,
+                          (stats.command, stats.response, stats.id, stats.start_ns, stats.end_ns)))
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class ShardedSwarm(Swarm):
+    """
+    Tello Edu swarm driven from several processes, so the GIL of one controller does not cap the
+    swarm size. The coordinator (this object) discovers the drones and compiles the mission into
+    per-drone command streams, cut into segments wherever the swarm waits for every drone
+    (formation keyframes, sync, timelines, health checks). Each shard process gets a subset of the
+    drones with their streams, owns its own socket and DroneWorkers, and starts every segment from
+    the shared ShowClock; completed commands flow back into the coordinator's session log.
+    The state stream stays with the coordinator, so shard health checks query the drones.
+    """
+
+    def __init__(self, fpath, manager=None, coalesce=True, cache=None, merge_actions=False, processes=None, echo=True):
+        """
+        Ctor.
+
+        :param fpath: Path to command text file.
+        :param manager: TelloManager used for discovery, correct_ip and emergency landing; a TelloManager is created if None.
+        :param coalesce: Whether to send each drone's formation moves as single commands.
+        :param cache: PlanCache for the compiled mission and formations; a PlanCache is created if None.
+        :param merge_actions: Whether to also merge consecutive moves written on action lines, which changes their paths.
+        :param processes: Number of shard processes; defaults to the number of CPUs.
+        :param echo: Whether shard processes print their output.
+        """
+        super().__init__(fpath, manager, coalesce, cache, merge_actions)
+
+        self.processes = processes or os.cpu_count() or 1
+        self.echo = echo
+
+        # compiled streams: list of (tracks, length, timeout, check) per segment, where tracks maps
+        # a pool index to [(offset in seconds, command)]
+        self.segments = []
+        self.tracks = {}
+        self.offset = 0.0
+
+        self.clock = None
+        self.shards = []
+        self.shard_stats = {}
+
+    def _record(self, id, command):
+        """
+        Records a command into the current segment of a drone's stream.
+
+        :param id: Pool index of the drone.
+        :param command: Command.
+        :return: None.
+        """
+        self.tracks.setdefault(id, []).append((self.offset, command))
+
+    def _end_segment(self, timeout=None, check=None):
+        """
+        Closes the current segment: every drone finishes it before any drone starts the next one.
+
+        :param timeout: Maximum time (seconds) from the start of the segment to wait for the other drones.
+        :param check: Health check run on every drone at the end of the segment, or None.
+        :return: None.
+        """
+        if len(self.tracks) > 0 or self.offset > 0 or timeout is not None or check is not None:
+            self.segments.append((self.tracks, self.offset, timeout, check))
+
+        self.tracks = {}
+        self.offset = 0.0
+
+    def _handle_scan(self, n_tellos):
+        """
+        Handles scan. Drones are found by the coordinator; their commands are recorded until the
+        mission is compiled.
+
+        :param n_tellos: Number of Tellos to find.
+        :return: None.
+        """
+        self.manager.find_avaliable_tello(n_tellos, self.registry.known_ips())
+        self.tellos = self.manager.get_tello_list()[:n_tellos]
+        self.pools = [RecordingPool(self, x) for x in range(n_tellos)]
+        self.positions = Formation.line(n_tellos)
+
+        for x, tello in enumerate(self.tellos):
+            self.registry.set_pool(tello.tello_ip, x)
+            print(f'[SCAN] IP = {tello.tello_ip}, ID = {x}')
+
+    def _wait_for_pools(self):
+        self._end_segment()
+
+    def _wait_for_all(self):
+        """
+        Ends the compiled mission and flies it on the shard processes.
+
+        :return: None.
+        """
+        self._end_segment()
+        self._run_shards()
+
+    def _handle_delay(self, delay_time):
+        """
+        Handles delay. Later commands of the segment start delay_time seconds later.
+
+        :param delay_time: Delay (seconds).
+        :return: None.
+        """
+        print(f'[DELAY] Start Delay for {delay_time} second')
+        self.offset += delay_time
+
+    def _handle_sync(self, timeout):
+        """
+        Handles synchronization: every shard waits for the others at the end of the segment.
+
+        :param timeout: Timeout (seconds).
+        :return: None.
+        """
+        print(f'[SYNC] Sync for {timeout} seconds')
+        self._end_segment(timeout=timeout)
+
+    def _handle_timeline(self, tracks):
+        """
+        Handles a timeline. The cues become their own segment, with show time 0 at its start.
+
+        :param tracks: Dictionary of ID (0-based) to list of (offset in seconds, action).
+        :return: None.
+        """
+        self._end_segment()
+
+        for tello_id, cues in tracks.items():
+            sn, ip, id = self.registry.route(tello_id)
+            self.tracks.setdefault(id, []).extend(cues)
+
+        duration = max((cues[-1][0] for cues in tracks.values() if len(cues) > 0), default=0.0)
+        print(f'[TIMELINE] {len(tracks)} tracks, {duration:.2f} seconds')
+
+        self._end_segment()
+
+    def _handle_battery_check(self, threshold):
+        self._end_segment(check=('battery', threshold))
+
+    def _handle_preflight(self, limits, deadline):
+        self._end_segment(check=('preflight', limits, deadline))
+
+    def _handle_read_pad(self):
+        for pool in self.pools:
+            pool.put('mon')
+        self._end_segment(check=('read_pad',))
+
+    def _handle_correct_ip(self):
+        """
+        Handles correction of IPs from the coordinator, before the show starts.
+
+        :return: None.
+        """
+        unknown_ips = self._get_unconfirmed_ips()
+
+        threads = [Thread(target=self.manager.send_command, args=('sn?', ip), daemon=True) for ip in unknown_ips]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for tello_ip in unknown_ips:
+            log = self.manager.get_log()[tello_ip][-1]
+            if log.got_response():
+                self.registry.set_ip(str(log.response), tello_ip, confirmed=True)
+
+        for tello in self.tellos:
+            sn = self.registry.get_sn(tello.tello_ip)
+            source = 'QUERIED' if tello.tello_ip in unknown_ips else 'REGISTRY'
+            print(f'[CORRECT_IP] SN = {sn}, IP = {tello.tello_ip}, SOURCE = {source}')
+
+        self.registry.save()
+
+    def _run_shards(self):
+        """
+        Splits the drones across the shard processes, starts them and collects their
+        completed commands until every shard is done.
+
+        :return: None.
+        """
+        ids = list(range(len(self.tellos)))
+        num = max(1, min(self.processes, len(ids)))
+        groups = [ids[k::num] for k in range(num)]
+
+        context = multiprocessing.get_context('spawn')
+        self.clock = ShowClock(len(self.segments), num, context)
+        results = context.Queue()
+
+        # the router budget is shared by all shards
+        limiter = self.manager.limiter
+        rate = None if limiter is None else (limiter.rate / num, max(1, limiter.burst // num),
+                                             limiter.drone_rate, limiter.drone_burst)
+
+        base_port = self.manager.local_port + 1 + len(getattr(self.manager, 'shards', [None]))
+
+        print(f'[SHARDS] {len(ids)} drones, {num} processes, {len(self.segments)} segments')
+
+        for k, group in enumerate(groups):
+            ips = {id: self.tellos[id].tello_ip for id in group}
+            first_ids = {ip: self.manager.command_count[ip] for ip in ips.values()}
+            segments = [({id: track[id] for id in group if id in track}, length, timeout, check)
+                        for track, length, timeout, check in self.segments]
+
+            # shard k answers on its own port, above the ports of the coordinator's sockets
+            port = base_port + k
+            process = context.Process(target=run_shard,
+                                      args=(k, ips, segments, self.clock, results, self.manager.local_ip, port,
+                                            first_ids, rate, self.manager.EARLY_ACK, self.echo))
+            process.daemon = True
+            process.start()
+            self.shards.append(process)
+
+        done = set()
+        while len(done) < num:
+            try:
+                message = results.get(timeout=0.5)
+            except queue.Empty:
+                for k, process in enumerate(self.shards):
+                    if k not in done and not process.is_alive():
+                        print(f'[SHARDS] Shard {k} exited with code {process.exitcode}')
+                        done.add(k)
+                        self.clock.abort()
+                continue
+
+            if message[0] == 'stats':
+                self._on_shard_stats(*message[2:])
+            elif message[0] == 'done':
+                _, k, stats = message
+                done.add(k)
+                self.shard_stats[k] = stats
+                print(f'[SHARD] INDEX = {k}, DRONES = {stats["drones"]}, SENT = {stats["commands_sent"]}, '
+                      f'RETRIES = {stats["retransmissions"]}, ABORTED = {stats["aborted"]}, '
+                      f'LATENESS = {stats["lateness"] * 1000:.2f}ms queued, {stats["send_lateness"] * 1000:.2f}ms sent')
+
+        for process in self.shards:
+            process.join()
+
+        if self.clock.is_aborted():
+            raise Exception('Sharded show aborted!')
+
+    def _on_shard_stats(self, ip, record):
+        """
+        Adds a command completed by a shard to the coordinator's log.
+
+        :param ip: Tello IP.
+        :param record: Tuple of (command, response, id, start ns, end ns).
+        :return: None.
+        """
+        command, response, id, start_ns, end_ns = record
+
+        stats = Stats(command, id)
+        stats.start_ns = start_ns
+        if response is not None:
+            stats.add_response(response, ip)
+            stats.end_ns = end_ns
+
+        self.manager.log[ip].append(stats)
+        if self.manager.log_writer is not None:
+            self.manager.log_writer.write(ip, stats)
+
+    def _handle_keyboard_interrupt(self):
+        if self.clock is not None:
+            self.clock.abort()
+        super()._handle_keyboard_interrupt()
+
+
+def run_shard(index, ips, segments, clock, results, local_ip, local_port, first_ids, rate, early_ack, echo):
+    """
+    Shard process: flies the compiled streams of its drones from its own socket.
+
+    :param index: Shard index.
+    :param ips: Dictionary of pool index to Tello IP.
+    :param segments: List of (tracks, length, timeout, check), restricted to this shard's drones.
+    :param clock: ShowClock.
+    :param results: Queue to the coordinator.
+    :param local_ip: Local IP to bind.
+    :param local_port: Local port to bind.
+    :param first_ids: Dictionary of IP to the next command ID, so IDs continue the coordinator's.
+    :param rate: Tuple of RateLimiter arguments, or None to send without limit.
+    :param early_ack: The coordinator's EARLY_ACK.
+    :param echo: Whether to print.
+    :return: None.
+    """
+    if not echo:
+        sys.stdout = open(os.devnull, 'w')
+
+    manager = TelloManager(local_ip, local_port, possible_ips=list(ips.values()))
+    manager.limiter = None if rate is None else RateLimiter(*rate)
+    manager.EARLY_ACK = early_ack
+    manager.set_log_writer(ShardLogWriter(results, index))
+
+    pools = {}
+    workers = []
+    for id, ip in ips.items():
+        manager.command_count[ip] = first_ids.get(ip, 0)
+        manager.tello_ip_list.append(ip)
+        tello = Tello(ip, manager)
+        manager.tello_list.append(tello)
+
+        pools[id] = queue.Queue()
+        worker = DroneWorker(tello, pools[id])
+        worker.start()
+        workers.append(worker)
+
+    health = HealthGate(manager.send_once)
+    lateness = []
+    send_lateness = []
+    drain = True
+
+    try:
+        start_ns, _ = clock.wait(0)
+
+        for k, (tracks, length, timeout, check) in enumerate(segments):
+            if clock.is_aborted():
+                break
+
+            scheduler = ShowScheduler(tracks)
+            scheduler.run(lambda id, command: pools[id].put(command), start_ns)
+            lateness.extend(late for _, _, late in scheduler.fired)
+
+            for pool in pools.values():
+                pool.join()
+            send_lateness.append(scheduler.get_send_lateness()[1])
+
+            remaining = (start_ns + int(length * 1e9) - time.monotonic_ns()) / 1e9
+            if remaining > 0:
+                time.sleep(remaining)
+
+            if check is not None:
+                try:
+                    _run_check(check, health, manager, list(ips.values()))
+                except Exception as e:
+                    print(f'[EXCEPTION], {e}')
+                    clock.abort()
+
+            wait = None if timeout is None else max(0.0, timeout - (time.monotonic_ns() - start_ns) / 1e9)
+            arrived_ns = time.monotonic_ns()
+            start_ns, synced = clock.wait(k + 1, wait)
+
+            if timeout is not None:
+                waited = max(0.0, (start_ns - arrived_ns) / 1e9)
+                state = 'All commands sent and all responses received' if synced else 'Failed to sync; timeout exceeded'
+                print(f'[SYNC] SHARD = {index}, WAITED = {waited:.3f}s, {state}')
+    except KeyboardInterrupt:
+        clock.abort()
+        drain = False
+    finally:
+        for worker in workers:
+            worker.stop(drain, manager.COMMAND_TIME_OUT)
+
+        results.put(('done', index, {
+            'drones': len(ips),
+            'commands_sent': sum(worker.commands_sent for worker in workers),
+            'busy_time': sum(worker.busy_time for worker in workers),
+            'retransmissions': manager.retransmissions,
+            'lateness': max(lateness, default=0.0),
+            'send_lateness': max(send_lateness, default=0.0),
+            'aborted': clock.is_aborted(),
+        }))
+        manager.close()
+
+
+def _run_check(check, health, manager, ips):
+    """
+    Runs a health check on a shard's drones. Raises exception if a drone fails it.
+
+    :param check: Tuple of check name and arguments.
+    :param health: HealthGate querying the shard's drones.
+    :param manager: TelloManager of the shard.
+    :param ips: Tello IPs.
+    :return: None.
+    """
+    if check[0] == 'battery':
+        Swarm.check_battery(health, ips, check[1])
+    elif check[0] == 'preflight':
+        Swarm.check_preflight(health, ips, check[1], check[2])
+    elif check[0] == 'read_pad':
+        for ip in ips:
+            log = manager.get_log()[ip][-1]
+            print(f'[READ_PAD] IP = {ip}, RESPONSE = {log.response}, NO STATE')
@@ -0,0 +1,440 @@
+import argparse
+import heapq
+import ipaddress
+import math
+import random
+import selectors
+import socket
+import sys
+import threading
+import time
+
+
+class SimulatedTello(object):
+    """
+    State of one simulated Tello EDU.
+    """
+
+    def __init__(self, ip, sn, battery=87):
+        """
+        Ctor.
+        :param ip: IP the drone listens on.
+        :param sn: Serial number.
+        :param battery: Battery life (%).
+        """
+        self.ip = ip
+        self.sn = sn
+        self.battery = battery
+
+        self.socket = None
+        self.sdk_mode = False
+        self.flying = False
+        self.height = 0
+        self.busy_until = 0.0
+
+        # where the state stream goes once the drone is in SDK mode
+        self.state_address = None
+        self.takeoff_time = None
+
+        # last 'Re' multi-command index and its response, so repeats are not executed twice
+        self.last_seq = None
+        self.last_seq_response = None
+
+    def __repr__(self):
+        return f'SIM_TELLO@{self.ip}'
+
+
+class TelloSimulator(object):
+    """
+    Simulates Tello EDUs speaking the SDK text protocol over UDP, for testing
+    TelloManager, Swarm and Drone 1/app.py without hardware.
+    Each drone listens on its own <ip>:8889 (loopback addresses by default). One thread
+    receives for all drones and sends every reply from a timer heap, so a large swarm
+    still costs one thread.
+    """
+
+    # execution time (seconds) of commands that do not take a distance or angle
+    EXEC_TIMES = {
+        'takeoff': 5.0,
+        'land': 3.0,
+        'flip': 2.0,
+        'stop': 0.1,
+        'emergency': 0.0,
+    }
+
+    # state packets are pushed to port 8890 of the controller at this interval (seconds)
+    STATE_INTERVAL = 0.1
+    STATE_PORT = 8890
+
+    # moves take a settle time plus travel at these speeds (forward 50 takes about 2 s)
+    SETTLE_TIME = 1.0
+    MOVE_SPEED = 50.0
+    ROTATION_SPEED = 90.0
+
+    QUERIES = {
+        'sdk?': '30',
+        'wifi?': '90',
+        'temp?': '62~65C',
+        'height?': '0dm',
+        'speed?': '100.0',
+        'time?': '0s',
+        'attitude?': 'pitch:0;roll:0;yaw:0;',
+        'baro?': '100.0',
+        'tof?': '100mm',
+        'acceleration?': 'agx:0.00;agy:0.00;agz:-1000.00;',
+    }
+
+    def __init__(self, num, base_ip='127.0.0.2', port=8889, ack_latency=0.01, jitter=0.005,
+                 loss=0.0, exec_scale=1.0, exec_times=None, seed=None, sns=None, state=True, drops=None):
+        """
+        Ctor.
+        :param num: Number of drones.
+        :param base_ip: IP of the first drone; the others take the following addresses.
+        :param port: Port each drone listens on.
+        :param ack_latency: One-way latency (seconds) added to every reply.
+        :param jitter: Extra random latency (seconds), uniform in [0, jitter].
+        :param loss: Probability that a command or a reply datagram is dropped.
+        :param exec_scale: Multiplier for command execution times (0 acks moves immediately).
+        :param exec_times: Overrides of EXEC_TIMES by command word.
+        :param seed: Random seed.
+        :param sns: Serial numbers of the drones; generated if None or too short.
+        :param state: Whether drones in SDK mode push state packets.
+        :param drops: Dictionary of command to the number of its first datagrams to drop, e.g. {'speed 50': 1}.
+        """
+        self.port = port
+        self.ack_latency = ack_latency
+        self.jitter = jitter
+        self.loss = loss
+        self.exec_scale = exec_scale
+        self.state = state
+        self.next_state = 0.0
+        self.exec_times = dict(TelloSimulator.EXEC_TIMES, **(exec_times or {}))
+        self.random = random.Random(seed)
+        self.drops = dict(drops or {})
+
+        first = ipaddress.ip_address(base_ip)
+        sns = list(sns or []) + [f'0TQZSIM{x:07d}' for x in range(len(sns or []), num)]
+        self.drones = [SimulatedTello(str(first + x), sns[x]) for x in range(num)]
+
+        self.received = 0
+        self.dropped = 0
+        self.sent = 0
+
+        self.selector = selectors.DefaultSelector()
+        self.replies = []
+        self.reply_count = 0
+        self.running = False
+        self.thread = None
+
+    def get_ips(self):
+        """
+        Gets the drone IPs.
+        :return: List of IPs.
+        """
+        return [drone.ip for drone in self.drones]
+
+    def start(self):
+        """
+        Binds every drone and starts serving.
+        :return: None.
+        """
+        for drone in self.drones:
+            drone.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            drone.socket.bind((drone.ip, self.port))
+            drone.socket.setblocking(False)
+            self.selector.register(drone.socket, selectors.EVENT_READ, drone)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._serve_thread)
+        self.thread.daemon = True
+        self.thread.start()
+
+        print(f'[SIM] Serving {len(self.drones)} drones from {self.drones[0].ip} to {self.drones[-1].ip}')
+
+    def stop(self):
+        """
+        Stops serving and closes every drone socket.
+        :return: None.
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+        for drone in self.drones:
+            if drone.socket is not None:
+                self.selector.unregister(drone.socket)
+                drone.socket.close()
+                drone.socket = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _serve_thread(self):
+        """
+        Receives commands for all drones and sends replies when they are due.
+        :return: None.
+        """
+        while self.running:
+            now = time.monotonic()
+            timeout = 0.1
+            if len(self.replies) > 0:
+                timeout = min(timeout, max(0.0, self.replies[0][0] - now))
+            if self.state:
+                timeout = min(timeout, max(0.0, self.next_state - now))
+
+            for key, _ in self.selector.select(timeout):
+                drone = key.data
+                while True:
+                    try:
+                        data, address = drone.socket.recvfrom(1024)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        # ICMP errors from earlier replies surface here
+                        continue
+                    self._receive(drone, data, address)
+
+            now = time.monotonic()
+            while len(self.replies) > 0 and self.replies[0][0] <= now:
+                _, _, drone, payload, address = heapq.heappop(self.replies)
+                if drone.socket is None:
+                    continue
+                try:
+                    drone.socket.sendto(payload, address)
+                    self.sent += 1
+                except OSError:
+                    pass
+
+            if self.state and now >= self.next_state:
+                self.next_state = now + self.STATE_INTERVAL
+                self._push_state(now)
+
+    def _push_state(self, now):
+        """
+        Sends one state packet from every drone in SDK mode.
+        :param now: Monotonic time.
+        :return: None.
+        """
+        for drone in self.drones:
+            if drone.state_address is None or drone.socket is None:
+                continue
+
+            flight_time = 0 if drone.takeoff_time is None else int(now - drone.takeoff_time)
+            state = (f'mid:-1;x:-100;y:-100;z:-100;mpry:0,0,0;pitch:0;roll:0;yaw:0;vgx:0;vgy:0;vgz:0;'
+                     f'templ:62;temph:65;tof:{drone.height + 10};h:{drone.height};bat:{drone.battery};'
+                     f'baro:100.00;time:{flight_time};agx:0.00;agy:0.00;agz:-1000.00;\r\n')
+            try:
+                drone.socket.sendto(state.encode('utf-8'), drone.state_address)
+            except OSError:
+                pass
+
+    def _receive(self, drone, data, address):
+        """
+        Handles one command datagram.
+        :param drone: SimulatedTello.
+        :param data: Raw datagram.
+        :param address: Sender address.
+        :return: None.
+        """
+        self.received += 1
+
+        if self.random.random() < self.loss:
+            self.dropped += 1
+            return
+
+        text = data.decode('utf-8', errors='replace').strip()
+        if self.drops.get(text, 0) > 0:
+            self.drops[text] -= 1
+            self.dropped += 1
+            return
+
+        now = time.monotonic()
+        header = b''
+
+        if data[:2] == b'Re' and len(data) >= 7:
+            header, data = data[:7], data[7:]
+            seq = (header[2], header[3])
+
+            # the manager sends each multi-command several times; only the first one runs
+            if seq == drone.last_seq:
+                if drone.last_seq_response is not None:
+                    self._reply(drone, header + drone.last_seq_response, address, self._latency())
+                return
+
+        reply = self._execute(drone, data.decode('utf-8', errors='replace').strip(), now)
+
+        # a Tello streams its state to port 8890 of whoever put it in SDK mode
+        if drone.sdk_mode and drone.state_address is None:
+            drone.state_address = (address[0], self.STATE_PORT)
+        if reply is None:
+            return
+
+        response, delay = reply
+        response = response.encode('utf-8')
+
+        if len(header) > 0:
+            drone.last_seq = (header[2], header[3])
+            drone.last_seq_response = response
+
+        self._reply(drone, header + response, address, delay)
+
+    def _reply(self, drone, payload, address, delay):
+        """
+        Schedules a reply.
+        :param drone: SimulatedTello.
+        :param payload: Reply datagram.
+        :param address: Destination address.
+        :param delay: Delay (seconds) before sending.
+        :return: None.
+        """
+        if self.random.random() < self.loss:
+            self.dropped += 1
+            return
+
+        self.reply_count += 1
+        heapq.heappush(self.replies, (time.monotonic() + delay, self.reply_count, drone, payload, address))
+
+    def _latency(self):
+        """
+        Draws one reply latency.
+        :return: Latency (seconds).
+        """
+        return self.ack_latency + self.random.uniform(0.0, self.jitter)
+
+    def _execute(self, drone, command, now):
+        """
+        Runs a command on the simulated drone.
+        :param drone: SimulatedTello.
+        :param command: Command text.
+        :param now: Monotonic time the command arrived.
+        :return: Tuple of (response, delay in seconds), or None to stay silent.
+        """
+        parts = command.split()
+        if len(parts) == 0:
+            return None
+
+        word = parts[0]
+
+        if word == 'command':
+            drone.sdk_mode = True
+            return 'ok', self._latency()
+
+        # a Tello ignores everything until it is put in SDK mode
+        if not drone.sdk_mode:
+            return None
+
+        if word.endswith('?'):
+            if word == 'sn?':
+                return drone.sn, self._latency()
+            if word == 'battery?':
+                return str(drone.battery), self._latency()
+            return self.QUERIES.get(word, 'error'), self._latency()
+
+        try:
+            duration = self._get_exec_time(word, [float(p) for p in parts[1:] if self._is_number(p)])
+        except (IndexError, ValueError):
+            return 'error', self._latency()
+
+        if word == 'takeoff':
+            if drone.flying:
+                return 'error', self._latency()
+            drone.flying = True
+            drone.height = 80
+            drone.takeoff_time = now
+            drone.battery = max(0, drone.battery - 1)
+        elif word in ('land', 'emergency'):
+            if not drone.flying:
+                return 'error', self._latency()
+            drone.flying = False
+            drone.height = 0
+            drone.takeoff_time = None
+        elif duration > 0 and not drone.flying:
+            return 'error Not joystick', self._latency()
+
+        if word in ('up', 'down'):
+            drone.height = max(0, drone.height + (1 if word == 'up' else -1) * int(float(parts[1])))
+        elif word == 'go':
+            drone.height = max(0, drone.height + int(float(parts[3])))
+
+        # motion commands run one after another and are acked once they finish
+        start = max(now, drone.busy_until)
+        drone.busy_until = start + duration * self.exec_scale
+        return 'ok', drone.busy_until - now + self._latency()
+
+    def _get_exec_time(self, word, args):
+        """
+        Gets how long a command takes to execute.
+        :param word: Command word.
+        :param args: Numeric arguments.
+        :return: Execution time (seconds).
+        """
+        if word in self.exec_times:
+            return self.exec_times[word]
+
+        if word in ('up', 'down', 'left', 'right', 'forward', 'back'):
+            return self.SETTLE_TIME + abs(args[0]) / self.MOVE_SPEED
+
+        if word in ('cw', 'ccw'):
+            return self.SETTLE_TIME + abs(args[0]) / self.ROTATION_SPEED
+
+        if word == 'go':
+            distance = math.sqrt(args[0] ** 2 + args[1] ** 2 + args[2] ** 2)
+            return self.SETTLE_TIME + distance / max(args[3], 1.0)
+
+        if word == 'curve':
+            mid = math.sqrt(args[0] ** 2 + args[1] ** 2 + args[2] ** 2)
+            end = math.sqrt((args[3] - args[0]) ** 2 + (args[4] - args[1]) ** 2 + (args[5] - args[2]) ** 2)
+            return self.SETTLE_TIME + (mid + end) / max(args[6], 1.0)
+
+        # settings (speed, mon, mdirection, ...) apply immediately
+        return 0.0
+
+    @staticmethod
+    def _is_number(text):
+        try:
+            float(text)
+            return True
+        except ValueError:
+            return False
+
+
+def parse_args(args):
+    """
+    Parses arguments.
+    :param args: Arguments.
+    :return: Arguments.
+    """
+    parser = argparse.ArgumentParser('simulator.py',
+                    epilog='One-Off Coder http://www.oneoffcoder.com')
+
+    parser.add_argument('-n', '--num', help='Number of drones', default=3, type=int, required=False)
+    parser.add_argument('--ip', help='IP of the first drone', default='127.0.0.2', required=False)
+    parser.add_argument('--latency', help='Ack latency (seconds)', default=0.01, type=float, required=False)
+    parser.add_argument('--jitter', help='Ack jitter (seconds)', default=0.005, type=float, required=False)
+    parser.add_argument('--loss', help='Packet loss probability', default=0.0, type=float, required=False)
+    parser.add_argument('--scale', help='Execution time multiplier', default=1.0, type=float, required=False)
+    parser.add_argument('--seed', help='Random seed', default=None, type=int, required=False)
+    parser.add_argument('--version', action='version', version='%(prog)s v0.0.1')
+
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+
+    simulator = TelloSimulator(args.num, args.ip, ack_latency=args.latency, jitter=args.jitter,
+                               loss=args.loss, exec_scale=args.scale, seed=args.seed)
+
+    for drone in simulator.drones:
+        print(f'[SIM] SN = {drone.sn}, IP = {drone.ip}')
+
+    with simulator:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f'[SIM] Received = {simulator.received}, Sent = {simulator.sent}, Dropped = {simulator.dropped}')
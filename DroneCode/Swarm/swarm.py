@@ -1,7 +1,16 @@
-from asyncio import timeout
 import sys
+import threading
 import time
 from tello import *
+from registry import DroneRegistry
+from session_log import SessionLogWriter
+from mission import Mission, Op
+from scheduler import Cue, ShowScheduler
+from formation import Formation
+from coalesce import Coalescer
+from plan_cache import PlanCache
+from health import HealthGate
+import numpy as np
 import queue
 import traceback
 import time
@@ -30,17 +39,13 @@ class SwarmUtil(object):
     @staticmethod
     def drone_handler(tello, queue):
         """
-        Drone handler.
+        Drone handler. Blocks on the queue until a command (or the stop sentinel) arrives.
 
         :param tello: Tello.
         :param queue: Queue.
         :return: None.
         """
-        while True:
-            while queue.empty():
-                pass
-            command = queue.get()
-            tello.send_command(command)
+        DroneWorker(tello, queue).run()
 
 
     @staticmethod
@@ -84,12 +89,13 @@ class SwarmUtil(object):
                 os.makedirs(dpath)
 
     @staticmethod
-    def save_log(manager):
+    def open_log(manager):
         """
-        Saves the logs into a file in the ./log directory.
+        Starts streaming the session log into a file in the ./log directory.
+        Each completed command is appended as one line as soon as it completes.
 
         :param manager: TelloManager.
-        :return: None.
+        :return: Log file path.
         """
         dpath = './log'
         SwarmUtil.create_dir(dpath)
@@ -97,19 +103,56 @@ class SwarmUtil(object):
         start_time = str(time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime(time.time())))
         fpath = f'{dpath}/{start_time}.txt'
 
-        with open(fpath, 'w') as out:
-            log = manager.get_log()
-            for cnt, stats in enumerate(log.values()):
-                out.write(f'------\nDrone: {cnt + 1}\n')
+        manager.set_log_writer(SessionLogWriter(fpath))
 
-                s = [stat.get_stats_delimited() for stat in stats]
-                s = '\n'.join(s)
+        print(f'[LOG] Streaming log to {fpath}')
+        return fpath
 
-                out.write(f'{s}\n')
-        
-        print(f'[LOG] Saved log files to {fpath}')
+    @staticmethod
+    def save_log(manager):
+        """
+        Finishes the session log started by open_log.
+
+        :param manager: TelloManager.
+        :return: None.
+        """
+        writer = manager.set_log_writer(None)
+        if writer is None:
+            return
+
+        writer.close()
+        print(f'[LOG] Saved {writer.count} log records to {writer.fpath}')
 
 
+    @staticmethod
+    def get_ned_commands(x, y, z):
+        """
+        Gets the single axis commands of a relative move.
+
+        :param x: Forward (cm).
+        :param y: Right (cm).
+        :param z: Up (cm).
+        :return: List of commands.
+        """
+        commands = []
+
+        if x > 0:
+            commands.append(f'forward {x}')
+        elif x < 0:
+            commands.append(f'back {-x}')
+
+        if y > 0:
+            commands.append(f'right {y}')
+        elif y < 0:
+            commands.append(f'left {-y}')
+
+        if z > 0:
+            commands.append(f'up {z}')
+        elif z < 0:
+            commands.append(f'down {-z}')
+
+        return commands
+
     @staticmethod
     def check_timeout(start_time, end_time, timeout):
         """
@@ -122,45 +165,278 @@ class SwarmUtil(object):
         :return: A boolean indicating if the duration is larger than the specified timeout threshold.
         """
         diff = end_time - start_time
-        time.sleep(0.1)
         return diff > timeout
 
+
+class SyncBarrier(object):
+    """
+    Barrier placed on every drone's queue by sync. A worker reaches it once all commands
+    queued before it were sent and acked; everyone is released the moment the last drone
+    arrives (or when the timeout expires). Records how long each drone waited.
+    """
+
+    def __init__(self, ips, timeout):
+        """
+        Ctor.
+
+        :param ips: IPs of the drones taking part.
+        :param timeout: Maximum time (seconds) from creation to release.
+        """
+        self.ips = list(ips)
+        self.timeout = timeout
+
+        self.cond = threading.Condition()
+        self.arrivals = {}
+        self.start_ns = time.monotonic_ns()
+        self.release_ns = None
+        self.broken = False
+
+    def _remaining(self):
+        return max(0.0, self.timeout - (time.monotonic_ns() - self.start_ns) / 1e9)
+
+    def _is_done(self):
+        return self.release_ns is not None
+
+    def _release(self, broken):
+        self.release_ns = time.monotonic_ns()
+        self.broken = broken
+        self.cond.notify_all()
+
+    def wait(self, ip):
+        """
+        Called by the worker of the drone at the IP when it reaches the barrier.
+
+        :param ip: Tello IP.
+        :return: A boolean indicating if every drone arrived in time.
+        """
+        with self.cond:
+            self.arrivals[ip] = time.monotonic_ns()
+            if len(self.arrivals) == len(self.ips) and not self._is_done():
+                self._release(False)
+            elif not self.cond.wait_for(self._is_done, self._remaining()):
+                self._release(True)
+            return not self.broken
+
+    def wait_released(self):
+        """
+        Blocks until the barrier is released.
+
+        :return: A boolean indicating if every drone arrived in time.
+        """
+        with self.cond:
+            if not self.cond.wait_for(self._is_done, self._remaining()):
+                self._release(True)
+            return not self.broken
+
+    def abort(self):
+        """
+        Releases everyone without waiting for the missing drones.
+
+        :return: None.
+        """
+        with self.cond:
+            if not self._is_done():
+                self._release(True)
+
+    def get_wait_times(self):
+        """
+        Gets how long each drone waited at the barrier.
+
+        :return: Dictionary of IP to wait time in seconds; None for drones that never arrived.
+        """
+        with self.cond:
+            end_ns = self.release_ns if self.release_ns is not None else time.monotonic_ns()
+            return {ip: (end_ns - self.arrivals[ip]) / 1e9 if ip in self.arrivals else None for ip in self.ips}
+
+    def get_missing(self):
+        """
+        Gets the drones that did not reach the barrier.
+
+        :return: List of IPs.
+        """
+        with self.cond:
+            return [ip for ip in self.ips if ip not in self.arrivals]
+
+
+class DroneWorker(object):
+    """
+    Per-drone worker. Sleeps on its queue and sends each command to its Tello in order.
+    A SyncBarrier on the queue holds the worker until the other drones reach it.
+    """
+
+    STOP = None
+
+    def __init__(self, tello, queue):
+        """
+        Ctor.
+
+        :param tello: Tello.
+        :param queue: Queue of commands for this drone.
+        """
+        self.tello = tello
+        self.queue = queue
+
+        self.busy_time = 0.0
+        self.idle_time = 0.0
+        self.commands_sent = 0
+
+        self.thread = Thread(target=self.run)
+        self.thread.daemon = True
+
+    def start(self):
+        """
+        Starts the worker thread.
+
+        :return: None.
+        """
+        self.thread.start()
+
+    def run(self):
+        """
+        Worker loop. Returns once the stop sentinel is taken off the queue.
+
+        :return: None.
+        """
+        while True:
+            idle_start = time.monotonic()
+            command = self.queue.get()
+            busy_start = time.monotonic()
+            self.idle_time += busy_start - idle_start
+
+            try:
+                if command is DroneWorker.STOP:
+                    return
+                if isinstance(command, SyncBarrier):
+                    command.wait(self.tello.tello_ip)
+                    continue
+                if isinstance(command, Cue):
+                    command.set_sent()
+                    command = command.action
+                self.tello.send_command(command)
+                self.commands_sent += 1
+            finally:
+                self.busy_time += time.monotonic() - busy_start
+                self.queue.task_done()
+
+    def stop(self, drain=True, timeout=None):
+        """
+        Stops the worker.
+
+        :param drain: If True, queued commands are sent first; otherwise they are discarded.
+        :param timeout: Maximum time (seconds) to wait for the worker to exit.
+        :return: A boolean indicating if the worker exited.
+        """
+        if not self.thread.is_alive():
+            return True
+
+        if not drain:
+            with suppress(queue.Empty):
+                while True:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+
+        self.queue.put(DroneWorker.STOP)
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def get_queue_depth(self):
+        """
+        Gets the number of commands waiting to be sent.
+
+        :return: Queue depth.
+        """
+        return self.queue.qsize()
+
+    def get_stats(self):
+        """
+        Gets the worker statistics.
+
+        :return: Statistics.
+        """
+        return {
+            'tello': self.tello,
+            'queue_depth': self.get_queue_depth(),
+            'commands_sent': self.commands_sent,
+            'busy_time': self.busy_time,
+            'idle_time': self.idle_time
+        }
+
+
 class Swarm(object):
     """
     Tello Edu swarm.
     """
 
-    def __init__(self, fpath):
+    # instructions that send commands to drones by ID
+    ROUTED_OPS = {Op.ACTION, Op.TIMELINE, Op.POLY, Op.VERTICAL, Op.TRIANGLE, Op.WAVE, Op.CIRCLE, Op.LINE,
+                  Op.GRID, Op.HELIX}
+
+    def __init__(self, fpath, manager=None, coalesce=True, cache=None, merge_actions=False):
         """
         Ctor.
 
         :param fpath: Path to command text file.
+        :param manager: Tello manager (TelloManager or SyncTelloManager); a TelloManager is created if None.
+        :param coalesce: Whether to send each drone's formation moves as single commands.
+        :param cache: PlanCache for the compiled mission and formations; a PlanCache is created if None.
+        :param merge_actions: Whether to also merge consecutive moves written on action lines, which changes their paths.
         """
         self.ENU=1
         self.home_x=0
         self.home_y=0
         self.home_z=0
+        self.assignment = 'makespan'
         
         self.fpath = fpath
-        self.commands = self._get_commands(fpath)
-        self.manager = TelloManager()
+        self.coalesce = coalesce
+        self.merge_actions = merge_actions
+        self.cache = cache if cache is not None else PlanCache()
+        self.mission = Mission.load(fpath, merge_actions, self.cache)
+        self.manager = manager if manager is not None else TelloManager()
         self.tellos = []
+        self.positions = None
         self.pools = []
-        self.sn2ip = {
-            '0TQZK7NED02VMT': '192.168.0.103',
-            '0TQZK7JED02TVJ': '192.168.0.101',
-            '0TQZK5DED02KHL': '192.168.0.102',
-        }
-        self.id2sn = {
-            0: '0TQZK7NED02VMT',
-            1: '0TQZK7JED02TVJ',
-            2: '0TQZK5DED02KHL',
-        }
-        self.ip2id = {
-            '192.168.0.103': 0,
-            '192.168.0.101': 1,
-            '192.168.0.102': 2,
+        self.workers = []
+        self.registry = DroneRegistry(
+            sn2ip={
+                '0TQZK7NED02VMT': '192.168.0.103',
+                '0TQZK7JED02TVJ': '192.168.0.101',
+                '0TQZK5DED02KHL': '192.168.0.102',
+            },
+            id2sn={
+                0: '0TQZK7NED02VMT',
+                1: '0TQZK7JED02TVJ',
+                2: '0TQZK5DED02KHL',
+            })
+        self.sn2ip = self.registry.sn2ip
+        self.id2sn = self.registry.id2sn
+        self.ip2id = self.registry.ip2id
+
+        self.handlers = {
+            Op.COMMENT: self._handle_comments,
+            Op.SCAN: self._handle_scan,
+            Op.ACTION: self._handle_gte,
+            Op.BATTERY_CHECK: self._handle_battery_check,
+            Op.PREFLIGHT: self._handle_preflight,
+            Op.DELAY: self._handle_delay,
+            Op.CORRECT_IP: self._handle_correct_ip,
+            Op.ASSIGN: self._handle_eq,
+            Op.SYNC: self._handle_sync,
+            Op.READ_PAD: self._handle_read_pad,
+            Op.POLY: self._handle_poly,
+            Op.VERTICAL: self._handle_vertical,
+            Op.TRIANGLE: self._handle_triangle,
+            Op.WAVE: self._handle_wave,
+            Op.CIRCLE: self._handle_circle,
+            Op.LINE: self._handle_line,
+            Op.GRID: self._handle_grid,
+            Op.HELIX: self._handle_helix,
+            Op.TIMELINE: self._handle_timeline,
         }
+        self.scheduler = None
+        self.health = None
+        self.barrier = None
+        self.routes_checked = False
 
     def start(self):
         """
@@ -168,53 +444,18 @@ class Swarm(object):
 
         :return: None.
         """
-        def is_invalid_command(command):
-            if command is None:
-                return True
-            c = command.strip()
-            if len(c) == 0:
-                return True
-            if c == '':
-                return True
-            if c == '\n':
-                return True
-            return False
-        
+        SwarmUtil.open_log(self.manager)
+
         try:
-            for command in self.commands:
-                if is_invalid_command(command):
-                    continue
+            self.manager.start_telemetry()
+        except OSError as e:
+            print(f'[TELEMETRY] State stream unavailable: {e}')
 
-                command = command.rstrip()
-
-                if '//' in command:
-                    self._handle_comments(command)
-                elif 'scan' in command:
-                    self._handle_scan(command)
-                elif '>' in command:
-                    self._handle_gte(command)
-                elif 'battery_check' in command:
-                    self._handle_battery_check(command)
-                elif 'delay' in command:
-                    self._handle_delay(command)
-                elif 'correct_ip' in command:
-                    self._handle_correct_ip(command)
-                elif '=' in command:
-                    self._handle_eq(command)
-                elif 'sync' in command:
-                    self._handle_sync(command)
-                elif 'read_pad' in command:
-                    self._handle_read_pad(command)
-                elif 'poly' in command:
-                    self._handle_poly(command)
-                elif 'vertical' in command:
-                    self._handle_vertical(command)
-                elif 'triangle' in command:
-                    self._handle_triangle(command)
-                elif 'wave' in command:
-                    self._handle_wave(command)
-                elif 'circle' in command:
-                    self._handle_circle(command)
+        try:
+            for instruction in self.mission:
+                if instruction.op in Swarm.ROUTED_OPS and not self.routes_checked:
+                    self._check_routes()
+                self.handlers[instruction.op](*instruction.args)
 
             self._wait_for_all()
         except KeyboardInterrupt as ki:
@@ -223,15 +464,37 @@ class Swarm(object):
             self._handle_exception(e)
             traceback.print_exc()
         finally:
+            self._stop_workers()
             SwarmUtil.save_log(self.manager)
+            print(f'[PLAN_CACHE] HITS = {self.cache.hits}, MISSES = {self.cache.misses}')
+            if self.manager.limiter is not None:
+                stats = self.manager.limiter.get_stats()
+                print(f'[RATE_LIMIT] PACKETS = {stats["packets"]}, DELAYED = {stats["delayed"]}, '
+                      f'WAIT = {stats["wait_time"]:.2f}s')
 
     def _handle_read_pad(self):
-        self.start()
-        self.takeoff()
-        mission_pad_number=self.get_mission_pad()
-        print(str(mission_pad_number))
-        self.land()
-        
+        """
+        Handles read pad. Turns on mission pad detection on every drone and reports
+        the pad each one sees from its state stream.
+
+        :return: None.
+        """
+        for queue in self.pools:
+            queue.put('mon')
+
+        self._wait_for_pools()
+
+        telemetry = self.manager.telemetry
+        for tello in self.tellos:
+            state = telemetry.get_latest(tello.tello_ip) if telemetry is not None else None
+            if state is None:
+                log = self.manager.get_log()[tello.tello_ip][-1]
+                print(f'[READ_PAD] IP = {tello.tello_ip}, RESPONSE = {log.response}, NO STATE')
+                continue
+
+            print(f'[READ_PAD] IP = {tello.tello_ip}, PAD = {state["mid"]:.0f}, '
+                  f'X = {state["x"]:.0f}, Y = {state["y"]:.0f}, Z = {state["z"]:.0f}')
+
     def _wait_for_all(self):
         """
         Waits for all queues to be empty and for all responses
@@ -239,103 +502,141 @@ class Swarm(object):
 
         :return: None.
         """
-        while not SwarmUtil.all_queue_empty(self.pools):
-            time.sleep(0.5)
-        
-        time.sleep(1)
+        self._wait_for_pools()
 
-        while not SwarmUtil.all_got_response(self.manager):
-            time.sleep(0.5)
-
-    def _get_commands(self, fpath):
+    def _check_routes(self):
         """
-        Gets the commands.
+        Checks that every drone the mission flies by ID has an SN and was found, before the first
+        command is sent by ID. Raises exception otherwise, so no drone takes off into a show that
+        would stop at the first unknown ID.
 
-        :param fpath: Command file path.
-        :return: List of commands.
+        :return: None.
         """
-        with open(fpath, 'r') as f:
-            return f.readlines()
+        self.routes_checked = True
+        problems = []
+
+        for id in self.mission.get_drone_ids():
+            sn = self.id2sn.get(id)
+            if sn is None:
+                problems.append(f'drone {id + 1} has no SN (add a {id + 1}=SN line)')
+            elif self.sn2ip.get(sn) not in self.ip2id:
+                problems.append(f'drone {id + 1} ({sn}) was not found')
+
+        if len(problems) > 0:
+            raise Exception(f'Cannot route {len(problems)} drone(s): ' + '; '.join(problems))
 
     def _handle_comments(self, command):
         """
         Handles comments.
 
-        :param command: Command.
+        :param command: Comment line.
         :return: None.
         """
         print(f'[COMMENT] {command}')
 
-    def _handle_scan(self, command):
+    def _handle_scan(self, n_tellos):
         """
         Handles scan.
 
-        :param command: Command.
+        :param n_tellos: Number of Tellos to find.
         :return: None.
         """
-        n_tellos = int(command.partition('scan')[2])
 
-        self.manager.find_avaliable_tello(n_tellos)
+        self.manager.find_avaliable_tello(n_tellos, self.registry.known_ips())
         self.tellos = self.manager.get_tello_list()
         self.pools = SwarmUtil.create_execution_pools(n_tellos)
+        self.positions = Formation.line(n_tellos)
 
         for x, (tello, pool) in enumerate(zip(self.tellos, self.pools)):
-            self.ip2id[tello.tello_ip] = x
+            self.registry.set_pool(tello.tello_ip, x)
 
-            t = Thread(target=SwarmUtil.drone_handler, args=(tello, pool))
-            t.daemon = True
-            t.start()
+            worker = DroneWorker(tello, pool)
+            worker.start()
+            self.workers.append(worker)
 
             print(f'[SCAN] IP = {tello.tello_ip}, ID = {x}')
 
-    def _handle_gte(self, command):
+    def _stop_workers(self, drain=True, timeout=None):
         """
-        Handles gte or >.
+        Stops all drone workers and reports their queue depth and busy/idle time.
 
-        :param command: Command.
+        :param drain: If True, queued commands are sent first; otherwise they are discarded.
+        :param timeout: Maximum time (seconds) to wait for each worker; defaults to the command timeout.
         :return: None.
         """
-        id_list = []
-        id = command.partition('>')[0]
+        if timeout is None:
+            timeout = self.manager.COMMAND_TIME_OUT
 
-        if id == '*':
-            id_list = [t for t in range(len(self.tellos))]
-        else:
-            id_list.append(int(id)-1) 
-        
-        action = str(command.partition('>')[2])
+        for x, worker in enumerate(self.workers):
+            if not worker.thread.is_alive():
+                continue
+
+            depth = worker.get_queue_depth()
+            worker.stop(drain, timeout)
+            stats = worker.get_stats()
+
+            print(f'[WORKER] ID = {x}, IP = {worker.tello.tello_ip}, QUEUE = {depth}, '
+                  f'SENT = {stats["commands_sent"]}, BUSY = {stats["busy_time"]:.2f}s, IDLE = {stats["idle_time"]:.2f}s')
+
+    def _handle_gte(self, id_list, action):
+        """
+        Handles gte or >.
 
+        :param id_list: IDs (0-based) of the drones to send the action to.
+        :param action: SDK command.
+        :return: None.
+        """
         for tello_id in id_list:
-            sn = self.id2sn[tello_id]
-            ip = self.sn2ip[sn]
-            id = self.ip2id[ip]
+            sn, ip, id = self.registry.route(tello_id)
 
             self.pools[id].put(action)
             print(f'[ACTION] SN = {sn}, IP = {ip}, ID = {id}, ACTION = {action}')
 
-    def _handle_battery_check(self, command):
+    def _handle_battery_check(self, threshold):
         """
         Handles battery check. Raises exception if any drone has
         battery life lower than specified threshold in the command.
+        Reads the state stream once the queued commands are done; only drones
+        without fresh state are queried.
 
-        :param command: Command.
+        :param threshold: Minimum battery life (%).
         :return: None.
         """
-        threshold = int(command.partition('battery_check')[2])
-        for queue in self.pools:
-            queue.put('battery?')
+        self._wait_for_pools()
+        Swarm.check_battery(self._get_health(), [tello.tello_ip for tello in self.tellos], threshold)
 
-        self._wait_for_all()
+    def _handle_preflight(self, limits, deadline):
+        """
+        Handles preflight. Raises exception if any drone fails a health check
+        (battery, temperature, Wi-Fi SNR, SDK version) or cannot be checked before the deadline.
+
+        :param limits: Limits overriding HealthGate.LIMITS.
+        :param deadline: Maximum time (seconds) to wait for queried values; None for HealthGate.DEADLINE.
+        :return: None.
+        """
+        self._wait_for_pools()
+        Swarm.check_preflight(self._get_health(), [tello.tello_ip for tello in self.tellos], limits, deadline)
+
+    @staticmethod
+    def check_battery(health, ips, threshold):
+        """
+        Checks the battery of every drone. Raises exception if any drone is below the threshold.
+
+        :param health: HealthGate.
+        :param ips: Tello IPs.
+        :param threshold: Minimum battery life (%).
+        :return: None.
+        """
+        values = health.collect(ips, ['battery'], HealthGate.DEADLINE)
 
         is_low = False
 
-        for log in self.manager.get_last_logs():
-            battery = int(log.response)
-            drone_ip = log.drone_ip
+        for drone_ip, checks in values.items():
+            battery, source = checks['battery']
 
-            print(f'[BATTERY] IP = {drone_ip}, LIFE = {battery}%')
+            print(f'[BATTERY] IP = {drone_ip}, LIFE = {battery}%, SOURCE = {source}')
 
-            if battery < threshold:
+            if not HealthGate.evaluate(battery, 'battery', threshold):
                 is_low = True
         
         if is_low:
@@ -343,84 +644,177 @@ class Swarm(object):
         else:
             print('[BATTERY] Passed battery check')
 
-    def _handle_delay(self, command):
+    @staticmethod
+    def check_preflight(health, ips, limits, deadline):
+        """
+        Runs the preflight health checks on every drone. Raises exception if any drone fails.
+
+        :param health: HealthGate.
+        :param ips: Tello IPs.
+        :param limits: Limits overriding HealthGate.LIMITS.
+        :param deadline: Maximum time (seconds) to wait for queried values; None for HealthGate.DEADLINE.
+        :return: None.
+        """
+        limits = dict(HealthGate.LIMITS, **limits)
+        deadline = HealthGate.DEADLINE if deadline is None else deadline
+
+        start = time.monotonic()
+        values = health.collect(ips, list(limits), deadline)
+        elapsed = time.monotonic() - start
+
+        failed = []
+
+        for drone_ip, checks in values.items():
+            results = []
+            for check, limit in limits.items():
+                value, source = checks[check]
+                passed = HealthGate.evaluate(value, check, limit)
+                results.append(f'{check.upper()} = {value} ({source}{"" if passed else ", FAIL"})')
+                if not passed:
+                    failed.append(drone_ip)
+
+            print(f'[PREFLIGHT] IP = {drone_ip}, ' + ', '.join(results))
+
+        if len(failed) > 0:
+            raise Exception(f'Preflight check failed for {sorted(set(failed))}!')
+        else:
+            print(f'[PREFLIGHT] Passed preflight check in {elapsed:.3f}s')
+
+    def _get_health(self):
+        """
+        Gets the health gate, which reads the state stream and queries the drones directly,
+        once their pools are idle.
+
+        :return: HealthGate.
+        """
+        if self.health is None:
+            self.health = HealthGate(self.manager.send_once, self.manager.telemetry)
+        return self.health
+
+    def _handle_delay(self, delay_time):
         """
         Handles delay.
 
-        :param command: Command.
+        :param delay_time: Delay (seconds).
         :return: None.
         """
-        delay_time = float(command.partition('delay')[2])
         print (f'[DELAY] Start Delay for {delay_time} second')
         time.sleep(delay_time)  
 
-    def _handle_correct_ip(self, command):
+    def _handle_correct_ip(self):
         """
-        Handles correction of IPs.
+        Handles correction of IPs. Drones are asked for their SN unless every one of them
+        is at an IP it confirmed before.
 
-        :param command: Command.
         :return: None.
         """
-        for queue in self.pools:
-            queue.put('sn?') 
+        unknown_ips = self._get_unconfirmed_ips()
 
-        self._wait_for_all()
-        
-        for log in self.manager.get_last_logs():
-            sn = str(log.response)
-            tello_ip = str(log.drone_ip)
-            self.sn2ip[sn] = tello_ip
+        for tello_ip in unknown_ips:
+            self.pools[self.ip2id[tello_ip]].put('sn?')
+
+        if len(unknown_ips) > 0:
+            self._wait_for_all()
+
+        for tello_ip in unknown_ips:
+            log = self.manager.get_log()[tello_ip][-1]
+            if log.got_response():
+                self.registry.set_ip(str(log.response), tello_ip, confirmed=True)
+
+        for tello in self.tellos:
+            sn = self.registry.get_sn(tello.tello_ip)
+            source = 'QUERIED' if tello.tello_ip in unknown_ips else 'REGISTRY'
+            print(f'[CORRECT_IP] SN = {sn}, IP = {tello.tello_ip}, SOURCE = {source}')
+
+        self.registry.save()
+
+    def _get_unconfirmed_ips(self):
+        """
+        Gets the IPs whose drones must be asked for their SN. Default and guessed assignments are
+        never trusted, and if any drone is not at an IP it confirmed before, leases may have been
+        reassigned, so every drone is asked.
 
-            print(f'[CORRECT_IP] SN = {sn}, IP = {tello_ip}')
+        :return: List of IPs; empty if every drone is at its confirmed IP.
+        """
+        ips = [tello.tello_ip for tello in self.tellos]
+        if all(self.registry.get_confirmed_sn(ip) is not None for ip in ips):
+            return []
+        return ips
 
-    def _handle_eq(self, command):
+    def _handle_eq(self, id, sn):
         """
         Handles assignments of IDs to serial numbers.
 
-        :param command: Command.
+        :param id: ID (0-based).
+        :param sn: Serial number.
         :return: None.
         """
-        id = int(command.partition('=')[0])
-        sn = command.partition('=')[2]
-        ip = self.sn2ip[sn]
+        ip = self.sn2ip.get(sn)
 
-        self.id2sn[id-1] = sn
+        self.registry.set_sn(id, sn)
+        self.registry.save()
         
-        print(f'[IP_SN_ID] IP = {ip}, SN = {sn}, ID = {id}')
+        print(f'[IP_SN_ID] IP = {ip}, SN = {sn}, ID = {id + 1}')
 
-    def _handle_sync(self, command):
+    def _handle_sync(self, timeout):
 
         
         """
         Handles synchronization.
 
-        :param command: Command.
-        :return: None.
+        :param timeout: Timeout (seconds).
+        :return: A boolean indicating if every drone reached the barrier in time.
         """
-        timeout = float(command.partition('sync')[2])
         print(f'[SYNC] Sync for {timeout} seconds')
 
-        time.sleep(1)
+        self.barrier = SyncBarrier([tello.tello_ip for tello in self.tellos], timeout)
+        for pool in self.pools:
+            pool.put(self.barrier)
+
+        synced = self.barrier.wait_released()
+
+        waits = self.barrier.get_wait_times()
+        for ip, wait in sorted(waits.items(), key=lambda item: -1 if item[1] is None else item[1]):
+            waited = 'NEVER ARRIVED' if wait is None else f'{wait:.3f}s'
+            print(f'[SYNC] IP = {ip}, ID = {self.ip2id.get(ip)}, WAITED = {waited}')
+
+        if synced:
+            print('[SYNC] All commands sent and all responses received')
+        else:
+            print(f'[SYNC] Failed to sync; timeout exceeded waiting for {self.barrier.get_missing()}')
+        return synced
+
+    def _handle_timeline(self, tracks):
+        """
+        Handles a timeline. Each drone's cues are fired at their show times from one clock
+        and queued on the drone's pool, so drones advance independently of each other's acks.
+
+        :param tracks: Dictionary of ID (0-based) to list of (offset in seconds, action).
+        :return: None.
+        """
+        # show time 0 is when the commands before the timeline have completed
+        self._wait_for_pools()
+
+        self.scheduler = ShowScheduler(tracks)
+        print(f'[TIMELINE] {len(tracks)} tracks, {self.scheduler.get_duration():.2f} seconds')
+
+        def dispatch(tello_id, cue):
+            sn, ip, id = self.registry.route(tello_id)
+            self.pools[id].put(cue)
+            print(f'[CUE] SN = {sn}, IP = {ip}, ID = {id}, ACTION = {cue.action}')
 
         try:
-            start = time.time()
-            
-            while not SwarmUtil.all_queue_empty(self.pools):
-                now = time.time()
-                if SwarmUtil.check_timeout(start, now, timeout):
-                    raise RuntimeError('Sync failed since all queues were not empty!')
-
-            print('[SYNC] All queues empty and all commands sent')
-           
-            while not SwarmUtil.all_got_response(self.manager):
-                now = time.time()
-                if SwarmUtil.check_timeout(start, now, timeout):
-                    raise RuntimeError('Sync failed since all responses were not received!')
-            
-            print('[SYNC] All response received')
-        except RuntimeError:
-            print('[SYNC] Failed to sync; timeout exceeded')
-        return self.barrier.wait(timeout)
+            self.scheduler.run(dispatch)
+        finally:
+            self.scheduler.cancel()
+
+        self._wait_for_pools()
+
+        mean, worst = self.scheduler.get_lateness()
+        sent_mean, sent_worst = self.scheduler.get_send_lateness()
+        print(f'[TIMELINE] Fired {len(self.scheduler.fired)} cues, '
+              f'LATENESS = {mean * 1000:.2f}ms mean, {worst * 1000:.2f}ms max queued, '
+              f'{sent_mean * 1000:.2f}ms mean, {sent_worst * 1000:.2f}ms max sent')
 
     def _handle_keyboard_interrupt(self):
         """
@@ -430,9 +824,16 @@ class Swarm(object):
         :return: None.
         """
         print('[QUIT_ALL], KeyboardInterrupt. Sending land to all drones')
-        tello_ips = self.manager.tello_ip_list
-        for ip in tello_ips:
-            self.manager.send_command('land', ip)
+        if self.barrier is not None:
+            self.barrier.abort()
+        self._stop_workers(drain=False, timeout=0)
+        # every drone lands at once instead of waiting for the one before it to touch down
+        threads = [Thread(target=self.manager.send_command, args=('land', ip), daemon=True)
+                   for ip in self.manager.tello_ip_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
 
     def _handle_exception(self, e):
         """
@@ -443,208 +844,162 @@ class Swarm(object):
         """
         print(f'[EXCEPTION], {e}')
 
-    def _handle_vertical(self,command):
+    def _handle_vertical(self):
         """
-        Handles vertical Formation
-        Assumes start with horizontal line up
+        Handles Vertical Formation
+        Assumes start with horizontal line up; the line turns into a column along x,
+        then stands up into a column along z and returns to the line.
         """
+        self._transition('vertical', lambda n: [Formation.column(n, axis=0), Formation.column(n, axis=2),
+                                                Formation.line(n)], pin=(2,))
 
-        #Make horizontal line to vertical on x axis 
-        coordinates={}
-        
-        coordinates.update([('x1',self.home_x-50),('y1',self.home_y+30),('z1',self.home_z),
-                            ('x2',self.home_x+20),('y2',self.home_y),('z2',self.home_z),
-                            ('x3',self.home_x+50),('y3',self.home_y-30),('z3',self.home_z)])
-
-        self.loop(coordinates)
-
-        #Add diagonal
-
-        coordinates.clear()
-        
-        coordinates.update([('x1',self.home_x),('y1',self.home_y),('z1',self.home_z+30),
-                            ('x2',self.home_x-20),('y2',self.home_y),('z2',self.home_z),
-                            ('x3',self.home_x),('y3',self.home_y),('z3',self.home_z-30)])
-
-        self.loop(coordinates)
-
-        #move left right 
-        coordinates.clear()
-        
-        coordinates.update([('x1',self.home_x),('y1',self.home_y-30),('z1',self.home_z),
-                            ('x2',self.home_x+20),('y2',self.home_y),('z2',self.home_z),
-                            ('x3',self.home_x),('y3',self.home_y+30),('z3',self.home_z)])
-        
-        self.loop(coordinates)
-
-        #Return to orginal position (horizontal formation)
-
-        coordinates.clear()
-        
-        coordinates.update([('x1',self.home_x+50),('y1',self.home_x),('z1',self.home_z-30),
-                            ('x2',self.home_x-20),('y2',self.home_y),('z2',self.home_z),
-                            ('x3',self.home_x-50),('y3',self.home_y),('z3',self.home_z+30)])
-
-        self.loop(coordinates)
-        
-    def _handle_wave(self,command):
+    def _handle_wave(self):
         """
         Handles Wave Formation 
-        Assume Horizontal Start 
+        Assume Horizontal Start; neighbours alternate up and down, swap, then level out.
         """
+        # the second wave keeps the first one's slots so every drone swaps height instead of sliding sideways
+        self._transition('wave', lambda n: [Formation.wave(n), Formation.wave(n, phase=np.pi), Formation.line(n)],
+                         hold=(1,), pin=(2,))
 
-        #Make first wave 
-        coordinates={}
-        
-        coordinates.update([('x1',self.home_x),('y1',self.home_y),('z1',self.home_z+60),
-                            ('x2',self.home_x),('y2',self.home_y),('z2',self.home_z-60),
-                            ('x3',self.home_x),('y3',self.home_y),('z3',self.home_z+60)])
+    def _handle_triangle(self):
+        """
+        Handles Triangle Formation
+        Assume horizontal starting position
+        """
+        self._transition('triangle', lambda n: [Formation.triangle(n), Formation.line(n)], pin=(1,))
 
-        self.loop(coordinates)
+    def _handle_circle(self):
+        """
+        Handles Circle Formation
+        Assuming horizontal starting point and always returns to starting point 
+        """
+        self._transition('circle', lambda n: [Formation.circle(n), Formation.line(n)], pin=(1,))
 
-        #Make Second wave 
+    def _handle_poly(self,sides):
+        """
+        Handles Poly Formation 
 
-        coordinates.clear()
-        
-        coordinates.update([('x1',self.home_x),('y1',self.home_y),('z1',self.home_z-60),
-                            ('x2',self.home_x),('y2',self.home_y),('z2',self.home_z+60),
-                            ('x3',self.home_x),('y3',self.home_y),('z3',self.home_z-60)])
+        :param sides: Number of sides.
+        """
+        print(f'[POLY] Sides = {sides}')
 
-        self.loop(coordinates)
+        self._transition('poly', lambda n: [Formation.polygon(n, sides), Formation.line(n)], params=(sides,),
+                         pin=(1,))
 
-        #Return to Original  
-        coordinates.clear()
-        
-        coordinates.update([('x1',self.home_x),('y1',self.home_y),('z1',self.home_z+30),
-                            ('x2',self.home_x),('y2',self.home_y),('z2',self.home_z-30),
-                            ('x3',self.home_x),('y3',self.home_y),('z3',self.home_z+30)])
-        self.loop(coordinates)
+    def _handle_line(self):
+        """
+        Handles Line Formation: returns every drone to its slot on the starting line.
+        """
+        self._transition('line', lambda n: [Formation.line(n)], pin=(0,))
 
-    def _handle_triangle(self,command):
+    def _handle_grid(self):
         """
-        Handles Triangle Formation
+        Handles Grid Formation
         Assume horizontal starting position
         """
-        #Make triangle
-
-        coordinates={}
-        
-        coordinates.update([('x1',self.home_x),('y1',self.home_y),('z1',self.home_z),
-                            ('x2',self.home_x),('y2',self.home_y),('z2',self.home_z+70),
-                            ('x3',self.home_x),('y3',self.home_y),('z3',self.home_z)])
-        self.loop(coordinates)
+        self._transition('grid', lambda n: [Formation.grid(n), Formation.line(n)], pin=(1,))
 
-        #Return to Original  
-        coordinates.clear()
-        
-        coordinates.update([('x1',self.home_x),('y1',self.home_y),('z1',self.home_z),
-                            ('x2',self.home_x),('y2',self.home_y),('z2',self.home_z-70),
-                            ('x3',self.home_x),('y3',self.home_y),('z3',self.home_z)])
-        self.loop(coordinates)
+    def _handle_helix(self):
+        """
+        Handles Helix Formation
+        Assume horizontal starting position
+        """
+        self._transition('helix', lambda n: [Formation.helix(n), Formation.line(n)], pin=(1,))
 
-    def _handle_circle(self,command): 
+    def _transition(self, name, build, params=(), hold=(), pin=()):
         """
-        Handles Circle Formation
-        Assuming horizontal starting point and always returns to starting point 
+        Flies the swarm through formation keyframes. The compiled command streams come from the
+        plan cache when the same formation was planned before from the same positions; otherwise
+        they are planned by _plan_transition and cached. Every keyframe is queued on all pools at
+        once and awaited together.
+
+        :param name: Formation name.
+        :param build: Function taking the number of drones and returning the keyframes.
+        :param params: Formation parameters (part of the cache key).
+        :param hold: Indices of keyframes that reuse the previous keyframe's assignment.
+        :param pin: Indices of keyframes every drone flies to its own slot (ID order), e.g. the return to the line.
+        :return: None.
         """
-        coordinates={}
+        home = np.array([self.home_x, self.home_y, self.home_z], dtype=np.float64)
+        n = len(self.positions)
 
-        coordinates.update([('x1_1',self.home_x),('y1_1',self.home_y+30),('z1_1',self.home_z+30),
-                            ('x1_2',self.home_x),('y1_2',self.home_y+60),('z1_2',self.home_z+30),
-                            ('x2_1',self.home_x+30),('y2_1',self.home_y),('z2_1',self.home_z+30),
-                            ('x2_2',self.home_x+30),('y2_2',self.home_y),('z2_2',self.home_z+30),
-                            ('x3_1',self.home_x),('y3_1',self.home_y-30),('z3_1',self.home_z+30),
-                            ('x3_2',self.home_x),('y3_2',self.home_y-60),('z3_2',self.home_z+30)])
-        
-        self.circleloop(coordinates)
+        key = PlanCache.make_key('formation', Formation.VERSION, name, params, hold, pin, n, self.positions.tobytes(),
+                                 home.tobytes(), self.assignment, self.coalesce)
+        plan = self.cache.get_or_compute(key, lambda: self._plan_transition(build(n), home, hold, pin))
 
+        for k, (steps, positions, longest, total) in enumerate(plan):
+            print(f'[FORMATION] {name} {k + 1}/{len(plan)}, MAX = {longest:.0f}cm, TOTAL = {total:.0f}cm')
 
-    def _handle_poly(self,command):
-        """
-        Handles Poly Formation 
+            for commands in steps:
+                for tello_id, drone_commands in enumerate(commands):
+                    sn, ip, _ = self.registry.route(tello_id)
+                    for command in drone_commands:
+                        self._queue_command(command, ip)
+
+            self._wait_for_pools()
+            self.positions = positions
 
+    def _plan_transition(self, keyframes, home, hold=(), pin=()):
+        """
+        Plans a formation transition. Drones are assigned to each keyframe's slots by
+        self.assignment ('makespan', 'distance', or None for ID order) and every drone's
+        relative move is turned into commands in one batch.
+
+        :param keyframes: List of N x 3 slot positions relative to home.
+        :param home: Home position.
+        :param hold: Indices of keyframes that reuse the previous keyframe's assignment.
+        :param pin: Indices of keyframes every drone flies to its own slot (ID order).
+        :return: List (one per keyframe) of (steps, positions reached, longest flight, total flight),
+                 where steps is a list of per-ID command lists.
+        """
+        plan = []
+        positions = self.positions
+        slots = np.arange(len(positions))
+
+        for k, keyframe in enumerate(keyframes):
+            target = keyframe + home
+            if k in pin:
+                # later per-ID lines expect each drone back in its own slot
+                slots = np.arange(len(positions))
+            elif self.assignment is not None and k not in hold:
+                slots = Formation.assign(positions, target, self.assignment)
+            target = target[slots]
+
+            distances = np.linalg.norm(target - positions, axis=1)
+            moves, positions = Formation.get_moves(positions, target)
+
+            steps = []
+            for step in moves:
+                commands = []
+                for x, y, z in step.tolist():
+                    merged = Coalescer.get_commands((x, -y, z)) if self.coalesce else None
+                    commands.append(merged if merged is not None else SwarmUtil.get_ned_commands(x, y, z))
+                steps.append(commands)
+
+            plan.append((steps, positions, float(distances.max(initial=0)), float(distances.sum())))
+
+        return plan
+
+    def _queue_command(self, command, ip):
         """
-       # Swarm = TelloSwarm()
-      #  Swarm.connect()
+        Queues a command on the execution pool of the drone at the IP, so
+        formation steps fan out to all drones concurrently.
 
-      #  for drone in Swarm.drones:
-            #drone.takeoff()
+        :param command: Command.
+        :param ip: Tello IP.
+        :return: None.
+        """
+        self.pools[self.ip2id[ip]].put(command)
 
-        sides = int(command.partition('poly')[2])
-        print(s)
+    def _wait_for_pools(self):
+        """
+        Blocks until every queued command has been sent and acked (or timed out).
 
-        tello_ips = self.manager.tello_ip_list
-        for ip in tello_ips:
-            for s in range(sides):
-                command= "forward 25" #to update 
-                self.manager.send_command(command,ip)
-                command2= ip+(f">ccw {(round(360/sides))}")
-                self.manager.send_command(command2,ip)
-            pass
-        
-    def loop(self,coordinates):
-        id_list=[]
-        id_list=[t for t in range(len(self.tellos))]
-        num=0
-        
-        for tello_id in id_list:
-            sn = self.id2sn[tello_id]
-            ip = self.sn2ip[sn]
-            if num==0:
-                print(f'{str(num)}{str(ip)}')
-                print(f'{coordinates["x1"]},{coordinates["y1"]},{coordinates["z1"]}')
-                self.moveNED(coordinates["x1"],coordinates["y1"],coordinates["z1"],ip)
-            elif num==1:
-                print(f'{str(num)}{str(ip)}')
-                print(f'{coordinates["x2"]},{coordinates["y2"]},{coordinates["z2"]}')
-                self.moveNED(coordinates["x2"],coordinates["y2"],coordinates["z2"],ip)
-            elif num==2:
-                print(f'{str(num)}{str(ip)}')
-                print(f'{coordinates["x3"]},{coordinates["y3"]},{coordinates["z3"]}')
-                self.moveNED(coordinates["x3"],coordinates["y3"],coordinates["z3"],ip)
-            num=num+1
-    
-    def circleloop(self,coordinates):
-        id_list=[]
-        id_list=[t for t in range(len(self.tellos))]
-        num=0
-        
-        for tello_id in id_list:
-            sn = self.id2sn[tello_id]
-            ip = self.sn2ip[sn]
-            if num==0:
-                print(f'{str(num)}{str(ip)}')
-                print(f'{coordinates["x1_1"]},{coordinates["y1_1"]},{coordinates["z1_1"]},{coordinates["x1_2"]},{coordinates["y1_2"]},{coordinates["z1_2"]}')
-                self.makeCircle(coordinates["x1_1"],coordinates["y1_1"],coordinates["z1_1"],
-                                coordinates["x1_2"],coordinates["y1_2"],coordinates["z1_2"],ip)
-
-            elif num==1:
-                print(f'{str(num)}{str(ip)}')
-                print(f'{coordinates["x2_1"]},{coordinates["y2_1"]},{coordinates["z2_1"]},{coordinates["x2_2"]},{coordinates["y2_2"]},{coordinates["z2_2"]}')
-                self.makeCircle(coordinates["x2_1"],coordinates["y2_1"],coordinates["z2_1"],
-                                coordinates["x2_2"],coordinates["y2_2"],coordinates["z2_2"],ip)
-                
-            elif num==2:
-                print(f'{str(num)}{str(ip)}')
-                print(f'{coordinates["x3_1"]},{coordinates["y3_1"]},{coordinates["z3_1"]},{coordinates["x3_2"]},{coordinates["y3_2"]},{coordinates["z3_2"]}')
-                self.makeCircle(coordinates["x3_1"],coordinates["y3_1"],coordinates["z3_1"],
-                                coordinates["x3_2"],coordinates["y3_2"],coordinates["z3_2"],ip)
-            num=num+1
-
-
-    def makeCircle(self,x,y,z,x1,y1,z1,ip):
-        x2_1=x*-1
-        y2_1=y*-1
-        z2_1=z*-1
-        x2_2=x1*-1
-        y2_2=y1*-1
-        z2_2=z1*-1
-
-        self.manager.send_command("curve "+ str(x) + " " +str(y) + " " +str(z)
-                                  +" "+ str(x1)+ " " +str(y1) + " "+str(z1)+" "+str(30),ip)
-        
-        self.manager.send_command("curve "+ str(x2_1) + " " +str(y2_1) + " " +str(z2_1)
-                                  +" "+ str(x2_2)+ " " +str(y2_2) + " "+str(z2_2)+" "+str(30),ip)
+        :return: None.
+        """
+        for pool in self.pools:
+            pool.join()
 
     def moveENU(self,x,y,z,ip):
         x2=x*-1
@@ -652,39 +1007,20 @@ class Swarm(object):
         z2=z*-1
 
         if y>0:
-            self.manager.send_command("forward "+str(y),ip)             
+            self._queue_command("forward "+str(y),ip)             
         elif y<0:
-            self.manager.send_command("back "+str(y2),ip)
+            self._queue_command("back "+str(y2),ip)
 
         if x>0:
-            self.manager.send_command("right "+str(x),ip)
+            self._queue_command("right "+str(x),ip)
         elif x<0:
-            self.manager.send_command("left "+str(x2),ip)
+            self._queue_command("left "+str(x2),ip)
 
         if z>0:
-            self.manager.send_command("up "+str(z),ip)
+            self._queue_command("up "+str(z),ip)
         elif z<0:
-            self.manager.send_command("down "+str(z2),ip)
+            self._queue_command("down "+str(z2),ip)
 
     def moveNED(self,x,y,z,ip):
-        y2=y*-1
-        x2=x*-1
-        z2=z*-1
-
-        if x>0:
-            self.manager.send_command("forward "+str(x),ip)
-        elif x<0:
-            self.manager.send_command("back "+str(x2),ip)
-
-        if y>0:
-            self.manager.send_command("right "+str(y),ip)
-        elif y<0:
-            self.manager.send_command("left "+str(y2),ip)
-    
-        if z>0:
-            self.manager.send_command("up "+str(z),ip)
-        elif z<0:                                                                                                              
-             self.manager.send_command("down "+str(z2),ip)
-        
-
-    
\ No newline at end of file
+        for command in SwarmUtil.get_ned_commands(x, y, z):
+            self._queue_command(command, ip)
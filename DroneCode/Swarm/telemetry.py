@@ -0,0 +1,214 @@
+import socket
+import threading
+import time
+import numpy as np
+
+
+class TelemetryBuffer(object):
+    """
+    Fixed-size ring of state samples for one Tello. Rows are preallocated; each packet
+    overwrites the oldest row in place.
+    """
+
+    def __init__(self, capacity, num_fields):
+        """
+        Ctor.
+
+        :param capacity: Number of samples kept.
+        :param num_fields: Number of fields per sample.
+        """
+        self.values = np.full((capacity, num_fields), np.nan)
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+
+    def get_order(self):
+        """
+        Gets the row indices of the kept samples, oldest first.
+
+        :return: Array of row indices.
+        """
+        capacity = len(self.times)
+        n = min(self.count, capacity)
+        return (self.count - n + np.arange(n)) % capacity
+
+
+class TelemetryReceiver(object):
+    """
+    Receives the state string every Tello EDU pushes (about 10 Hz) to port 8890 of the
+    host that put it in SDK mode, e.g.
+    'mid:-1;x:0;y:0;z:0;mpry:0,0,0;pitch:0;roll:0;yaw:0;vgx:0;vgy:0;vgz:0;templ:83;temph:85;
+    tof:10;h:0;bat:90;baro:-55.48;time:0;agx:-5.00;agy:0.00;agz:-998.00;'
+    Samples go into a TelemetryBuffer per Tello, so telemetry is read without a round trip.
+    """
+
+    FIELDS = ('mid', 'x', 'y', 'z', 'mpry_p', 'mpry_r', 'mpry_y', 'pitch', 'roll', 'yaw',
+              'vgx', 'vgy', 'vgz', 'templ', 'temph', 'tof', 'h', 'bat', 'baro', 'time',
+              'agx', 'agy', 'agz')
+
+    COLUMNS = {field: c for c, field in enumerate(FIELDS)}
+
+    # keys whose value is a comma separated triple
+    TRIPLES = {b'mpry': COLUMNS['mpry_p']}
+
+    def __init__(self, local_ip='', port=8890, capacity=100):
+        """
+        Ctor.
+
+        :param local_ip: Local IP to bind; '' binds all interfaces.
+        :param port: Local port to bind.
+        :param capacity: Samples kept per Tello (100 is about 10 seconds).
+        """
+        self.local_ip = local_ip
+        self.port = port
+        self.capacity = capacity
+
+        self.buffers = {}
+        self.lock = threading.Lock()
+        self.packets = 0
+        self.errors = 0
+
+        # byte keys to columns, so parsing does not decode
+        self.columns = {field.encode('ascii'): c for field, c in TelemetryReceiver.COLUMNS.items()}
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((self.local_ip, self.port))
+
+        self.running = True
+        self.receive_thread = threading.Thread(target=self._receive_thread)
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+
+    def _receive_thread(self):
+        """
+        Receives state packets into one reused buffer.
+
+        :return: None.
+        """
+        packet = bytearray(2048)
+        view = memoryview(packet)
+
+        while self.running:
+            try:
+                size, address = self.socket.recvfrom_into(packet)
+            except socket.error:
+                continue
+
+            if not self.running:
+                break
+            if size == 0:
+                continue
+
+            try:
+                self._handle_state(view[:size], address[0])
+            except (ValueError, IndexError):
+                self.errors += 1
+
+    def _handle_state(self, data, ip):
+        """
+        Parses one state packet straight into the next row of the Tello's ring.
+
+        :param data: Packet bytes.
+        :param ip: Tello IP.
+        :return: None.
+        """
+        with self.lock:
+            buffer = self.buffers.get(ip)
+            if buffer is None:
+                buffer = self.buffers[ip] = TelemetryBuffer(self.capacity, len(TelemetryReceiver.FIELDS))
+
+            index = buffer.count % self.capacity
+            row = buffer.values[index]
+            row.fill(np.nan)
+
+            for item in bytes(data).split(b';'):
+                key, _, value = item.partition(b':')
+                column = self.columns.get(key)
+                if column is not None:
+                    row[column] = float(value)
+                elif key in TelemetryReceiver.TRIPLES:
+                    column = TelemetryReceiver.TRIPLES[key]
+                    row[column:column + 3] = [float(v) for v in value.split(b',')]
+
+            buffer.times[index] = time.monotonic_ns()
+            buffer.count += 1
+            self.packets += 1
+
+    def close(self):
+        """
+        Stops the receive thread and closes the socket.
+
+        :return: None.
+        """
+        self.running = False
+
+        try:
+            host, port = self.socket.getsockname()
+            self.socket.sendto(b'', ('127.0.0.1' if host in ('', '0.0.0.0') else host, port))
+        except socket.error:
+            pass
+
+        self.receive_thread.join(1.0)
+        self.socket.close()
+
+    def get_ips(self):
+        """
+        Gets the IPs that have sent state.
+
+        :return: List of IPs.
+        """
+        with self.lock:
+            return list(self.buffers.keys())
+
+    def get_age(self, ip):
+        """
+        Gets how old the latest sample of a Tello is.
+
+        :param ip: Tello IP.
+        :return: Age in seconds, or None if the Tello never sent state.
+        """
+        with self.lock:
+            buffer = self.buffers.get(ip)
+            if buffer is None or buffer.count == 0:
+                return None
+            return (time.monotonic_ns() - buffer.times[(buffer.count - 1) % self.capacity]) / 1e9
+
+    def get_latest(self, ip, field=None):
+        """
+        Gets the latest sample of a Tello.
+
+        :param ip: Tello IP.
+        :param field: Field name (see FIELDS); None gets every field.
+        :return: Value (NaN if the Tello did not send it), dictionary of field to value, or None if no sample.
+        """
+        with self.lock:
+            buffer = self.buffers.get(ip)
+            if buffer is None or buffer.count == 0:
+                return None
+
+            row = buffer.values[(buffer.count - 1) % self.capacity]
+            if field is not None:
+                return float(row[TelemetryReceiver.COLUMNS[field]])
+            return dict(zip(TelemetryReceiver.FIELDS, row.tolist()))
+
+    def get_window(self, ip, field, seconds):
+        """
+        Gets the samples of one field over the last seconds.
+
+        :param ip: Tello IP.
+        :param field: Field name (see FIELDS).
+        :param seconds: Window length.
+        :return: Tuple of (ages in seconds, values), oldest first; empty arrays if no sample.
+        """
+        now = time.monotonic_ns()
+
+        with self.lock:
+            buffer = self.buffers.get(ip)
+            if buffer is None:
+                return np.array([]), np.array([])
+
+            order = buffer.get_order()
+            times = buffer.times[order]
+            values = buffer.values[order, TelemetryReceiver.COLUMNS[field]]
+
+        keep = times >= now - int(seconds * 1e9)
+        return (now - times[keep]) / 1e9, values[keep]
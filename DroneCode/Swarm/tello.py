@@ -5,10 +5,15 @@ import time
 import netifaces
 import netaddr
 from netaddr import IPNetwork
-from collections import defaultdict
+from collections import defaultdict, deque
 import binascii
 from datetime import datetime
+from telemetry import TelemetryReceiver
+from rtt import RttEstimator
+from rate_limit import RateLimiter
 import itertools
+import math
+from contextlib import suppress
 
 class Tello(object):
     """
@@ -41,80 +46,194 @@ class TelloManager(object):
     Tello Manager.
     """
 
-    def __init__(self):
+    # commands acked only once the drone has finished flying them; everything else is acked at once
+    MOTION_COMMANDS = {'takeoff', 'land', 'up', 'down', 'left', 'right', 'forward', 'back',
+                       'cw', 'ccw', 'flip', 'go', 'curve', 'jump'}
+
+    # commands that can be resent without flying a drone further than the first one did:
+    # settings, and takeoff/land/stop, which a flying (or landed) drone just rejects
+    IDEMPOTENT_COMMANDS = {'command', 'takeoff', 'land', 'emergency', 'stop', 'speed',
+                           'mon', 'moff', 'mdirection', 'streamon', 'streamoff'}
+
+    # nominal flight times (seconds) of motion commands without a distance
+    NOMINAL_TIMES = {'takeoff': 5.0, 'land': 3.0, 'flip': 2.0}
+
+    # assumed until a 'speed' command is acked (cm/s), and for rotations (degrees/s)
+    DEFAULT_SPEED = 50.0
+    ROTATION_SPEED = 90.0
+
+    # added to the travel time of moves and rotations (seconds): accelerating, braking and hovering still
+    SETTLE_TIME = 2.0
+
+    def __init__(self, local_ip='', local_port=8889, possible_ips=None):
         """
         Ctor.
+        :param local_ip: Local IP to bind; '' binds all interfaces.
+        :param local_port: Local port to bind.
+        :param possible_ips: IPs to search for Tellos; None searches the 192.168.0.x subnets.
         """
-        self.local_ip = ''
-        self.local_port = 8889
+        self._init_state(local_ip, local_port, possible_ips)
+
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind((self.local_ip, self.local_port))
 
         # thread for receiving cmd ack
+        self.running = True
         self.receive_thread = threading.Thread(target=self._receive_thread)
         self.receive_thread.daemon = True
         self.receive_thread.start()
 
+    def _init_state(self, local_ip='', local_port=8889, possible_ips=None):
+        """
+        Initializes the bookkeeping shared by every transport.
+
+        :param local_ip: Local IP to bind; '' binds all interfaces.
+        :param local_port: Local port to bind.
+        :param possible_ips: IPs to search for Tellos; None searches the 192.168.0.x subnets.
+        :return: None.
+        """
+        self.local_ip = local_ip
+        self.local_port = local_port
+        self.possible_ips = possible_ips
+
         self.tello_ip_list = []
         self.tello_list = []
-        self.log = defaultdict(list)
+
+        # only the last LOG_WINDOW commands per drone stay in memory; completed commands
+        # are streamed to log_writer (a SessionLogWriter) when one is set
+        self.LOG_WINDOW = 100
+        self.log = defaultdict(lambda: deque(maxlen=self.LOG_WINDOW))
+        self.log_writer = None
+        self.command_count = defaultdict(int)
 
         self.COMMAND_TIME_OUT = 20.0
 
-        self.last_response_index = {}
+        # response times are modelled per drone, separately for commands acked at once ('query')
+        # and for the slack over a move's nominal flight time ('motion'); lost commands are resent
+        # with exponential backoff up to MAX_RETRIES times when resending is safe; motion timeouts
+        # stay at least COMMAND_TIME_OUT until MOTION_SAMPLES moves of a drone have been timed
+        self.MAX_RETRIES = 3
+        self.MOTION_SAMPLES = 3
+
+        # a move acked sooner than this share of its travel time was not the command acked
+        # (a simulator running moves faster than real time needs a smaller share)
+        self.EARLY_ACK = 0.5
+        self.rtt = defaultdict(dict)
+        self.speeds = {}
+        self.retransmissions = 0
+
+        # paces datagrams so bursts do not overrun the router; None sends without limit
+        self.limiter = RateLimiter()
+
+        # late answers to a resent command, dropped instead of being credited to the next one:
+        # IP to (response, count, monotonic deadline in ns)
+        self.echoes = {}
+
+        # discovery re-probes start this often (seconds) and back off up to the max
+        self.DISCOVERY_INTERVAL = 0.1
+        self.DISCOVERY_MAX_INTERVAL = 5.0
+        # how long (seconds) known addresses get to answer before the full sweep
+        self.DISCOVERY_WARM_TIME_OUT = 0.5
+        self.probes = {}
+        self.discovery_cond = threading.Condition()
+
         self.str_cmd_index = {}
 
-    def find_avaliable_tello(self, num):
+        # outstanding requests per drone, so each response is credited to the command it answers
+        self.outstanding = {}
+        self.outstanding_seq = defaultdict(dict)
+        self.outstanding_lock = threading.Lock()
+
+        # senders wait on their drone's condition for the outstanding request to be answered
+        self.answered = defaultdict(lambda: threading.Condition(self.outstanding_lock))
+
+        # state stream receiver (port 8890), see start_telemetry
+        self.telemetry = None
+
+    def find_avaliable_tello(self, num, known_ips=None):
         """
-        Find Tellos.
+        Find Tellos. Returns as soon as num Tellos have acked; addresses that have not answered
+        are re-probed with exponential backoff. Only Tellos that answer get a log entry.
         :param num: Number of Tellos to search.
+        :param known_ips: IPs where Tellos were last seen; verified first, before sweeping the subnet.
         :return: None
         """
+        known_ips = [ip for ip in (known_ips or []) if ip not in self.tello_ip_list]
+
+        if len(known_ips) > 0:
+            print(f'[SEARCHING], Verifying {len(known_ips)} known IP addresses')
+            self._probe(known_ips, 0, num)
+
+            with self.discovery_cond:
+                self.discovery_cond.wait_for(
+                    lambda: len(self.tello_ip_list) >= num or all(ip in self.tello_ip_list for ip in known_ips),
+                    self.DISCOVERY_WARM_TIME_OUT)
+
+        if len(self.tello_ip_list) >= num:
+            self.probes.clear()
+            return
+
         possible_ips = self.get_possible_ips()
 
         print(f'[SEARCHING], Searching for {num} from {len(possible_ips)} possible IP addresses')
 
         iters = 0
+        interval = self.DISCOVERY_INTERVAL
 
         while len(self.tello_ip_list) < num:
             print(f'[SEARCHING], Trying to find Tellos, number of tries = {iters + 1}')
             print(self.tello_ip_list)
             
-            # delete already found Tello
-            for tello_ip in self.tello_ip_list:
-                if tello_ip in possible_ips:
-                    possible_ips.remove(tello_ip)
+            # skip already found Tello
+            possible_ips = [ip for ip in possible_ips if ip not in self.tello_ip_list]
+            self._probe(possible_ips, iters, num)
 
-            # skip server itself
-            for ip in possible_ips:
-                cmd_id = len(self.log[ip])
-                self.log[ip].append(Stats('command', cmd_id))
+            iters = iters + 1
 
-                # print(f'{iters}: sending command to {ip}:8889')
+            with self.discovery_cond:
+                self.discovery_cond.wait_for(lambda: len(self.tello_ip_list) >= num, interval)
+            interval = min(interval * 2, self.DISCOVERY_MAX_INTERVAL)
 
-                try:
-                    self.socket.sendto(b'command', (ip, 8889))
-                except:
-                    print(f'{iters}: ERROR: {ip}:8889')
-                    pass
+        self.probes.clear()
 
-            iters = iters + 1
-            time.sleep(5)
-        # filter out non-tello addresses in log
-        temp = defaultdict(list)
-        for ip in self.tello_ip_list:
-            temp[ip] = self.log[ip]
-        self.log = temp
+    def _probe(self, ips, iters, num=None):
+        """
+        Sends the 'command' probe to each IP, stopping once num Tellos have answered.
+        :param ips: IPs to probe.
+        :param iters: Discovery round, for error messages.
+        :param num: Number of Tellos searched for; None probes every IP.
+        :return: None
+        """
+        for ip in ips:
+            # probes are paced by the limiter, so drones found mid-sweep end it early
+            if num is not None and len(self.tello_ip_list) >= num:
+                break
+
+            if self.limiter is not None:
+                self.limiter.acquire(ip, 1, RateLimiter.DISCOVERY)
+
+            self.probes[ip] = time.monotonic_ns()
+
+            try:
+                self._sendto(b'command', ip)
+            except:
+                print(f'{iters}: ERROR: {ip}:8889')
+                pass
 
     def get_possible_ips(self):
         """
-        Gets all the possible IP addresses for subnets that the computer is a part of.
+        Gets all the possible IP addresses for subnets that the computer is a part of,
+        or the configured possible_ips.
         :return: List of IP addresses.
         """
+        if self.possible_ips is not None:
+            return list(self.possible_ips)
+
         infos = self.get_subnets()
         ips = SubnetInfo.flatten([info.get_ips() for info in infos])
         ips = list(filter(lambda ip: ip.startswith('192.168.0.'), ips))
         return ips
+
     def get_subnets(self):
         """
         Gets all subnet information.
@@ -152,12 +271,269 @@ class TelloManager(object):
     def send_command(self, command, ip):
         """
         Sends a command to the IP address. Will be blocked until the last command receives an 'OK'.
-        If the command fails (either b/c time out or error),  will try to resend the command.
+        If no response arrives within the drone's adaptive timeout, queries, settings and other
+        commands that are safe to repeat are resent with exponential backoff; relative moves are not,
+        since a lost ack would make the drone fly them twice.
+        The caller sleeps on its drone's condition (notified by the receive thread)
+        instead of polling, so waiting costs no CPU.
 
         :param command: Command.
         :param ip: Tello IP.
         :return: Response.
         """
+        real_command, stats, packets = self._prepare_command(command, ip)
+
+        for backoff in range(self.get_max_retries(command) + 1):
+            timeout = self.get_timeout(real_command, ip, backoff)
+            if backoff > 0:
+                self._on_retransmit(ip, real_command, backoff, timeout)
+
+            if self.limiter is not None:
+                self.limiter.acquire(ip, len(packets), RateLimiter.get_lane(real_command))
+
+            sent_ns = time.monotonic_ns()
+            for packet in packets:
+                self._sendto(packet, ip)
+
+            if self._wait_for_response(ip, stats, timeout):
+                self._on_response(ip, command, stats, backoff + 1, timeout, sent_ns)
+                return stats.response
+
+        self._untrack(ip, stats)
+        self._record(ip, stats)
+        print(f'[NO_RESPONSE] Max timeout exceeded for command: {real_command}')
+        return
+
+    def send_once(self, command, ip, timeout):
+        """
+        Sends a command once, without retransmission, and waits at most timeout for its response.
+        Used by health checks, whose deadline covers the whole check.
+
+        :param command: Command.
+        :param ip: Tello IP.
+        :param timeout: Maximum time (seconds) to wait for the response.
+        :return: Response, or None if none arrived in time.
+        """
+        real_command, stats, packets = self._prepare_command(command, ip)
+
+        if self.limiter is not None:
+            self.limiter.acquire(ip, len(packets), RateLimiter.get_lane(real_command))
+
+        sent_ns = time.monotonic_ns()
+        for packet in packets:
+            self._sendto(packet, ip)
+
+        if self._wait_for_response(ip, stats, timeout):
+            self._on_response(ip, command, stats, 1, timeout, sent_ns)
+            return stats.response
+
+        self._untrack(ip, stats)
+        self._record(ip, stats)
+        print(f'[NO_RESPONSE] No response within {timeout:.3f}s for command: {real_command}')
+        return
+
+    def _sendto(self, packet, ip):
+        """
+        Sends one datagram to a Tello's command port.
+
+        :param packet: Datagram.
+        :param ip: Tello IP.
+        :return: None.
+        """
+        self.socket.sendto(packet, (ip, 8889))
+
+    def get_max_retries(self, command):
+        """
+        Gets how often a command may be resent.
+        Queries, settings, takeoff/land and 'Re' multi-commands (which the drone runs once per index)
+        are safe to resend, as are mission pad moves, whose targets are absolute.
+
+        :param command: Command, including any 'Re' prefix.
+        :return: Number of retransmissions.
+        """
+        if command[:2] == 'Re':
+            return self.MAX_RETRIES
+
+        parts = command.split()
+        if len(parts) == 0:
+            return 0
+
+        word = parts[0]
+        if word.endswith('?') or word in TelloManager.IDEMPOTENT_COMMANDS:
+            return self.MAX_RETRIES
+        if word in ('go', 'curve') and parts[-1][:1] == 'm':
+            return self.MAX_RETRIES
+        return 0
+
+    def get_rtt(self, ip, kind):
+        """
+        Gets a drone's response time model.
+
+        :param ip: Tello IP.
+        :param kind: 'query' or 'motion'.
+        :return: RttEstimator.
+        """
+        models = self.rtt[ip]
+        if kind not in models:
+            if kind == 'motion':
+                models[kind] = RttEstimator(5.0, 1.0, self.COMMAND_TIME_OUT)
+            else:
+                models[kind] = RttEstimator(1.0, 0.2, self.COMMAND_TIME_OUT)
+        return models[kind]
+
+    def get_timeout(self, command, ip, backoff=0):
+        """
+        Gets how long to wait for the response to one transmission of a command.
+        Motion commands get their nominal flight time plus the adaptive slack, but no less than
+        COMMAND_TIME_OUT until enough of the drone's moves have been timed.
+
+        :param command: Command, without any 'Re' prefix.
+        :param ip: Tello IP.
+        :param backoff: Number of retransmissions so far.
+        :return: Timeout (seconds).
+        """
+        if TelloManager.is_motion(command):
+            rtt = self.get_rtt(ip, 'motion')
+            timeout = self.get_nominal_time(command, ip) + rtt.get_timeout(backoff)
+            if rtt.samples < self.MOTION_SAMPLES:
+                timeout = max(timeout, self.COMMAND_TIME_OUT)
+            return timeout
+        return self.get_rtt(ip, 'query').get_timeout(backoff)
+
+    @staticmethod
+    def is_motion(command):
+        """
+        Checks if a command is acked only once the drone has flown it.
+
+        :param command: Command, without any 'Re' prefix.
+        :return: A boolean indicating if the command is a motion command.
+        """
+        parts = command.split()
+        return len(parts) > 0 and parts[0] in TelloManager.MOTION_COMMANDS
+
+    def get_nominal_time(self, command, ip):
+        """
+        Gets how long a motion command should take to fly, from its distance and speed plus SETTLE_TIME.
+
+        :param command: Command, without any 'Re' prefix.
+        :param ip: Tello IP.
+        :return: Nominal time (seconds); 0 if unknown.
+        """
+        travel = self.get_travel_time(command, ip)
+        if travel > 0 and command.split()[0] not in TelloManager.NOMINAL_TIMES:
+            return travel + TelloManager.SETTLE_TIME
+        return travel
+
+    def get_travel_time(self, command, ip):
+        """
+        Gets how long a motion command takes to fly at the drone's speed, without settling.
+
+        :param command: Command, without any 'Re' prefix.
+        :param ip: Tello IP.
+        :return: Travel time (seconds); 0 if unknown.
+        """
+        parts = command.split()
+        word = parts[0]
+        if word in TelloManager.NOMINAL_TIMES:
+            return TelloManager.NOMINAL_TIMES[word]
+
+        try:
+            args = [float(p) for p in parts[1:] if p[:1] != 'm']
+            if word in ('up', 'down', 'left', 'right', 'forward', 'back'):
+                return abs(args[0]) / self.speeds.get(ip, TelloManager.DEFAULT_SPEED)
+            if word in ('cw', 'ccw'):
+                return abs(args[0]) / TelloManager.ROTATION_SPEED
+            if word in ('go', 'jump'):
+                return math.dist(args[:3], (0, 0, 0)) / max(args[3], 1.0)
+            if word == 'curve':
+                return (math.dist(args[:3], (0, 0, 0)) + math.dist(args[3:6], args[:3])) / max(args[6], 1.0)
+        except (IndexError, ValueError):
+            pass
+
+        return 0.0
+
+    def _on_response(self, ip, command, stats, transmissions, timeout, sent_ns):
+        """
+        Learns from an answered command: a first transmission's response time updates the
+        drone's model, and late answers to earlier transmissions of a resent command are expected.
+
+        :param ip: Tello IP.
+        :param command: Command, including any 'Re' prefix.
+        :param stats: Stats of the command.
+        :param transmissions: Number of times the command was sent.
+        :param timeout: Timeout (seconds) of the last transmission.
+        :param sent_ns: Monotonic time (nanoseconds) the last transmission was sent, after any rate limiting.
+        :return: None.
+        """
+        multi = command[:2] == 'Re'
+        command = stats.command
+
+        if transmissions == 1:
+            # only unambiguous samples count (Karn's algorithm)
+            sample = (stats.end_ns - sent_ns) / 1e9
+            if TelloManager.is_motion(command):
+                self.get_rtt(ip, 'motion').update(max(0.0, sample - self.get_nominal_time(command, ip)))
+            else:
+                self.get_rtt(ip, 'query').update(max(0.0, sample))
+        elif not multi and not TelloManager.is_motion(command):
+            # plain responses carry no sequence number, so duplicates are recognised by content;
+            # a motion ack can come any time, so only answers to immediate commands are expected
+            with self.outstanding_lock:
+                self.echoes[ip] = (stats.response, transmissions - 1, time.monotonic_ns() + int(timeout * 1e9))
+
+        parts = command.split()
+        if len(parts) == 2 and parts[0] == 'speed' and str(stats.response).lower() == 'ok':
+            with suppress(ValueError):
+                self.speeds[ip] = float(parts[1])
+
+    def _on_retransmit(self, ip, command, backoff, timeout):
+        """
+        Counts and reports a retransmission.
+
+        :param ip: Tello IP.
+        :param command: Command.
+        :param backoff: Number of retransmissions so far, including this one.
+        :param timeout: Timeout (seconds) of this transmission.
+        :return: None.
+        """
+        self.retransmissions += 1
+        print(f'[RETRY] IP={ip}, COMMAND={command}, ATTEMPT={backoff + 1}, TIMEOUT={timeout:.3f}s')
+
+    def _is_echo(self, ip, response):
+        """
+        Checks if a plain response is a late answer to an earlier transmission of a resent command.
+        Only used when no command is outstanding for the drone. Must be called with the outstanding lock held.
+
+        :param ip: Tello IP.
+        :param response: Response.
+        :return: A boolean indicating if the response should be dropped.
+        """
+        echo = self.echoes.get(ip)
+        if echo is None:
+            return False
+
+        expected, count, deadline = echo
+        if time.monotonic_ns() > deadline:
+            del self.echoes[ip]
+            return False
+        if response != expected:
+            return False
+
+        if count > 1:
+            self.echoes[ip] = (expected, count - 1, deadline)
+        else:
+            del self.echoes[ip]
+        return True
+
+    def _prepare_command(self, command, ip):
+        """
+        Logs a command and builds the datagrams to send for it.
+        The command is registered before sending so a fast ack cannot beat it into the log.
+
+        :param command: Command.
+        :param ip: Tello IP.
+        :return: Tuple of (real command, Stats, list of datagrams).
+        """
         #global cmd
         command_sof_1 = ord(command[0])
         command_sof_2 = ord(command[1])
@@ -167,34 +543,31 @@ class TelloManager(object):
         else :
             multi_cmd_send_flag = False
 
+        real_command = command[3:] if multi_cmd_send_flag else command
+        stats = Stats(real_command, self._next_id(ip))
+        self.log[ip].append(stats)
+
+        packets = []
+
         if multi_cmd_send_flag == True:      
-            self.str_cmd_index[ip] = self.str_cmd_index[ip] + 1
+            self.str_cmd_index[ip] = self.str_cmd_index.get(ip, 1) + 1
+            str_cmd_index_h = self.str_cmd_index[ip] // 128 % 127 + 1
+            str_cmd_index_l = self.str_cmd_index[ip] % 128
+            if str_cmd_index_l == 0:
+                str_cmd_index_l = str_cmd_index_l + 2
+            self._track(ip, stats, (str_cmd_index_h, str_cmd_index_l))
+
             for num in range(1,5):                
-                str_cmd_index_h = self.str_cmd_index[ip] / 128 + 1
-                str_cmd_index_l = self.str_cmd_index[ip] % 128
-                if str_cmd_index_l == 0:
-                    str_cmd_index_l = str_cmd_index_l + 2
                 cmd_sof = [0x52, 0x65, str_cmd_index_h, str_cmd_index_l, 0x01, num + 1, 0x20]
-                cmd_sof_str = str(bytearray(cmd_sof))
-                cmd = cmd_sof_str + command[3:]
-                self.socket.sendto(cmd.encode('utf-8'), (ip, 8889))
+                packets.append(bytes(cmd_sof) + command[3:].encode('utf-8'))
 
             print(f'[MULTI_COMMAND], IP={ip}, COMMAND={command[3:]}')
-            real_command = command[3:]
         else:
-            self.socket.sendto(command.encode('utf-8'), (ip, 8889))
+            self._track(ip, stats)
+            packets.append(command.encode('utf-8'))
             print(f'[SINGLE_COMMAND] IP={ip}, COMMAND={command}')
-            real_command = command
-        
-        self.log[ip].append(Stats(real_command, len(self.log[ip])))
-        start = time.time()
 
-        while not self.log[ip][-1].got_response():
-            now = time.time()
-            diff = now - start
-            if diff > self.COMMAND_TIME_OUT:
-                print(f'[NO_RESPONSE] Max timeout exceeded for command: {real_command}')
-                return    
+        return real_command, stats, packets
 
     def _receive_thread(self):
         """
@@ -203,42 +576,255 @@ class TelloManager(object):
 
         :return: None.
         """
-        while True:
+        while self.running:
             try:
                 response, ip = self.socket.recvfrom(1024)
-                response = response.decode('utf-8')
-                self.response = response
-                
-                ip = ''.join(str(ip[0]))                
-                
-                if self.response.upper() == 'OK' and ip not in self.tello_ip_list:
-                    self.tello_ip_list.append(ip)
-                    self.last_response_index[ip] = 100
-                    self.tello_list.append(Tello(ip, self))
-                    self.str_cmd_index[ip] = 1
-                
-                response_sof_part1 = ord(self.response[0])               
-                response_sof_part2 = ord(self.response[1])
-
-                if response_sof_part1 == 0x52 and response_sof_part2 == 0x65:
-                    response_index = ord(self.response[3])
-                    
-                    if response_index != self.last_response_index[ip]:
-                        print(f'[MULTI_RESPONSE], IP={ip}, RESPONSE={self.response[7:]}')
-                        self.log[ip][-1].add_response(self.response[7:], ip)
-                    self.last_response_index[ip] = response_index
-                else:
-                    # print(f'[SINGLE_RESPONSE], IP={ip}, RESPONSE={self.response}')
-                    self.log[ip][-1].add_response(self.response, ip)
-                         
+                if not self.running:
+                    break
+                self._handle_response(response, ip)
             except socket.error as exc:
                 # swallow exception
                 # print "[Exception_Error]Caught exception socket.error : %s\n" % exc
                 pass
 
+    def close(self):
+        """
+        Stops the receive thread and closes the socket.
+
+        :return: None.
+        """
+        self.running = False
+
+        # wake the receive thread up with an empty datagram to ourselves
+        try:
+            host, port = self.socket.getsockname()
+            self.socket.sendto(b'', ('127.0.0.1' if host in ('', '0.0.0.0') else host, port))
+        except socket.error:
+            pass
+
+        self.receive_thread.join(1.0)
+        self.socket.close()
+        self.stop_telemetry()
+
+    def start_telemetry(self, port=8890, capacity=100):
+        """
+        Starts receiving the state stream Tellos push after 'command'.
+
+        :param port: Local port to bind.
+        :param capacity: Samples kept per Tello.
+        :return: TelemetryReceiver.
+        """
+        if self.telemetry is None:
+            self.telemetry = TelemetryReceiver(self.local_ip, port, capacity)
+        return self.telemetry
+
+    def stop_telemetry(self):
+        """
+        Stops receiving the state stream.
+
+        :return: None.
+        """
+        if self.telemetry is not None:
+            self.telemetry.close()
+            self.telemetry = None
+
+    def _next_id(self, ip):
+        """
+        Gets the next command ID for a Tello.
+
+        :param ip: Tello IP.
+        :return: Command ID.
+        """
+        id = self.command_count[ip]
+        self.command_count[ip] = id + 1
+        return id
+
+    def _record(self, ip, stats):
+        """
+        Streams a completed (answered or timed out) command to the session log.
+
+        :param ip: Tello IP.
+        :param stats: Stats.
+        :return: None.
+        """
+        if self.log_writer is not None:
+            self.log_writer.write(ip, stats)
+
+    def _on_tello_found(self, ip):
+        """
+        Wakes up discovery when a new Tello answers.
+
+        :param ip: Tello IP.
+        :return: None.
+        """
+        with self.discovery_cond:
+            self.discovery_cond.notify_all()
+
+    def _track(self, ip, stats, seq=None):
+        """
+        Registers an outstanding request.
+        Plain SDK commands carry no sequence number, so at most one is outstanding per drone;
+        'Re' multi-commands are keyed by their (high, low) index bytes.
+
+        :param ip: Tello IP.
+        :param stats: Stats of the request.
+        :param seq: Multi-command index bytes, or None for a plain command.
+        :return: None.
+        """
+        with self.outstanding_lock:
+            if seq is None:
+                self.outstanding[ip] = stats
+            else:
+                self.outstanding_seq[ip][seq] = stats
+
+    def _wait_for_response(self, ip, stats, timeout):
+        """
+        Blocks until a request is answered or the timeout expires.
+
+        :param ip: Tello IP.
+        :param stats: Stats of the request.
+        :param timeout: Timeout (seconds).
+        :return: A boolean indicating if response was received.
+        """
+        with self.outstanding_lock:
+            return self.answered[ip].wait_for(stats.got_response, timeout)
+
+    def _answer(self, ip, stats):
+        """
+        Attaches the response to the request it answers and wakes the drone's sender.
+
+        :param ip: Tello IP.
+        :param stats: Stats of the request.
+        :return: None.
+        """
+        with self.outstanding_lock:
+            stats.add_response(self.response, ip)
+            self.answered[ip].notify_all()
+        self._record(ip, stats)
+
+    def _untrack(self, ip, stats):
+        """
+        Forgets an outstanding request (e.g. after it timed out) so a late response is dropped
+        instead of being credited to the next command.
+
+        :param ip: Tello IP.
+        :param stats: Stats of the request.
+        :return: None.
+        """
+        with self.outstanding_lock:
+            if self.outstanding.get(ip) is stats:
+                del self.outstanding[ip]
+
+            pending = self.outstanding_seq.get(ip, {})
+            for seq in [seq for seq, s in pending.items() if s is stats]:
+                del pending[seq]
+
+    def _fits(self, ip, stats, response):
+        """
+        Checks if a plain response can answer a command, since it carries no sequence number:
+        read commands ('battery?', 'sn?', ...) are answered with a value, everything else with
+        'ok' or 'error ...', and a motion command is not acked before it could have flown.
+
+        :param ip: Tello IP.
+        :param stats: Stats of the outstanding command.
+        :param response: Response.
+        :return: A boolean indicating if the response can be the command's answer.
+        """
+        response = response.lower()
+        ack = response == 'ok' or response.startswith('error')
+        if stats.command.endswith('?'):
+            return not ack
+        if not ack:
+            return False
+
+        if response == 'ok' and TelloManager.is_motion(stats.command):
+            elapsed = (time.monotonic_ns() - stats.start_ns) / 1e9
+            return elapsed >= self.EARLY_ACK * self.get_travel_time(stats.command, ip)
+        return True
+
+    def _handle_response(self, response, address):
+        """
+        Handles one datagram received from a Tello: registers newly discovered Tellos
+        and attaches the response to the outstanding request it answers.
+        Stale or duplicate responses are dropped.
+
+        :param response: Raw response bytes.
+        :param address: Sender address tuple.
+        :return: None.
+        """
+        ip = ''.join(str(address[0]))
+
+        if response[:2] == b'Re' and len(response) >= 7:
+            seq = (response[2], response[3])
+            self.response = response[7:].decode('utf-8', errors='replace')
+
+            with self.outstanding_lock:
+                stats = self.outstanding_seq[ip].pop(seq, None)
+
+            # the command is sent 4 times, so the repeats are expected duplicates
+            if stats is None:
+                return
+
+            print(f'[MULTI_RESPONSE], IP={ip}, RESPONSE={self.response}')
+            self._answer(ip, stats)
+            return
+
+        self.response = response.decode('utf-8', errors='replace')
+
+        if self.response.upper() == 'OK' and ip not in self.tello_ip_list:
+            self.tello_ip_list.append(ip)
+            self.tello_list.append(Tello(ip, self))
+            self.str_cmd_index[ip] = 1
+
+            probe_time = self.probes.pop(ip, None)
+            if probe_time is not None:
+                stats = Stats('command', self._next_id(ip))
+                stats.start_ns = probe_time
+                self.log[ip].append(stats)
+                stats.add_response(self.response, ip)
+                self._record(ip, stats)
+
+            self._on_tello_found(ip)
+
+            if probe_time is not None:
+                return
+
+        echo = False
+        with self.outstanding_lock:
+            stats = self.outstanding.pop(ip, None)
+            if stats is None:
+                echo = self._is_echo(ip, self.response)
+            elif not self._fits(ip, stats, self.response):
+                # the late answer of an earlier command (or probe) that timed out
+                self.outstanding[ip] = stats
+                stats = None
+            else:
+                # a newer command is waiting, and a plain response cannot be told apart from an
+                # echo (the first transmission may simply have been lost), so it gets the answer
+                self.echoes.pop(ip, None)
+
+        if stats is None:
+            # the late answer to a resent command is expected
+            if not echo:
+                print(f'[STALE_RESPONSE], IP={ip}, RESPONSE={self.response}')
+            return
+
+        # print(f'[SINGLE_RESPONSE], IP={ip}, RESPONSE={self.response}')
+        self._answer(ip, stats)
+
+    def set_log_writer(self, log_writer):
+        """
+        Sets where completed commands are streamed.
+        :param log_writer: SessionLogWriter, or None to stop streaming.
+        :return: The previous log writer.
+        """
+        previous = self.log_writer
+        self.log_writer = log_writer
+        return previous
+
     def get_log(self):
         """
-        Get all logs.
+        Get the logs kept in memory (the last LOG_WINDOW commands per Tello).
         :return: Dictionary of logs.
         """
         return self.log
@@ -310,9 +896,15 @@ class SubnetInfo(object):
 
 class Stats(object):
     """
-    Statistics
+    Statistics. Times are monotonic nanoseconds; they are converted to wall-clock
+    datetimes only when the stats are rendered.
     """
 
+    __slots__ = ('command', 'response', 'id', 'start_ns', 'end_ns', 'drone_ip')
+
+    # wall clock minus monotonic clock, taken once so later NTP steps do not skew durations
+    WALL_CLOCK_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
     def __init__(self, command, id):
         """
         Ctor.
@@ -323,9 +915,8 @@ class Stats(object):
         self.response = None
         self.id = id
 
-        self.start_time = datetime.now()
-        self.end_time = None
-        self.duration = None
+        self.start_ns = time.monotonic_ns()
+        self.end_ns = None
         self.drone_ip = None
 
     def add_response(self, response, ip):
@@ -336,18 +927,39 @@ class Stats(object):
         :return: None.
         """
         if self.response == None:
+            self.end_ns = time.monotonic_ns()
             self.response = response
-            self.end_time = datetime.now()
-            self.duration = self.get_duration()
             self.drone_ip = ip
 
+    @staticmethod
+    def to_datetime(ns):
+        """
+        Converts a monotonic timestamp to wall-clock time.
+        :param ns: Monotonic time (nanoseconds), or None.
+        :return: Datetime, or None.
+        """
+        if ns is None:
+            return None
+        return datetime.fromtimestamp((ns + Stats.WALL_CLOCK_OFFSET_NS) / 1e9)
+
+    @property
+    def start_time(self):
+        return Stats.to_datetime(self.start_ns)
+
+    @property
+    def end_time(self):
+        return Stats.to_datetime(self.end_ns)
+
+    @property
+    def duration(self):
+        return None if self.end_ns is None else self.get_duration()
+
     def get_duration(self):
         """
         Gets the duration.
         :return: Duration (seconds).
         """
-        diff = self.end_time - self.start_time
-        return diff.total_seconds()
+        return (self.end_ns - self.start_ns) / 1e9
 
     def print_stats(self):
         """
@@ -0,0 +1,57 @@
+import time
+
+from health import HealthGate
+
+ANSWERS = {'battery?': '80', 'temp?': '60~63C', 'wifi?': '40', 'sdk?': '30'}
+
+
+def answer(command, ip, timeout):
+    return ANSWERS[command]
+
+
+def test_parse():
+    assert HealthGate.parse('temperature', '62~65C') == 65.0
+    assert HealthGate.parse('battery', '87\r\n') == 87.0
+    assert HealthGate.parse('sdk', 'unknown command: sdk?') is None
+    assert HealthGate.parse('battery', None) is None
+
+
+def test_evaluate():
+    assert HealthGate.evaluate(80.0, 'battery', 30)
+    assert not HealthGate.evaluate(20.0, 'battery', 30)
+    assert not HealthGate.evaluate(90.0, 'temperature', 85)
+    assert not HealthGate.evaluate(None, 'snr', 25)
+
+
+def test_collect_queries_then_caches():
+    sent = []
+    health = HealthGate(lambda command, ip, timeout: sent.append((ip, command)) or answer(command, ip, timeout))
+
+    values = health.collect(['a', 'b'], ['snr', 'sdk'], 1.0)
+    assert values == {ip: {'snr': (40.0, 'QUERY'), 'sdk': (30.0, 'QUERY')} for ip in ('a', 'b')}
+    assert len(sent) == 4
+
+    values = health.collect(['a', 'b'], ['snr', 'sdk'], 1.0)
+    assert values['a'] == {'snr': (40.0, 'CACHE'), 'sdk': (30.0, 'CACHE')}
+    assert len(sent) == 4
+
+
+def test_deadline_covers_the_whole_check():
+    def send(command, ip, timeout):
+        # 'slow' takes its full timeout for every query, and the others queue up behind it
+        if ip == 'slow':
+            time.sleep(timeout)
+            return None
+        time.sleep(0.2)
+        return answer(command, ip, timeout)
+
+    health = HealthGate(send)
+    ips = ['slow'] + [f'd{x}' for x in range(20)]
+
+    start = time.monotonic()
+    values = health.collect(ips, ['battery', 'temperature', 'snr', 'sdk'], 1.0)
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 1.3
+    assert values['slow'] == {check: (None, 'TIMEOUT') for check in ('battery', 'temperature', 'snr', 'sdk')}
+    assert values['d0']['temperature'] == (63.0, 'QUERY')
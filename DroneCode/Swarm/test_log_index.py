@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from log_index import LogIndex
+
+RECORD = 'drone={ip}, id={id}, command={command}, response={response}, ' \
+         'start_time=2023-02-08 16:24:39.{ms:03d}000, end_time=2023-02-08 16:24:39.{ms:03d}500, duration={duration}\n'
+
+
+def write_log(fpath, records):
+    with open(fpath, 'w') as f:
+        for ip, id, command, response, duration in records:
+            f.write(RECORD.format(ip=ip, id=id, command=command, response=response, ms=id, duration=duration))
+
+
+def decode(index):
+    """Rows as tuples of decoded values, for comparing indexes with different codes."""
+    names = sorted(index.columns)
+    values = [np.array(index.tables[k])[index.columns[k]] if k in index.tables else index.columns[k] for k in names]
+    return [tuple(str(v[i]) for v in values) for i in range(len(index))]
+
+
+def test_split_streamed_record(tmp_path):
+    fpath = str(tmp_path / 'split.txt')
+    with open(fpath, 'w') as f:
+        f.write('drone=192.168.0.101, id=0, command=battery?, response=87\r\n'
+                ', start_time=2023-02-08 16:24:39.123456, end_time=2023-02-08 16:24:39.223456, duration=0.1\n')
+
+    index = LogIndex.parse([('split', fpath)])
+    assert len(index) == 1
+    assert index.tables['response'] == ['87']
+    assert index.tables['drone'] == ['192.168.0.101']
+
+
+def test_malformed_records_are_skipped(tmp_path):
+    fpath = str(tmp_path / 'bad.txt')
+    with open(fpath, 'w') as f:
+        f.write('drone=192.168.0.101, id=0, command=land, response=ok, start_time=garbage, end_time=x, duration=1\n')
+        f.write('drone=192.168.0.101, id=1, command=land, response=ok, '
+                'start_time=2023-02-08 16:24:39.0, end_time=2023-02-08 16:24:40.0, duration=None\n')
+        f.write('drone=192.168.0.101, id=2, command=land\n')
+
+    index = LogIndex.parse([('bad', fpath)])
+    assert list(index.columns['id']) == [1]
+    assert np.isnan(index.columns['duration'][0])
+
+
+def test_incremental_build_matches_full_parse(tmp_path):
+    dpath = str(tmp_path)
+    write_log(os.path.join(dpath, 'a.txt'), [('192.168.0.101', 0, 'takeoff', 'ok', 5.0),
+                                             ('192.168.0.102', 1, 'battery?', '87', 0.1)])
+    write_log(os.path.join(dpath, 'b.txt'), [('192.168.0.101', 0, 'land', 'ok', 3.0)])
+    LogIndex.build(dpath)
+
+    # one log changes, one is added, one is removed
+    write_log(os.path.join(dpath, 'b.txt'), [('192.168.0.103', 0, 'cw 90', 'error', 1.0)])
+    write_log(os.path.join(dpath, 'c.txt'), [('192.168.0.101', 0, 'sn?', 'SN1', 0.2)])
+    os.remove(os.path.join(dpath, 'a.txt'))
+
+    incremental = LogIndex.build(dpath)
+    full = LogIndex.build(dpath, use_cache=False)
+    assert incremental.tables['session'] == ['b', 'c']
+    assert decode(incremental) == decode(full)
+
+
+def test_latency_groups(tmp_path):
+    fpath = str(tmp_path / 'a.txt')
+    write_log(fpath, [('192.168.0.101', 0, 'up 20', 'ok', 1.0), ('192.168.0.101', 1, 'up 50', 'ok', 3.0),
+                      ('192.168.0.101', 2, 'battery?', '87', 'None')])
+
+    rows = {row['command_type']: row for row in LogIndex.parse([('a', fpath)]).latency()}
+    assert rows['up']['count'] == 2
+    assert rows['battery?']['timeout_rate'] == 1.0
@@ -0,0 +1,70 @@
+import pytest
+from mission import Mission, MissionError, Op
+
+
+def compile(text, coalesce=False):
+    return Mission.compile(text.strip().splitlines(), coalesce=coalesce)
+
+
+def test_compiles_typed_instructions():
+    mission = compile('''
+scan 2
+1=0TQZK7NED02VMT
+*>takeoff
+delay 1.5
+battery_check 20
+2>cw 90
+''')
+
+    assert [i.op for i in mission] == [Op.SCAN, Op.ASSIGN, Op.ACTION, Op.DELAY, Op.BATTERY_CHECK, Op.ACTION]
+    assert mission.instructions[1].args == (0, '0TQZK7NED02VMT')
+    assert mission.instructions[2].args == ((0, 1), 'takeoff')
+    assert mission.instructions[3].args == (1.5,)
+
+
+def test_reports_every_error_with_its_line():
+    with pytest.raises(MissionError) as e:
+        compile('''
+1>takeoff
+scan 2
+3>land
+2>up 5
+1>jump
+''')
+
+    assert [line_no for line_no, _ in e.value.errors] == [1, 3, 4, 5]
+
+
+@pytest.mark.parametrize('action', ['flip', 'flip x', 'flip l r'])
+def test_flip_needs_a_direction(action):
+    with pytest.raises(MissionError):
+        compile(f'scan 1\n1>{action}')
+
+
+def test_flip_with_direction():
+    assert compile('scan 1\n1>flip b').instructions[1].args == ((0,), 'flip b')
+
+
+def test_cues_form_a_timeline():
+    mission = compile('''
+scan 2
+@1 2>up 50
+@0 1>up 50
+@0.5 *>cw 90
+''')
+
+    assert [i.op for i in mission] == [Op.SCAN, Op.TIMELINE]
+    assert mission.instructions[1].args[0] == {0: [(0.0, 'up 50'), (0.5, 'cw 90')],
+                                               1: [(0.5, 'cw 90'), (1.0, 'up 50')]}
+
+
+def test_drone_ids():
+    assert compile('scan 3\n2>takeoff\n@1 3>land').get_drone_ids() == [1, 2]
+    assert compile('scan 3\n2>takeoff\ncircle').get_drone_ids() == [0, 1, 2]
+
+
+def test_actions_are_merged_only_on_request():
+    text = 'scan 1\n1>up 50\n1>down 50\n1>forward 30\n1>left 40'
+
+    assert [i.args[1] for i in compile(text).instructions[1:]] == ['up 50', 'down 50', 'forward 30', 'left 40']
+    assert [i.args[1] for i in compile(text, coalesce=True).instructions[1:]] == ['go 30 40 0 50']
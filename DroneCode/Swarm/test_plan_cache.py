@@ -0,0 +1,49 @@
+import os
+from plan_cache import PlanCache
+
+
+def test_get_or_compute(tmp_path):
+    cache = PlanCache(str(tmp_path))
+    key = PlanCache.make_key('mission', 1, b'content')
+
+    assert cache.get_or_compute(key, lambda: [1, 2]) == [1, 2]
+    assert cache.get_or_compute(key, lambda: [3]) == [1, 2]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # a new process reads the plan back from disk
+    assert PlanCache(str(tmp_path)).get(key) == [1, 2]
+
+
+def test_keys_depend_on_every_part():
+    assert PlanCache.make_key('a', 1) != PlanCache.make_key('a', 2)
+    assert PlanCache.make_key('ab', 'c') != PlanCache.make_key('a', 'bc')
+
+
+def test_memory_is_lru_bounded(tmp_path):
+    cache = PlanCache(str(tmp_path), max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert list(cache.memo) == ['a', 'c']
+    # evicted from memory, still on disk
+    assert cache.get('b') == 2
+    assert list(cache.memo) == ['c', 'b']
+
+
+def test_disk_is_bounded(tmp_path):
+    cache = PlanCache(str(tmp_path), max_bytes=1000)
+    for x in range(10):
+        cache.put(f'k{x}', bytes(300))
+
+    total = sum(entry.stat().st_size for entry in os.scandir(str(tmp_path)))
+    assert total <= 1000
+    assert os.path.exists(os.path.join(str(tmp_path), 'k9' + PlanCache.SUFFIX))
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    with open(os.path.join(str(tmp_path), 'bad' + PlanCache.SUFFIX), 'wb') as f:
+        f.write(b'not a pickle')
+
+    assert PlanCache(str(tmp_path)).get('bad') is None
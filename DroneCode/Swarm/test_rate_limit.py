@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from rate_limit import RateLimiter, TokenBucket
+
+
+def test_bucket_refills_up_to_its_burst():
+    bucket = TokenBucket(10.0, 5)
+    bucket.tokens = 0.0
+
+    bucket.refill(bucket.stamp + 0.2)
+    assert bucket.tokens == pytest.approx(2.0)
+    assert bucket.get_wait(4) == pytest.approx(0.2)
+
+    bucket.refill(bucket.stamp + 10.0)
+    assert bucket.tokens == 5
+    assert bucket.get_wait(50) == 0.0
+
+
+def test_burst_passes_then_drone_rate_applies():
+    limiter = RateLimiter(rate=1000.0, burst=100, drone_rate=50.0, drone_burst=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire('a')
+    assert time.monotonic() - start < 0.05
+
+    for _ in range(5):
+        limiter.acquire('a')
+    assert time.monotonic() - start >= 0.09
+    assert limiter.get_stats()['packets'] == 10
+    assert limiter.get_stats()['delayed'] > 0
+
+
+def test_drones_do_not_share_their_buckets():
+    limiter = RateLimiter(rate=1000.0, burst=100, drone_rate=1.0, drone_burst=1)
+    limiter.acquire('a')
+
+    start = time.monotonic()
+    limiter.acquire('b')
+    assert time.monotonic() - start < 0.05
+
+
+def test_urgent_commands_never_wait():
+    limiter = RateLimiter(rate=1.0, burst=1, drone_rate=1.0, drone_burst=1)
+    limiter.acquire('a')
+
+    start = time.monotonic()
+    limiter.acquire('a', 1, RateLimiter.get_lane('land'))
+    assert time.monotonic() - start < 0.05
+    assert RateLimiter.get_lane('forward 20') == RateLimiter.COMMAND
+
+
+def test_commands_go_before_discovery():
+    limiter = RateLimiter(rate=20.0, burst=1, drone_rate=100.0, drone_burst=10)
+    limiter.acquire('x')
+    order = []
+
+    def send(ip, lane):
+        limiter.acquire(ip, 1, lane)
+        order.append(ip)
+
+    probe = threading.Thread(target=send, args=('probe', RateLimiter.DISCOVERY))
+    probe.start()
+    time.sleep(0.01)
+    command = threading.Thread(target=send, args=('command', RateLimiter.COMMAND))
+    command.start()
+    probe.join()
+    command.join()
+
+    assert order == ['command', 'probe']
+
+
+def test_async_acquire_waits_on_the_loop():
+    limiter = RateLimiter(rate=1000.0, burst=100, drone_rate=50.0, drone_burst=1)
+
+    async def send():
+        for _ in range(3):
+            await limiter.acquire_async('a')
+
+    start = time.monotonic()
+    asyncio.run(send())
+    assert time.monotonic() - start >= 0.035
@@ -0,0 +1,50 @@
+from registry import DroneRegistry
+
+
+def test_defaults_are_not_confirmed(tmp_path):
+    registry = DroneRegistry(str(tmp_path / 'registry.json'), sn2ip={'A': '192.168.0.101'}, id2sn={0: 'A'})
+
+    assert registry.get_sn('192.168.0.101') == 'A'
+    assert registry.get_confirmed_sn('192.168.0.101') is None
+
+
+def test_confirmed_ips_survive_save_and_load(tmp_path):
+    fpath = str(tmp_path / 'registry.json')
+    registry = DroneRegistry(fpath, sn2ip={'A': '192.168.0.101', 'B': '192.168.0.102'})
+    registry.set_ip('A', '192.168.0.101', confirmed=True)
+    registry.save()
+
+    loaded = DroneRegistry(fpath)
+    assert loaded.get_confirmed_sn('192.168.0.101') == 'A'
+    assert loaded.get_confirmed_sn('192.168.0.102') is None
+
+
+def test_ip_belongs_to_one_drone(tmp_path):
+    registry = DroneRegistry(str(tmp_path / 'registry.json'))
+    registry.set_ip('A', '192.168.0.101', confirmed=True)
+    registry.set_ip('B', '192.168.0.101')
+
+    assert registry.get_sn('192.168.0.101') == 'B'
+    assert 'A' not in registry.sn2ip
+    assert registry.get_confirmed_sn('192.168.0.101') is None
+
+
+def test_route(tmp_path):
+    registry = DroneRegistry(str(tmp_path / 'registry.json'))
+    registry.set_sn(0, 'A')
+    registry.set_ip('A', '192.168.0.101')
+    registry.set_pool('192.168.0.101', 2)
+
+    assert registry.route(0) == ('A', '192.168.0.101', 2)
+
+    registry.set_ip('A', '192.168.0.105')
+    registry.set_pool('192.168.0.105', 1)
+    assert registry.route(0) == ('A', '192.168.0.105', 1)
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    fpath = tmp_path / 'registry.json'
+    fpath.write_text('{not json')
+
+    registry = DroneRegistry(str(fpath), sn2ip={'A': '192.168.0.101'})
+    assert registry.known_ips() == ['192.168.0.101']
@@ -0,0 +1,66 @@
+import pytest
+from rtt import RttEstimator
+from tello import TelloManager
+
+
+@pytest.fixture
+def manager():
+    manager = TelloManager('127.0.0.1', 0, possible_ips=[])
+    yield manager
+    manager.close()
+
+
+def test_initial_timeout_until_first_sample():
+    rtt = RttEstimator(1.0, 0.2, 20.0)
+
+    assert rtt.get_timeout() == 1.0
+    assert rtt.get_timeout(2) == 4.0
+
+
+def test_timeout_follows_samples():
+    rtt = RttEstimator(1.0, 0.2, 20.0)
+    rtt.update(0.1)
+
+    assert rtt.get_timeout() == pytest.approx(0.3)
+
+    for _ in range(50):
+        rtt.update(0.1)
+    assert rtt.get_timeout() == 0.2
+
+    rtt.update(3.0)
+    assert rtt.get_timeout() > 3.0
+
+
+def test_timeout_is_bounded():
+    rtt = RttEstimator(1.0, 0.2, 20.0)
+    rtt.update(10.0)
+
+    assert rtt.get_timeout() == 20.0
+    assert rtt.get_timeout(5) == 20.0
+
+
+def test_nominal_time_includes_settling(manager):
+    assert manager.get_nominal_time('forward 100', '127.0.0.2') == 2.0 + TelloManager.SETTLE_TIME
+    assert manager.get_nominal_time('cw 90', '127.0.0.2') == 1.0 + TelloManager.SETTLE_TIME
+    assert manager.get_nominal_time('takeoff', '127.0.0.2') == 5.0
+    assert manager.get_nominal_time('speed 50', '127.0.0.2') == 0.0
+
+    manager.speeds['127.0.0.2'] = 100.0
+    assert manager.get_nominal_time('forward 100', '127.0.0.2') == 1.0 + TelloManager.SETTLE_TIME
+
+
+def test_motion_timeout_keeps_the_fixed_timeout_until_moves_are_timed(manager):
+    ip = '127.0.0.2'
+    assert manager.get_timeout('forward 20', ip) == manager.COMMAND_TIME_OUT
+
+    for _ in range(manager.MOTION_SAMPLES):
+        manager.get_rtt(ip, 'motion').update(0.05)
+    timeout = manager.get_timeout('forward 20', ip)
+    assert manager.get_nominal_time('forward 20', ip) < timeout < manager.COMMAND_TIME_OUT
+
+
+def test_query_timeout_is_adaptive(manager):
+    ip = '127.0.0.2'
+    manager.get_rtt(ip, 'query').update(0.05)
+
+    assert manager.get_timeout('battery?', ip) < 1.0
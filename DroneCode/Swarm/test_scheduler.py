@@ -0,0 +1,55 @@
+import threading
+import time
+
+from scheduler import Cue, ShowScheduler
+
+
+def test_cues_fire_in_show_time_order():
+    fired = []
+    scheduler = ShowScheduler({0: [(0.0, 'up 50'), (0.1, 'cw 90')], 1: [(0.05, 'up 50')]})
+
+    assert scheduler.get_duration() == 0.1
+    assert scheduler.run(lambda id, cue: fired.append((id, cue.action)))
+    assert fired == [(0, 'up 50'), (1, 'up 50'), (0, 'cw 90')]
+    assert [(id, offset) for id, offset, _ in scheduler.fired] == [(0, 0.0), (1, 0.05), (0, 0.1)]
+
+
+def test_cues_are_not_fired_early():
+    scheduler = ShowScheduler({0: [(0.0, 'up 50'), (0.2, 'down 50')]})
+    start_ns = time.monotonic_ns()
+    scheduler.run(lambda id, cue: cue.set_sent(), start_ns)
+
+    assert all(cue.sent_ns >= cue.due_ns for cue in scheduler.cues)
+    assert scheduler.cues[1].due_ns == start_ns + int(0.2 * 1e9)
+
+
+def test_cancel_stops_the_run():
+    scheduler = ShowScheduler({0: [(0.0, 'up 50'), (5.0, 'down 50')]})
+    threading.Timer(0.1, scheduler.cancel).start()
+
+    start = time.monotonic()
+    assert not scheduler.run(lambda id, cue: None)
+    assert time.monotonic() - start < 1.0
+    assert len(scheduler.fired) == 1
+
+
+def test_send_lateness_includes_waiting_behind_earlier_commands():
+    queued = []
+    scheduler = ShowScheduler({0: [(0.0, 'up 50'), (0.05, 'down 50')]})
+    scheduler.run(lambda id, cue: queued.append(cue))
+
+    # the drone is still flying 'up 50', so 'down 50' is sent 0.2 s after it was queued
+    queued[0].set_sent()
+    time.sleep(0.2)
+    queued[1].set_sent()
+
+    assert scheduler.get_lateness()[1] < 0.05
+    assert scheduler.get_send_lateness()[1] >= 0.1
+
+
+def test_unsent_cues_are_left_out():
+    scheduler = ShowScheduler({})
+    assert scheduler.get_lateness() == (0.0, 0.0)
+
+    scheduler.cues.append(Cue('up 50', time.monotonic_ns()))
+    assert scheduler.get_send_lateness() == (0.0, 0.0)
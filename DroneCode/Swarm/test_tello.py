@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from simulator import TelloSimulator
+from tello import Stats, TelloManager
+
+IP = '127.0.0.2'
+
+
+@pytest.fixture
+def manager():
+    manager = TelloManager('127.0.0.1', 0, possible_ips=[])
+    manager.tello_ip_list.append(IP)
+    yield manager
+    manager.close()
+
+
+def answer(manager, command, response, age=0.0):
+    stats = Stats(command, 0)
+    stats.start_ns -= int(age * 1e9)
+    manager.outstanding[IP] = stats
+    manager._handle_response(response.encode(), (IP, 8889))
+    return stats.response
+
+
+@pytest.fixture
+def flight():
+    simulator = TelloSimulator(1, '127.0.0.2', ack_latency=0.01, jitter=0.005, exec_scale=1.0, seed=1)
+    with simulator:
+        ip = simulator.get_ips()[0]
+        manager = TelloManager('127.0.0.1', 0, possible_ips=[ip])
+        manager.find_avaliable_tello(1)
+        yield manager, ip
+        manager.close()
+
+
+def test_moves_are_answered_at_real_speed(flight):
+    manager, ip = flight
+    commands = ['takeoff', 'up 20', 'forward 50', 'cw 90', 'back 50', 'flip l', 'ccw 90', 'land']
+
+    responses = [manager.send_command(command, ip) for command in commands]
+
+    assert responses == ['ok'] * len(commands)
+    assert [stats.command for stats in manager.log[ip]][-len(commands):] == commands
+    assert manager.retransmissions == 0
+
+
+@pytest.mark.parametrize('command, response, age, answered', [
+    ('battery?', '87', 0.0, True),
+    ('battery?', 'ok', 0.0, False),
+    ('battery?', 'error', 0.0, False),
+    ('speed 50', 'ok', 0.0, True),
+    ('speed 50', '87', 0.0, False),
+    ('takeoff', 'ok', 0.1, False),
+    ('takeoff', 'ok', 4.0, True),
+    ('takeoff', 'error Not joystick', 0.1, True),
+    ('takeoff', '87', 4.0, False),
+    ('forward 100', 'ok', 0.5, False),
+    ('forward 100', 'ok', 1.5, True),
+])
+def test_response_must_fit_the_outstanding_command(manager, command, response, age, answered):
+    assert (answer(manager, command, response, age) == response) == answered
+    assert (IP in manager.outstanding) != answered
+
+
+def test_late_probe_acks_do_not_answer_takeoff():
+    simulator = TelloSimulator(1, IP, ack_latency=0.6, jitter=0.0, exec_scale=1.0, seed=1)
+    with simulator:
+        manager = TelloManager('127.0.0.1', 0, possible_ips=[IP])
+        try:
+            manager.find_avaliable_tello(1)
+            start = time.monotonic()
+            response = manager.send_command('takeoff', IP)
+            elapsed = time.monotonic() - start
+        finally:
+            manager.close()
+
+    assert response == 'ok'
+    assert elapsed >= TelloSimulator.EXEC_TIMES['takeoff']
+
+
+def test_stats_are_plain_records():
+    stats = Stats('battery?', 0)
+    stats.add_response('87', IP)
+    stats.add_response('88', IP)
+
+    assert not hasattr(stats, '__dict__')
+    assert stats.response == '87' and stats.drone_ip == IP
+    assert stats.get_duration() >= 0
+
+
+def test_sender_is_woken_by_the_answer(manager):
+    stats = Stats('battery?', 0)
+    manager.outstanding[IP] = stats
+
+    assert not manager._wait_for_response(IP, stats, 0.05)
+    manager._handle_response(b'87', (IP, 8889))
+    assert manager._wait_for_response(IP, stats, 0.05)